@@ -0,0 +1,140 @@
+"""
+Benchmark del catálogo público (scroll infinito AJAX): consultas y latencia por página.
+
+Compara la construcción anterior (OFFSET + COUNT y variantes consultadas por
+producto) con la actual, paginada por cursor y servida por el caché de páginas:
+en frío (construye y guarda), en caliente (lee el snapshot) y revalidación con
+If-None-Match (304).
+
+Uso:
+    python bench_catalog.py                          # datos existentes, vinilos-de-corte
+    python bench_catalog.py --type cintas-ramos --pages 5
+    python bench_catalog.py --seed 240               # crea productos sintéticos (se revierten)
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from products.catalog_cache import CATALOG_PAGE_SIZE, invalidate_catalog_cache
+from products.models import Color, Material, Product, ProductVariant, Size
+
+TYPE_MAP = {
+    'vinilos-de-corte': 'vinilo_corte',
+    'impresos-para-globos': 'impreso_globo',
+    'cintas-ramos': 'cinta',
+    'stickers-logo': 'logo',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_legacy(product_type, page_number):
+    """Réplica de la vista original: una consulta de variantes (y sus FKs) por producto."""
+    products_query = Product.objects.filter(
+        product_type=product_type, variants__isnull=False, is_active=True, is_online=True
+    ).distinct().order_by('-created_at')
+    page_obj = Paginator(products_query, CATALOG_PAGE_SIZE).get_page(page_number)
+    variants_data = {}
+    for product in page_obj:
+        variants_data[product.id] = [
+            {
+                'id': v.id,
+                'size_name': v.size.name,
+                'material_name': v.material.name,
+                'color_name': v.color.name if v.color else "Estándar",
+                'price': float(v.price),
+            }
+            for v in product.variants.all()
+        ]
+    return variants_data
+
+
+def seed(product_type, count):
+    sizes = [Size.objects.get_or_create(name=name)[0] for name in ('Grande', 'Mediano', 'Pequeño')]
+    material = Material.objects.get_or_create(name='Vinilo Tradicional')[0]
+    colors = list(Color.objects.all()[:4]) or [None]
+    Product.objects.bulk_create(
+        Product(name=f"bench-{i}", product_type=product_type, is_active=True, is_online=True)
+        for i in range(count)
+    )
+    products = Product.objects.filter(name__startswith='bench-', product_type=product_type)
+    ProductVariant.objects.bulk_create(
+        [
+            ProductVariant(product=p, size=s, material=material, color=c, price=1000)
+            for p in products for s in sizes for c in colors
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def measure(label, pages, fn):
+    queries, times = [], []
+    for page in range(1, pages + 1):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            fn(page)
+            times.append((time.perf_counter() - start) * 1000)
+        queries.append(len(ctx))
+    print(f"{label:<12} {statistics.mean(queries):>9.1f} {statistics.mean(times):>9.1f} {max(times):>9.1f}")
+
+
+def run(type_slug, pages):
+    product_type = TYPE_MAP[type_slug]
+    client = Client()
+    url = f"/catalogo/{type_slug}/"
+    headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+    etags = {}
+    cursors = {1: ''}
+
+    def fetch(page):
+        # Scroll infinito: cada página pide la siguiente con el cursor de la anterior
+        response = client.get(url, {'cursor': cursors.get(page) or ''}, **headers)
+        etags[page] = response.get('ETag')
+        cursors[page + 1] = response.json()['next_cursor']
+
+    def revalidate(page):
+        response = client.get(url, {'cursor': cursors.get(page) or ''}, HTTP_IF_NONE_MATCH=etags[page], **headers)
+        assert response.status_code == 304, response.status_code
+
+    invalidate_catalog_cache(product_type)
+    print(f"{'modo':<12} {'consultas':>9} {'ms prom':>9} {'ms máx':>9}")
+    measure('legacy', pages, lambda page: build_legacy(product_type, page))
+    measure('frío', pages, fetch)
+    measure('caliente', pages, fetch)
+    measure('304', pages, revalidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type', choices=sorted(TYPE_MAP), default='vinilos-de-corte')
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0, help='Productos sintéticos a crear (se revierten al final)')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    try:
+        with transaction.atomic():
+            if args.seed:
+                seed(TYPE_MAP[args.type], args.seed)
+            run(args.type, max(1, args.pages))
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark del catálogo formato historia: tiempo, tamaño y memoria pico (RSS).
+
+Compara el render anterior (todas las páginas como imágenes RGB en una lista y un
+único Image.save(format='PDF') al final) con el motor de products/catalog_render.py
+(páginas en JPEG escritas al archivo a medida que llegan), en el mismo proceso y con
+un pool de procesos. Además mide el PDF vectorial solo ('vector') y los cuatro
+formatos de una sola pasada ('formats': PDF, PDF vectorial, ZIP WebP y ZIP JPEG),
+para comparar contra generarlos por separado. Cada caso corre en un subproceso
+propio para que el pico de RSS no se mezcle; en el modo pool se reporta también el
+pico de los workers.
+
+Usa productos sintéticos con imágenes locales de 960px como el derivado 'story'
+(fotos WebP y JPEG y un PNG con transparencia) que pasan por ImageCache igual que
+en un build real, así que no necesita la base de datos ni descarga nada.
+
+Uso:
+    python bench_catalog_pdf.py                          # 20, 100 y 300 productos
+    python bench_catalog_pdf.py --products 100 --workers 4 --max-in-flight 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+from products.catalog_images import ImageCache
+from products.catalog_render import OUTPUT_FORMATS, catalog_page_specs, render_catalog, render_page_image
+
+MODES = ('legacy', 'engine', 'pool', 'vector', 'formats')
+# Formatos que escribe cada modo del motor
+MODE_FORMATS = {
+    'engine': ['pdf'],
+    'pool': ['pdf'],
+    'vector': ['pdf_vector'],
+    'formats': list(OUTPUT_FORMATS),
+}
+
+
+# Storage local: la "URL" es la ruta, así product_card() la usa como archivo
+STORAGE = SimpleNamespace(url=lambda name: name, path=lambda name: name)
+CATEGORIES = [SimpleNamespace(name='Flores'), SimpleNamespace(name='Amor')]
+
+
+def fake_product(name, image_path):
+    """Lo mínimo que product_card() lee de un Product."""
+    return SimpleNamespace(
+        name=name,
+        image=SimpleNamespace(storage=STORAGE),
+        get_image_name=lambda kind: image_path,
+        categories=SimpleNamespace(all=lambda: CATEGORIES),
+    )
+
+
+def _photo(i, size=(960, 1280)):
+    """Degradados con algo de ruido: se comprime como una foto, no como un color plano."""
+    red = Image.linear_gradient('L').rotate(i * 30).resize(size)
+    green = Image.radial_gradient('L').resize(size)
+    blue = Image.effect_noise(size, 20 + i)
+    return Image.merge('RGB', (red, green, blue))
+
+
+def make_images(directory, count=12):
+    paths = []
+    for i in range(count):
+        if i % 3 == 2:
+            # Sticker/logo: figura sobre fondo transparente
+            img = Image.new('RGBA', (960, 960), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(img)
+            draw.ellipse([80, 80, 880, 880], fill=(40 + i * 15, 120, 200 - i * 10, 255))
+            draw.text((400, 460), f"{i}", fill=(255, 255, 255, 255))
+            path = os.path.join(directory, f"img-{i}.png")
+            img.save(path)
+        else:
+            ext, pil_format = ('webp', 'WEBP') if i % 3 == 0 else ('jpg', 'JPEG')
+            path = os.path.join(directory, f"img-{i}.{ext}")
+            _photo(i).save(path, format=pil_format, quality=85)
+        paths.append(path)
+    return paths
+
+
+def build_specs(count, directory):
+    images = make_images(directory)
+    products = [fake_product(f"Producto de prueba {i}", images[i % len(images)]) for i in range(count)]
+    cache = ImageCache(os.path.join(directory, 'cache'), max_bytes=500 * 1024 * 1024)
+    return catalog_page_specs("Catálogo benchmark", "Cintas", "321 216 5252", products, image_cache=cache)
+
+
+def render_legacy(specs, path):
+    """Réplica de la vista original: todas las páginas en memoria y un solo save."""
+    pages = [render_page_image(spec) for spec in specs]
+    pages[0].save(path, format='PDF', save_all=True, append_images=pages[1:], resolution=150.0)
+    return len(pages)
+
+
+def _peak_mb(who):
+    # ru_maxrss está en KB en Linux (bytes en macOS)
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def run_case(count, mode, workers, max_in_flight):
+    with tempfile.TemporaryDirectory() as directory:
+        specs = build_specs(count, directory)
+        paths = {
+            fmt: os.path.join(directory, f'catalogo_{fmt}.{OUTPUT_FORMATS[fmt][1]}')
+            for fmt in MODE_FORMATS.get(mode, ['pdf'])
+        }
+        start = time.perf_counter()
+        if mode == 'legacy':
+            pages = render_legacy(specs, paths['pdf'])
+        else:
+            outputs = {fmt: open(path, 'wb') for fmt, path in paths.items()}
+            try:
+                pages = render_catalog(
+                    specs, outputs,
+                    workers=workers if mode == 'pool' else 1,
+                    max_in_flight=max_in_flight,
+                )
+            finally:
+                for f in outputs.values():
+                    f.close()
+        elapsed = time.perf_counter() - start
+        sizes = {fmt: round(os.path.getsize(path) / (1024 * 1024), 1) for fmt, path in paths.items()}
+
+    return {
+        'products': count,
+        'mode': mode,
+        'pages': pages,
+        'wall_s': round(elapsed, 2),
+        'per_page_ms': round(elapsed * 1000 / pages, 1),
+        'size_mb': sizes,
+        'peak_rss_mb': _peak_mb(resource.RUSAGE_SELF),
+        'worker_peak_mb': _peak_mb(resource.RUSAGE_CHILDREN) if mode == 'pool' else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, nargs='+', default=[20, 100, 300])
+    parser.add_argument('--mode', choices=MODES + ('all',), default='all')
+    parser.add_argument('--workers', type=int, default=max(2, min(4, os.cpu_count() or 1)))
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.mode != 'all':
+        for count in args.products:
+            print(json.dumps(run_case(count, args.mode, args.workers, args.max_in_flight)))
+        return
+
+    results = []
+    for count in args.products:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, '--products', str(count), '--mode', mode,
+                 '--workers', str(args.workers), '--max-in-flight', str(args.max_in_flight)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"workers={args.workers} max_in_flight={args.max_in_flight} cpus={os.cpu_count()}")
+    print(f"{'productos':>9} {'modo':<7} {'páginas':>7} {'tiempo s':>9} {'ms/pág':>7} "
+          f"{'RSS pico MB':>12} {'worker MB':>10}  tamaño MB")
+    for r in results:
+        sizes = ' '.join(f"{fmt}={mb}" for fmt, mb in r['size_mb'].items())
+        print(f"{r['products']:>9} {r['mode']:<7} {r['pages']:>7} {r['wall_s']:>9} {r['per_page_ms']:>7} "
+              f"{r['peak_rss_mb']:>12} {r['worker_peak_mb']:>10}  {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark del pipeline de previsualizaciones: memoria pico (RSS) y tiempo.
+
+Compara el render anterior (todo en memoria, Matrix(2, 2) fijo) con el actual
+(fuente volcado a disco sobre el umbral + presupuesto de megapíxeles).
+Cada modo corre en un subproceso propio para que el pico de RSS no se mezcle.
+
+Uso:
+    python bench_previews.py /ruta/a/corpus                # PDFs/PNGs/JPGs
+    python bench_previews.py /ruta/a/corpus --mode streaming
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from types import SimpleNamespace
+
+from django.core.files import File
+from PIL import Image
+
+from products.previews import PREVIEW_IMAGE_EXTENSIONS, open_source, render_preview_image
+
+EXTENSIONS = ('.pdf',) + PREVIEW_IMAGE_EXTENSIONS
+
+
+def render_legacy(path, ext):
+    """Réplica del Product.save() original: tres copias completas en memoria."""
+    with open(path, 'rb') as f:
+        file_content = f.read()
+    thumb_io = io.BytesIO()
+    if ext == '.pdf':
+        import fitz
+        doc = fitz.open(stream=file_content, filetype="pdf")
+        if doc.page_count > 0:
+            pix = doc.load_page(0).get_pixmap(matrix=fitz.Matrix(2, 2))
+            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            img.save(thumb_io, format='WEBP', quality=85)
+        doc.close()
+    else:
+        img = Image.open(io.BytesIO(file_content))
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        else:
+            img = img.convert('RGB')
+        img.save(thumb_io, format='WEBP', quality=85)
+    return thumb_io.tell()
+
+
+def render_streaming(path, ext):
+    product = SimpleNamespace(source_file=File(open(path, 'rb'), name=path))
+    thumb_io = io.BytesIO()
+    with open_source(product) as (source, _):
+        img = render_preview_image(source, ext)
+        if img is not None:
+            img.save(thumb_io, format='WEBP', quality=85)
+            img.close()
+    return thumb_io.tell()
+
+
+def corpus_files(corpus):
+    for name in sorted(os.listdir(corpus)):
+        ext = os.path.splitext(name)[1].lower()
+        if ext in EXTENSIONS:
+            yield os.path.join(corpus, name), ext
+
+
+def run_mode(corpus, mode):
+    render = render_legacy if mode == 'legacy' else render_streaming
+    files = list(corpus_files(corpus))
+    total_mb = sum(os.path.getsize(path) for path, _ in files) / (1024 * 1024)
+
+    start = time.perf_counter()
+    errors = 0
+    for path, ext in files:
+        try:
+            render(path, ext)
+        except Exception as e:
+            errors += 1
+            print(f"[{mode}] {os.path.basename(path)}: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss está en KB en Linux (bytes en macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return {
+        'mode': mode,
+        'files': len(files),
+        'input_mb': round(total_mb, 1),
+        'errors': errors,
+        'wall_s': round(elapsed, 2),
+        'per_file_ms': round(elapsed * 1000 / len(files), 1) if files else 0,
+        'peak_rss_mb': round(peak_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', help='Directorio con PDFs/PNGs/JPGs de muestra')
+    parser.add_argument('--mode', choices=['legacy', 'streaming', 'both'], default='both')
+    args = parser.parse_args()
+
+    if args.mode != 'both':
+        print(json.dumps(run_mode(args.corpus, args.mode)))
+        return
+
+    results = []
+    for mode in ('legacy', 'streaming'):
+        out = subprocess.run(
+            [sys.executable, __file__, args.corpus, '--mode', mode],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'modo':<10} {'archivos':>8} {'MB':>8} {'tiempo s':>9} {'ms/arch':>8} {'RSS pico MB':>12}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['files']:>8} {r['input_mb']:>8} {r['wall_s']:>9} "
+              f"{r['per_file_ms']:>8} {r['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de api_filter_variants: consulta anterior (JOINs + DISTINCT + COUNT sobre
+variantes) contra el índice VariantSearchIndex, con filtros típicos del editor.
+
+Crea un catálogo sintético dentro de una transacción que se revierte al final.
+
+Uso:
+    python bench_variant_search.py                  # 50.000 variantes
+    python bench_variant_search.py --variants 10000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Max, Q
+
+from products.models import Color, Material, Product, ProductVariant, Size
+from products.variant_search import rebuild_variant_search_index, search_variants
+
+SCENARIOS = [
+    {'product_type': 'vinilo_corte'},
+    {'product_type': 'vinilo_corte', 'search': 'rosa'},
+    {'product_type': 'cinta', 'search': '12'},
+    {'product_type': 'vinilo_corte', 'min_price': 1200, 'max_price': 1600, 'page': 5},
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def filter_legacy(data):
+    """Réplica de la consulta original de api_filter_variants."""
+    latest = Product.objects.filter(is_active=True, variants__isnull=False).distinct()
+    if data.get('product_type'):
+        latest = latest.filter(product_type=data['product_type'])
+    latest = latest.values('name', 'product_type').annotate(latest_id=Max('id')).values_list('latest_id', flat=True)
+    variants = ProductVariant.objects.select_related('product', 'size', 'material', 'color').filter(product_id__in=latest)
+    if data.get('product_type'):
+        variants = variants.filter(product__product_type=data['product_type'])
+    if data.get('size_id'):
+        variants = variants.filter(size_id=data['size_id'])
+    if data.get('search'):
+        variants = variants.filter(Q(product__name__icontains=data['search']) | Q(product__description__icontains=data['search']))
+    if data.get('min_price'):
+        variants = variants.filter(price__gte=data['min_price'])
+    if data.get('max_price'):
+        variants = variants.filter(price__lte=data['max_price'])
+    paginator = Paginator(variants.distinct().order_by('product__name', 'size__name'), 50)
+    page = paginator.page(min(data.get('page', 1), paginator.num_pages))
+    return [(v.id, v.product.name, v.size.name, v.material.name, v.color.name if v.color else '') for v in page]
+
+
+def filter_index(data):
+    entries = search_variants(data).order_by('product_name', 'size_name', 'variant_id')
+    paginator = Paginator(entries, 50)
+    page = paginator.page(min(data.get('page', 1), paginator.num_pages))
+    return [(e.variant_id, e.product_name, e.size_name, e.material_name, e.color_name) for e in page]
+
+
+def seed(total_variants):
+    sizes = [Size.objects.get_or_create(name=name, defaults={'dimensions': '10x10'})[0] for name in ('Grande', 'Mediano', 'Pequeño')]
+    material = Material.objects.get_or_create(name='Vinilo Tradicional')[0]
+    colors = [Color.objects.get_or_create(name=f"Bench {i}", defaults={'hex_code': '#000000'})[0] for i in range(10)]
+    per_product = len(sizes) * len(colors)
+    words = ['rosa', 'girasol', 'corazon', 'estrella', 'mariposa', 'feliz', 'cumple', 'boda']
+    Product.objects.bulk_create(
+        Product(name=f"{words[i % len(words)]} {i}", product_type=('vinilo_corte', 'cinta')[i % 2])
+        for i in range(total_variants // per_product)
+    )
+    products = Product.objects.filter(variants__isnull=True).values_list('id', flat=True)
+    ProductVariant.objects.bulk_create(
+        (
+            ProductVariant(product_id=pid, size=size, material=material, color=color, price=1000 + 100 * n)
+            for pid in products for n, size in enumerate(sizes) for color in colors
+        ),
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+    from products.search import PRODUCT, rebuild_search_index
+    from products.variant_summary import refresh_variant_summary
+    refresh_variant_summary()
+    rebuild_search_index([PRODUCT])
+    return rebuild_variant_search_index()
+
+
+def measure(fn, data, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            indexed = seed(args.variants)
+            print(f"Variantes indexadas: {indexed}")
+            print(f"{'filtros':<70} {'legacy ms':>10} {'índice ms':>10}")
+            for data in SCENARIOS:
+                legacy, _ = measure(filter_legacy, data, max(1, args.repeat // 5))
+                indexed_ms, _ = measure(filter_index, data, args.repeat)
+                print(f"{str(data):<70} {legacy:>10.1f} {indexed_ms:>10.1f}")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
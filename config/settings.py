@@ -163,6 +163,78 @@ EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.Email
 # =================================================================================
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
+# =================================================================================
+# COLA DE PREVISUALIZACIONES (sin Celery) - ver `manage.py procesar_previews`
+# =================================================================================
+PREVIEW_WORKER_THREADS = int(os.getenv('PREVIEW_WORKER_THREADS', '2'))
+# Presupuesto de píxeles del render (evita rasterizar pliegos enormes a x2)
+PREVIEW_MAX_MEGAPIXELS = float(os.getenv('PREVIEW_MAX_MEGAPIXELS', '4'))
+# Archivos fuente más grandes que esto se vuelcan a un temporal en disco en vez de RAM
+PREVIEW_SPOOL_THRESHOLD_MB = float(os.getenv('PREVIEW_SPOOL_THRESHOLD_MB', '8'))
+
+# =================================================================================
+# CACHÉ DEL CATÁLOGO PÚBLICO - ver products/catalog_cache.py
+# =================================================================================
+CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'True') == 'True'
+# Vida máxima de una página en caché (respaldo si algún cambio no pasó por signals)
+CATALOG_CACHE_SECONDS = int(os.getenv('CATALOG_CACHE_SECONDS', '300'))
+
+# =================================================================================
+# CATÁLOGO PDF - ver products/catalog_render.py
+# =================================================================================
+# Procesos que dibujan páginas en paralelo (1 = en el mismo proceso, sin pool)
+CATALOG_RENDER_WORKERS = int(os.getenv('CATALOG_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Páginas encargadas/en espera de ser escritas al PDF (acota la memoria del render)
+CATALOG_RENDER_MAX_IN_FLIGHT = int(os.getenv('CATALOG_RENDER_MAX_IN_FLIGHT', '8'))
+# Fondos/marcos precalculados de las páginas, compartidos entre workers y reinicios
+CATALOG_LAYER_CACHE_DIR = os.getenv('CATALOG_LAYER_CACHE_DIR', str(BASE_DIR / 'cache' / 'catalog_layers'))
+# Imágenes de producto ya reducidas (products/catalog_images.py), con límite LRU en MB
+CATALOG_IMAGE_CACHE_DIR = os.getenv('CATALOG_IMAGE_CACHE_DIR', str(BASE_DIR / 'cache' / 'catalog_images'))
+CATALOG_IMAGE_CACHE_MB = int(os.getenv('CATALOG_IMAGE_CACHE_MB', '500'))
+# Descargas simultáneas desde S3 al preparar un catálogo
+CATALOG_IMAGE_FETCH_WORKERS = int(os.getenv('CATALOG_IMAGE_FETCH_WORKERS', '8'))
+# True (por defecto): el catálogo se genera en un hilo de fondo del proceso web, sin
+# pool de procesos (un fork desde un worker web con hilos puede colgarse).
+# False (recomendado en producción): queda pendiente para la tarea always-on
+# `manage.py procesar_catalogos --loop`, que usa CATALOG_RENDER_WORKERS procesos y
+# retoma los que quedaron a medias. Ver TAREAS_EN_SEGUNDO_PLANO.md
+CATALOG_BUILD_IN_THREAD = os.getenv('CATALOG_BUILD_IN_THREAD', 'True') == 'True'
+# Días que se guardan en storage los catálogos generados (los reemplazados por uno
+# más nuevo con los mismos parámetros se borran antes)
+CATALOG_BUILD_KEEP_DAYS = int(os.getenv('CATALOG_BUILD_KEEP_DAYS', '7'))
+
+# =================================================================================
+# BÚSQUEDA DE PRODUCTOS Y CLIENTES - ver products/search.py
+# =================================================================================
+# 'auto' (FTS5 en SQLite, FULLTEXT en MySQL), 'sqlite_fts5', 'mysql_fulltext' o 'tokens'.
+# Al cambiarlo: `python manage.py reconstruir_indice_busqueda`
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# =================================================================================
+# SINCRONIZACIÓN DE VARIANTES
+# =================================================================================
+# Propagar un color nuevo a todo el catálogo en un hilo de fondo (ver products/color_sync.py)
+COLOR_SYNC_IN_BACKGROUND = os.getenv('COLOR_SYNC_IN_BACKGROUND', 'False') == 'True'
+# Cada cuántos segundos un proceso verifica si otro cambió las reglas de precio (products/pricing.py)
+PRICING_CACHE_SECONDS = int(os.getenv('PRICING_CACHE_SECONDS', '60'))
+
+# Tamaños/materiales/colores/categorías/estados en caché por proceso (products/reference_data.py).
+# Cada cuántos segundos un proceso verifica si otro cambió esas tablas.
+REFERENCE_CACHE_SECONDS = int(os.getenv('REFERENCE_CACHE_SECONDS', '5'))
+
+# =================================================================================
+# CARGA MASIVA (sin Celery) - ver products/bulk_ingest.py y `manage.py procesar_cargas_masivas`
+# =================================================================================
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '500'))
+BULK_UPLOAD_WORKER_THREADS = int(os.getenv('BULK_UPLOAD_WORKER_THREADS', '4'))
+# True: el lote se procesa en un hilo de fondo del proceso web.
+# False (recomendado en producción): queda pendiente para la tarea always-on
+# `manage.py procesar_cargas_masivas --loop`, que retoma los lotes interrumpidos.
+# Ver TAREAS_EN_SEGUNDO_PLANO.md
+BULK_UPLOAD_PROCESS_IN_THREAD = os.getenv('BULK_UPLOAD_PROCESS_IN_THREAD', 'True') == 'True'
+# Django rechaza por defecto más de 100 archivos por request
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
 # =================================================================================
 # CONFIGURACIÓN PARA BULK UPLOAD CON BD DE PRODUCCIÓN
 # Cuando USE_PRODUCTION_DB=True, se conecta a la BD de PythonAnywhere
@@ -9,6 +9,7 @@ from products import views as views_products
 from products import catalog_views as views_catalogs
 from products import internal_order_views as views_internal_orders  # Pedidos internos
 from products import cost_views as views_costs  # Costos de producción
+from products import export_views as views_exports  # Exportaciones CSV/XLSX
 
 urlpatterns = [
     path('admin-django/', admin.site.urls),
@@ -84,10 +85,14 @@ urlpatterns = [
     path('panel/catalogos/', views_catalogs.catalog_selection_view, name='catalog_selection'),
     path('panel/catalogos/editor/', views_catalogs.catalog_editor_view, name='catalog_editor'),
     path('panel/catalogos/generar/', views_catalogs.generate_catalog_pdf_view, name='generate_catalog_pdf'),
+    path('panel/catalogos/generados/<int:build_id>/', views_catalogs.catalog_build_status_view, name='catalog_build_status'),
+    path('panel/catalogos/generados/<int:build_id>/descargar/', views_catalogs.catalog_build_download_view, name='catalog_build_download'),
+    path('panel/catalogos/generados/<int:build_id>/descargar/<slug:output_format>/', views_catalogs.catalog_build_download_view, name='catalog_build_download'),
     path('api/catalog/filter-products/', views_catalogs.api_catalog_filter_products, name='api_catalog_filter_products'),
 
     # === RUTAS DE PEDIDOS INTERNOS (DRAG & DROP) ===
     path('panel/pedidos-internos/', views_internal_orders.internal_orders_list_view, name='internal_orders_list'),
+    path('panel/pedidos-internos/produccion/', views_internal_orders.production_queue_view, name='production_queue'),
     path('panel/pedidos-internos/crear/', views_internal_orders.internal_order_create_view, name='internal_order_create'),
     path('panel/pedidos-internos/<int:order_id>/', views_internal_orders.internal_order_detail_view, name='internal_order_detail'),
     path('panel/pedidos-internos/<int:order_id>/editar/', views_internal_orders.internal_order_edit_view, name='internal_order_edit'),
@@ -97,16 +102,21 @@ urlpatterns = [
     path('panel/pedidos-internos/<int:order_id>/estado/', views_internal_orders.internal_order_update_status_view, name='internal_order_update_status'),
     path('panel/pedidos-internos/<int:order_id>/tareas/', views_internal_orders.internal_order_tasks_view, name='internal_order_tasks'),
 
+    # === EXPORTACIONES (CSV / XLSX EN STREAMING) ===
+    path('panel/exportar/<slug:dataset>/', views_exports.export_dataset_view, name='export_dataset'),
+
     # === APIs AJAX PARA PEDIDOS INTERNOS ===
     path('api/internal-orders/filter-variants/', views_internal_orders.api_filter_variants, name='api_filter_variants'),
     path('api/internal-orders/get-filters/', views_internal_orders.api_get_available_filters, name='api_get_available_filters'),
     path('api/internal-orders/add-item/', views_internal_orders.api_internal_order_add_item, name='api_add_item'),
     path('api/internal-orders/remove-item/', views_internal_orders.api_internal_order_remove_item, name='api_remove_item'),
     path('api/internal-orders/update-quantity/', views_internal_orders.api_internal_order_update_qty, name='api_update_qty'),
+    path('api/internal-orders/batch/', views_internal_orders.api_internal_order_batch, name='api_internal_order_batch'),
     path('api/internal-orders/auto-select/', views_internal_orders.api_internal_order_auto_select, name='api_auto_select'),
     path('api/internal-orders/clear/', views_internal_orders.api_internal_order_clear, name='api_clear_order'),
     path('api/internal-orders/update-info/', views_internal_orders.api_internal_order_update_info, name='api_update_order_info'),
     path('api/internal-orders/update-task/', views_internal_orders.api_internal_order_update_task, name='api_update_task'),
+    path('api/internal-orders/production-complete/', views_internal_orders.api_production_complete, name='api_production_complete'),
     path('api/internal-orders/update-status/', views_internal_orders.api_internal_order_update_status, name='api_internal_order_update_status'),
 
     # === CRUD TAMAÑOS, MATERIALES, COLORES ===
@@ -1172,19 +1172,22 @@ def api_observations(request):
 def api_search_clients(request):
     from django.http import JsonResponse
     from django.db.models import Q
+    from products.search import CLIENT, ranked, search_ids
     from users.models import User
 
     q = request.GET.get('q', '').strip()
     if len(q) < 2:
         return JsonResponse({'clients': []})
 
-    clients = User.objects.filter(
-        Q(first_name__icontains=q) |
-        Q(last_name__icontains=q) |
-        Q(cedula__icontains=q) |
-        Q(phone_number__icontains=q) |
-        Q(username__icontains=q)
-    )[:10]
+    # Nombre, apellido, usuario, cédula o teléfono sin distinguir tildes, por relevancia
+    ids = search_ids(CLIENT, q, limit=10)
+    clients = list(ranked(User.objects.all(), ids))
+    if q.isdigit() and len(clients) < 10:
+        # Cédula y teléfono también por fragmento (p. ej. los últimos dígitos)
+        clients += list(
+            User.objects.filter(Q(cedula__contains=q) | Q(phone_number__contains=q))
+            .exclude(pk__in=ids)[:10 - len(clients)]
+        )
 
     results = [{
         'id': c.id,
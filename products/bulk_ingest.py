@@ -0,0 +1,229 @@
+"""
+Motor de ingesta para carga masiva.
+El request solo persiste el lote y sus archivos; el procesamiento (crear producto,
+variantes, encolar preview) corre fuera del request en un pool de hilos acotado:
+- en un hilo de fondo del mismo proceso (BULK_UPLOAD_PROCESS_IN_THREAD=True), o
+- con `manage.py procesar_cargas_masivas` (tarea programada / always-on).
+SIN Celery - compatible con PythonAnywhere.
+
+En producción conviene el worker (BULK_UPLOAD_PROCESS_IN_THREAD=False, ver
+TAREAS_EN_SEGUNDO_PLANO.md): el hilo muere si se recicla el proceso web y solo el
+worker retoma el lote. Un item retomado cuyo producto ya se había creado se vincula
+a ese producto en vez de crear otro.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import BulkUploadBatch, BulkUploadItem, Product
+from .previews import compute_source_hash
+from .services import sincronizar_variantes_producto
+from .tasks import process_single_upload_item
+
+logger = logging.getLogger(__name__)
+
+
+def _workers(workers=None):
+    if workers is None:
+        workers = getattr(settings, 'BULK_UPLOAD_WORKER_THREADS', 4)
+    return max(1, int(workers))
+
+
+def enqueue_batch(user, product_type, files):
+    """
+    Crea el lote y persiste un BulkUploadItem pendiente por archivo.
+    Omite duplicados por contenido (SHA-256) o por referencia (nombre sin extensión).
+    Retorna (batch, skipped_filenames).
+    """
+    batch = BulkUploadBatch.objects.create(
+        created_by=user,
+        product_type=product_type,
+        status='pending',
+    )
+
+    skipped = []
+    seen_hashes = set()
+    items = 0
+    for uploaded_file in files:
+        source_hash = compute_source_hash(uploaded_file)
+        filename_no_ext = os.path.splitext(uploaded_file.name)[0]
+        if (
+            source_hash in seen_hashes
+            or Product.objects.filter(source_hash=source_hash).exists()
+            or Product.objects.filter(name=filename_no_ext).exists()
+        ):
+            skipped.append(uploaded_file.name)
+            continue
+        seen_hashes.add(source_hash)
+
+        BulkUploadItem.objects.create(
+            batch=batch,
+            original_filename=uploaded_file.name,
+            source_file=uploaded_file,
+            source_hash=source_hash,
+            status='pending',
+        )
+        items += 1
+
+    batch.total_files = items
+    if not items:
+        batch.status = 'completed'
+    batch.save(update_fields=['total_files', 'status'])
+    return batch, skipped
+
+
+def _claim_item(item_id):
+    return BulkUploadItem.objects.filter(id=item_id, status='pending').update(status='processing') == 1
+
+
+def _heartbeat(batch_id):
+    """Marca que el lote sigue vivo (lo consulta requeue_stale_batches)."""
+    BulkUploadBatch.objects.filter(id=batch_id).update(heartbeat_at=timezone.now())
+
+
+def _existing_product(item):
+    """
+    Producto que ya creó este item antes de que se cayera el proceso: el vinculado
+    o el que tiene su mismo contenido (SHA-256).
+    """
+    if item.product_id:
+        return item.product
+    if item.source_hash:
+        return Product.objects.filter(source_hash=item.source_hash).order_by('id').first()
+    return None
+
+
+def _link_existing_product(item, product):
+    """Cierra un item retomado sin crear otro producto (completa las variantes que falten)."""
+    sincronizar_variantes_producto(product)
+    item.product = product
+    item.status = 'completed'
+    item.processed_at = timezone.now()
+    item.save(update_fields=['product', 'status', 'processed_at'])
+
+
+def process_item(item_id, product_type):
+    """Procesa un item y actualiza los contadores del lote de forma atómica (F())."""
+    if not _claim_item(item_id):
+        return None
+
+    item = BulkUploadItem.objects.get(id=item_id)
+    _heartbeat(item.batch_id)
+    try:
+        product = _existing_product(item)
+        if product is not None:
+            _link_existing_product(item, product)
+        else:
+            process_single_upload_item(item, product_type, source_hash=item.source_hash)
+        BulkUploadBatch.objects.filter(id=item.batch_id).update(
+            processed_files=F('processed_files') + 1,
+            successful_uploads=F('successful_uploads') + 1,
+            heartbeat_at=timezone.now(),
+        )
+        return 'completed'
+    except Exception as e:
+        logger.exception("Bulk item #%d falló", item.id)
+        BulkUploadItem.objects.filter(id=item.id).update(
+            status='failed',
+            error_message=str(e),
+            processed_at=timezone.now(),
+        )
+        BulkUploadBatch.objects.filter(id=item.batch_id).update(
+            processed_files=F('processed_files') + 1,
+            failed_uploads=F('failed_uploads') + 1,
+            error_log=Concat(F('error_log'), Value(f"\n{item.original_filename}: {e}")),
+            heartbeat_at=timezone.now(),
+        )
+        return 'failed'
+
+
+def _process_item_in_thread(item_id, product_type):
+    try:
+        return process_item(item_id, product_type)
+    finally:
+        # Cada hilo abre su propia conexión; la cerramos al terminar
+        close_old_connections()
+
+
+def process_batch(batch_id, workers=None):
+    """
+    Procesa los items pendientes de un lote con un pool de hilos.
+    Retorna False si otro proceso ya tomó el lote.
+    """
+    claimed = BulkUploadBatch.objects.filter(id=batch_id, status='pending').update(
+        status='processing',
+        heartbeat_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    batch = BulkUploadBatch.objects.get(id=batch_id)
+    item_ids = list(batch.items.filter(status='pending').order_by('id').values_list('id', flat=True))
+    workers = _workers(workers)
+
+    if workers == 1:
+        for item_id in item_ids:
+            process_item(item_id, batch.product_type)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_process_item_in_thread, item_ids, [batch.product_type] * len(item_ids)))
+
+    BulkUploadBatch.objects.filter(id=batch_id).update(status='completed')
+    return True
+
+
+def process_pending_batches(workers=None):
+    """Procesa todos los lotes pendientes en orden de llegada. Retorna cuántos procesó."""
+    processed = 0
+    for batch_id in BulkUploadBatch.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True):
+        if process_batch(batch_id, workers=workers):
+            processed += 1
+    return processed
+
+
+def requeue_stale_batches(max_age_minutes=60):
+    """
+    Lotes que quedaron en 'processing' (proceso caído): sus items colgados vuelven
+    a pendiente y el lote se re-encola para que lo retome el worker.
+    Se mide desde el último heartbeat, no desde la creación: un lote largo que
+    sigue avanzando no se toca.
+    """
+    cutoff = timezone.now() - timedelta(minutes=max_age_minutes)
+    stale = BulkUploadBatch.objects.filter(status='processing').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+    )
+    stale_ids = list(stale.values_list('id', flat=True))
+    BulkUploadItem.objects.filter(batch_id__in=stale_ids, status='processing').update(status='pending')
+    return BulkUploadBatch.objects.filter(id__in=stale_ids, status='processing').update(
+        status='pending',
+        heartbeat_at=None,
+    )
+
+
+def start_batch_processing(batch):
+    """
+    Lanza el procesamiento del lote sin bloquear el request.
+    Con BULK_UPLOAD_PROCESS_IN_THREAD=False el lote queda pendiente para el worker.
+    """
+    if not getattr(settings, 'BULK_UPLOAD_PROCESS_IN_THREAD', True):
+        return None
+
+    def _run():
+        try:
+            process_batch(batch.id)
+        except Exception:
+            logger.exception("Falló el procesamiento en segundo plano del lote #%d", batch.id)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=_run, name=f"bulk-batch-{batch.id}", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,316 @@
+"""
+Catálogos (PDF, PDF vectorial, historias WebP/JPEG) generados en segundo plano y
+reutilizables (sin Celery).
+
+request_catalog_build() normaliza los parámetros del formulario, calcula la huella
+de lo que se va a dibujar y:
+  - si ya hay un CatalogBuild completado con esa huella (y sus archivos siguen en
+    storage), lo retorna al instante;
+  - si hay uno pendiente o en proceso con la misma huella, retorna ese;
+  - si no, crea uno pendiente que procesa un hilo de fondo del proceso web tras el
+    commit (CATALOG_BUILD_IN_THREAD, por defecto) o `manage.py procesar_catalogos`.
+
+El hilo de fondo dibuja en el mismo proceso (workers=1): hacer fork del pool de
+render desde un proceso web con otros hilos vivos puede dejar al hijo bloqueado en
+un lock heredado. En producción conviene el worker (ver TAREAS_EN_SEGUNDO_PLANO.md).
+
+prune_old_builds() borra de storage los archivos de builds viejos o reemplazados;
+la llaman el worker y el hilo de fondo después de cada build.
+
+Todos los formatos pedidos salen de una sola pasada del motor (render_catalog), y
+cada uno se guarda en storage como un archivo del build (CatalogBuild.artifacts).
+
+La huella cubre todo lo que cambia los archivos: parámetros (formatos incluidos),
+nombre/categorías/imagen de cada producto en orden y la versión de las capas del
+render. El nombre de la imagen en storage cambia con cada imagen nueva
+(AWS_S3_FILE_OVERWRITE=False), así que funciona como marca de actualización sin
+necesitar fechas de modificación.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .catalog_images import ImageCache
+from .catalog_render import LAYER_VERSION, OUTPUT_FORMATS, catalog_page_specs, render_catalog
+from .models import CatalogBuild, Product
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_BUILD_STATUSES = ('pending', 'processing')
+# Un build reemplazado por otro más nuevo con los mismos parámetros se conserva este
+# tiempo (alguien puede estar descargándolo desde la página de estado)
+SUPERSEDED_GRACE = timedelta(hours=1)
+
+
+def normalize_params(catalog_name='', product_type='', category_ids=(), product_ids=(), phone='', formats=()):
+    """Parámetros en la forma que se guarda y se usa para la huella."""
+    formats = set(formats)
+    return {
+        'catalog_name': (catalog_name or 'Catálogo de Productos').strip(),
+        'product_type': product_type or '',
+        'category_ids': sorted({int(c) for c in category_ids if str(c).strip()}),
+        'product_ids': [int(p) for p in product_ids if str(p).strip()],
+        'phone': (phone or '321 216 5252').strip(),
+        # Formatos conocidos, en el orden de OUTPUT_FORMATS; por defecto el PDF
+        'formats': [f for f in OUTPUT_FORMATS if f in formats] or ['pdf'],
+    }
+
+
+def params_from_request(data):
+    return normalize_params(
+        catalog_name=data.get('catalog_name'),
+        product_type=data.get('product_type'),
+        category_ids=data.getlist('categories'),
+        product_ids=data.getlist('product_ids'),
+        phone=data.get('phone'),
+        formats=data.getlist('formats'),
+    )
+
+
+def resolve_products(params):
+    """Productos del catálogo, en el orden en que se imprimen."""
+    product_ids = params['product_ids']
+    if product_ids:
+        products_qs = Product.objects.filter(id__in=product_ids, is_active=True)
+        # Preservar el orden del editor
+        id_order = {pid: idx for idx, pid in enumerate(product_ids)}
+        return sorted(products_qs.prefetch_related('categories'), key=lambda p: id_order.get(p.id, 999))
+
+    products_qs = Product.objects.filter(is_active=True)
+    if params['product_type']:
+        products_qs = products_qs.filter(product_type=params['product_type'])
+    if params['category_ids']:
+        products_qs = products_qs.filter(categories__id__in=params['category_ids']).distinct()
+    return list(products_qs.prefetch_related('categories').order_by('name'))
+
+
+def type_label(params):
+    if not params['product_type']:
+        return "General"
+    return dict(Product.TYPE_CHOICES).get(params['product_type'], "General")
+
+
+def catalog_fingerprint(params, products):
+    content = {
+        'params': params,
+        'render': LAYER_VERSION,
+        'products': [
+            (
+                p.id,
+                p.name,
+                [c.name for c in p.categories.all()],
+                p.get_image_name('story') if p.image else None,
+            )
+            for p in products
+        ],
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _artifacts_exist(build):
+    names = [build.artifacts.get(output_format) for output_format in build.formats]
+    return all(names) and all(default_storage.exists(name) for name in names)
+
+
+def request_catalog_build(params, user=None):
+    """
+    Retorna el CatalogBuild para estos parámetros: reutilizado si ya existe uno
+    idéntico (completado o en curso) o uno nuevo encolado.
+    """
+    products = resolve_products(params)
+    fingerprint = catalog_fingerprint(params, products)
+
+    for build in CatalogBuild.objects.filter(fingerprint=fingerprint, status='completed').order_by('-finished_at')[:3]:
+        if _artifacts_exist(build):
+            CatalogBuild.objects.filter(id=build.id).update(hits=F('hits') + 1)
+            return build
+
+    active = CatalogBuild.objects.filter(fingerprint=fingerprint, status__in=ACTIVE_BUILD_STATUSES).first()
+    if active:
+        return active
+
+    build = CatalogBuild.objects.create(
+        fingerprint=fingerprint,
+        params=params,
+        product_count=len(products),
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+    if getattr(settings, 'CATALOG_BUILD_IN_THREAD', False):
+        transaction.on_commit(lambda: _run_in_thread(build.id))
+    return build
+
+
+def _claim_build(build_id):
+    """Marca el build como 'processing' solo si sigue pendiente (evita doble proceso entre workers)."""
+    return CatalogBuild.objects.filter(id=build_id, status='pending').update(
+        status='processing',
+        started_at=timezone.now(),
+    ) == 1
+
+
+def process_catalog_build(build_id, workers=None):
+    """
+    Genera y guarda los archivos del catálogo. Retorna el estado final o None si
+    otro worker lo tomó. workers: procesos del render (por defecto CATALOG_RENDER_WORKERS).
+    """
+    if not _claim_build(build_id):
+        return None
+
+    build = CatalogBuild.objects.get(id=build_id)
+    start = time.monotonic()
+    try:
+        params = build.params
+        products = resolve_products(params)
+        # Lo que realmente se dibuja (pudo cambiar desde que se solicitó)
+        build.fingerprint = catalog_fingerprint(params, products)
+        image_cache = ImageCache(
+            settings.CATALOG_IMAGE_CACHE_DIR,
+            max_bytes=settings.CATALOG_IMAGE_CACHE_MB * 1024 * 1024,
+            workers=settings.CATALOG_IMAGE_FETCH_WORKERS,
+        )
+        specs = catalog_page_specs(
+            params['catalog_name'], type_label(params), params['phone'], products, image_cache=image_cache,
+        )
+
+        with ExitStack() as stack:
+            outputs = {output_format: stack.enter_context(tempfile.TemporaryFile()) for output_format in build.formats}
+            build.page_count = render_catalog(
+                specs, outputs,
+                workers=settings.CATALOG_RENDER_WORKERS if workers is None else workers,
+                max_in_flight=settings.CATALOG_RENDER_MAX_IN_FLIGHT,
+                layer_dir=settings.CATALOG_LAYER_CACHE_DIR,
+            )
+            artifacts = {}
+            for output_format, output in outputs.items():
+                output.seek(0)
+                extension = OUTPUT_FORMATS[output_format][1]
+                artifacts[output_format] = default_storage.save(
+                    f"catalogs/catalogo_{build.id}_{build.fingerprint[:12]}_{output_format}.{extension}", File(output),
+                )
+            build.artifacts = artifacts
+        build.product_count = len(products)
+        build.status = 'completed'
+        build.error_message = ''
+    except Exception as e:
+        logger.exception("Falló la generación del catálogo #%d", build.id)
+        build.status = 'failed'
+        build.error_message = str(e)
+
+    build.finished_at = timezone.now()
+    build.duration_ms = int((time.monotonic() - start) * 1000)
+    # Sin `hits`: lo incrementan con F() las solicitudes que reutilizan este build
+    build.save(update_fields=[
+        'fingerprint', 'artifacts', 'page_count', 'product_count', 'status', 'error_message',
+        'finished_at', 'duration_ms',
+    ])
+    return build.status
+
+
+def _run_in_thread(build_id):
+    def _run():
+        try:
+            # Sin pool de procesos: no hacer fork desde el proceso web
+            process_catalog_build(build_id, workers=1)
+            # Sin worker que limpie: cada build del hilo poda los viejos
+            prune_old_builds()
+        except Exception:
+            logger.exception("Falló el hilo del catálogo #%d", build_id)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=_run, name=f"catalog-build-{build_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def requeue_stale_builds(max_age_minutes=30):
+    """Devuelve a 'pending' los builds que quedaron en 'processing' (proceso caído)."""
+    cutoff = timezone.now() - timedelta(minutes=max_age_minutes)
+    return CatalogBuild.objects.filter(status='processing', started_at__lt=cutoff).update(
+        status='pending',
+        started_at=None,
+    )
+
+
+def prune_old_builds(max_age_days=None):
+    """
+    Borra los archivos en storage y el registro de los builds terminados hace más de
+    max_age_days (por defecto CATALOG_BUILD_KEEP_DAYS) y de los completados que ya
+    tienen uno más nuevo con los mismos parámetros. Nunca toca los pendientes ni los
+    que están en proceso. Retorna cuántos builds borró.
+    """
+    if max_age_days is None:
+        max_age_days = settings.CATALOG_BUILD_KEEP_DAYS
+    now = timezone.now()
+    finished = CatalogBuild.objects.exclude(status__in=ACTIVE_BUILD_STATUSES).only('id', 'params', 'artifacts')
+    doomed = {build.id: build for build in finished.filter(finished_at__lt=now - timedelta(days=max_age_days))}
+
+    latest = set()
+    for build in finished.filter(status='completed').order_by('-finished_at', '-id').only('id', 'params', 'artifacts', 'finished_at'):
+        key = json.dumps(build.params, sort_keys=True)
+        if key not in latest:
+            latest.add(key)
+        elif build.finished_at < now - SUPERSEDED_GRACE:
+            doomed.setdefault(build.id, build)
+
+    for build in doomed.values():
+        for name in build.artifacts.values():
+            try:
+                default_storage.delete(name)
+            except Exception:
+                logger.warning("No se pudo borrar %s del catálogo #%d", name, build.id, exc_info=True)
+    CatalogBuild.objects.filter(id__in=list(doomed)).delete()
+    return len(doomed)
+
+
+def process_pending_builds(max_builds=None):
+    """Procesa los builds pendientes en orden de llegada. Retorna contadores."""
+    stats = {'processed': 0, 'completed': 0, 'failed': 0, 'skipped': 0}
+    pending = CatalogBuild.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    for build_id in list(pending[:max_builds] if max_builds else pending):
+        result = process_catalog_build(build_id)
+        if result is None:
+            stats['skipped'] += 1
+            continue
+        stats['processed'] += 1
+        stats[result] += 1
+    return stats
+
+
+def build_status_payload(build):
+    """Estado para el polling del editor."""
+    payload = {
+        'id': build.id,
+        'status': build.status,
+        'status_display': build.get_status_display(),
+        'product_count': build.product_count,
+        'page_count': build.page_count,
+        'status_url': reverse('catalog_build_status', args=[build.id]),
+    }
+    if build.status == 'completed':
+        payload['download_url'] = reverse('catalog_build_download', args=[build.id])
+        payload['downloads'] = [
+            {
+                'format': output_format,
+                'label': OUTPUT_FORMATS[output_format][0],
+                'url': reverse('catalog_build_download', args=[build.id, output_format]),
+            }
+            for output_format in build.formats
+            if output_format in build.artifacts
+        ]
+    if build.status == 'failed':
+        payload['error'] = build.error_message
+    return payload
@@ -0,0 +1,202 @@
+"""
+Caché de páginas del catálogo público (catalogo_publico_view).
+Cada página (tipo, categoría, cursor) se construye una vez con dos consultas
+(productos por keyset + variantes con select_related) y se guarda como JSON en
+CatalogPageSnapshot, compartido por todos los procesos web.
+La paginación es por cursor (created_at, id) en vez de OFFSET: no hay COUNT y
+cada página es un seek sobre el índice product_catalog_seek_idx, sin importar
+qué tan abajo haya llegado el scroll. El scroll infinito
+la sirve con ETag/Last-Modified, así el navegador recibe 304 si no cambió.
+Los signals (products/signals.py) y las escrituras masivas llaman a
+invalidate_catalog_cache; CATALOG_CACHE_SECONDS acota la vida de cada página, y
+las filas vencidas se borran al guardar una nueva.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CatalogPageSnapshot, Product, ProductVariant
+from .reference_data import get_reference_data
+
+CATALOG_PAGE_SIZE = 12
+
+
+def encode_cursor(product):
+    """Cursor opaco (created_at, id) del último producto de una página."""
+    return _encode_position(product.created_at, product.id)
+
+
+def _encode_position(created_at, product_id):
+    raw = f"{created_at.isoformat()}|{product_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) del cursor, o None si está vacío o no es válido (primera página)."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, product_id = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        product_id = int(product_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, product_id
+
+
+def build_catalog_page(product_type, category=None, cursor=None, page_size=CATALOG_PAGE_SIZE):
+    """
+    Construye el contenido de una página: productos, variantes por producto y el
+    cursor de la siguiente. Se piden page_size + 1 productos para saber si hay más.
+    """
+    products_query = Product.objects.filter(
+        product_type=product_type,
+        is_active=True,
+        is_online=True,
+        variant_count__gt=0
+    ).order_by('-created_at', '-id')
+    if category is not None:
+        products_query = products_query.filter(categories=category)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, product_id = position
+        products_query = products_query.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=product_id)
+        )
+
+    products = list(products_query[:page_size + 1])
+    has_next = len(products) > page_size
+    products = products[:page_size]
+
+    # Filas planas: tamaño/material/color salen del caché de referencia, sin JOINs
+    reference = get_reference_data()
+    variants_data = {product.id: [] for product in products}
+    variants = ProductVariant.objects.filter(
+        product_id__in=variants_data.keys()
+    ).order_by('product_id', 'id').values_list(
+        'id', 'product_id', 'size_id', 'material_id', 'color_id', 'price', 'stock'
+    )
+    for variant_id, product_id, size_id, material_id, color_id, price, stock in variants:
+        size = reference.size(size_id)
+        material = reference.material(material_id)
+        color = reference.color(color_id)
+        variants_data[product_id].append({
+            'id': variant_id,
+            'size_id': size_id,
+            'size_name': size.name if size else "",
+            'material_id': material_id,
+            'color_name': color.name if color else "Estándar",
+            'material_name': material.name if material else "",
+            'color_id': color_id,
+            'price': float(price),
+            'stock': stock
+        })
+
+    products_list = [
+        {
+            'id': product.id,
+            'name': product.name,
+            'description': product.description or "",
+            'image_url': product.card_url,
+            'thumb_url': product.thumb_url,
+            'image_srcset': product.get_image_srcset(),
+            'min_price': float(product.min_price) if product.min_price is not None else None,
+        }
+        for product in products
+    ]
+
+    return {
+        'products': products_list,
+        'variants': variants_data,
+        'has_next': has_next,
+        'next_cursor': encode_cursor(products[-1]) if has_next else None,
+    }
+
+
+def _expiry_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'CATALOG_CACHE_SECONDS', 300))
+
+
+def _is_fresh(snapshot):
+    return snapshot.built_at >= _expiry_cutoff()
+
+
+def get_catalog_page(product_type, category=None, cursor=''):
+    """
+    Retorna el CatalogPageSnapshot de la página (lo construye si falta o venció).
+    Con CATALOG_CACHE_ENABLED=False construye una instancia sin guardarla.
+    """
+    # Un cursor inválido o no canónico equivale a la primera página (misma entrada
+    # de caché). Uno bien formado solo se guarda si apunta a un producto real: así
+    # cada fila corresponde a un cursor que el servidor pudo emitir
+    enabled = getattr(settings, 'CATALOG_CACHE_ENABLED', True)
+    position = decode_cursor(cursor)
+    if position is None or _encode_position(*position) != cursor:
+        cursor = ''
+    elif enabled:
+        created_at, product_id = position
+        enabled = Product.objects.filter(id=product_id, created_at=created_at).exists()
+    key = {
+        'product_type': product_type,
+        'category_slug': category.slug if category is not None else '',
+        'cursor': cursor,
+    }
+
+    if enabled:
+        snapshot = CatalogPageSnapshot.objects.filter(**key).first()
+        if snapshot is not None and _is_fresh(snapshot):
+            return snapshot
+
+    start = time.monotonic()
+    page = build_catalog_page(product_type, category, cursor)
+    payload = json.dumps(page, cls=DjangoJSONEncoder)
+    defaults = {
+        'payload': payload,
+        'etag': hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32],
+        'built_at': timezone.now(),
+        'build_ms': int((time.monotonic() - start) * 1000),
+    }
+    # Una página vacía después de la primera no existe: se responde sin guardarla
+    if not enabled or (cursor and not page['products']):
+        return CatalogPageSnapshot(**key, **defaults)
+
+    # Las filas vencidas no se vuelven a servir: se borran en vez de acumularse
+    CatalogPageSnapshot.objects.filter(built_at__lt=_expiry_cutoff()).delete()
+    try:
+        snapshot, _ = CatalogPageSnapshot.objects.update_or_create(**key, defaults=defaults)
+    except IntegrityError:
+        # Otro proceso la construyó al mismo tiempo
+        snapshot = CatalogPageSnapshot.objects.get(**key)
+    return snapshot
+
+
+def invalidate_catalog_cache(product_type=None):
+    """Descarta las páginas en caché (de un tipo de producto, o todas)."""
+    snapshots = CatalogPageSnapshot.objects.all()
+    if product_type:
+        snapshots = snapshots.filter(product_type=product_type)
+    snapshots.delete()
+
+
+def catalog_cache_receiver(sender, raw=False, **kwargs):
+    """
+    Receiver de signals. Descarta todo: un producto puede haber cambiado de tipo
+    y categorías/colores afectan a todas las páginas.
+    """
+    if raw:
+        return
+    invalidate_catalog_cache()
@@ -0,0 +1,175 @@
+"""
+Caché local de imágenes de producto para el generador de catálogos.
+
+Antes cada página descargaba sus imágenes una por una (requests.get sin sesión) y
+regenerar el mismo catálogo las volvía a bajar todas. ImageCache.fetch_all trae las
+imágenes de todos los productos en paralelo, con una sesión HTTP compartida (o
+leyendo directo del disco si el storage es local), y las guarda ya decodificadas y
+reducidas al tamaño máximo de la tarjeta en un directorio local:
+
+    cache = ImageCache(directorio, max_bytes=500 * 1024 * 1024)
+    rutas = cache.fetch_all([(nombre_en_storage, url_o_ruta), ...])  # {nombre: ruta local}
+
+Cada entrada es `<sha1(nombre)>.png` (la imagen reducida, para los rasters),
+`<sha1(nombre)>.src` (los bytes originales tal como vinieron, para el PDF vectorial,
+que los incrusta sin pasar por el PNG; ver original_path) y `<sha1(nombre)>.etag`
+con el validador del origen (ETag o Last-Modified de S3, mtime+tamaño en disco
+local). En la siguiente
+generación se revalida con una petición condicional (304 = se usa la copia local) y
+si el archivo cambió se reemplaza. Al pasar de max_bytes se borran las entradas
+usadas hace más tiempo (LRU por mtime, que se actualiza en cada acierto).
+
+Como catalog_render, no importa Django.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests as http_requests
+from PIL import Image
+
+# La tarjeta más grande del catálogo (una sola por página) mide 960x1430 útiles
+MAX_IMAGE_SIZE = (960, 1430)
+
+
+class ImageCache:
+    def __init__(self, directory, max_bytes, workers=8, timeout=10, max_size=MAX_IMAGE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_size = max_size
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def fetch_all(self, sources):
+        """
+        Trae (o revalida) cada imagen y retorna {nombre: ruta local}. Las que no se
+        pudieron obtener no aparecen: el catálogo las muestra como "Sin imagen".
+        """
+        sources = dict(sources)
+        if not sources:
+            return {}
+        os.makedirs(self.directory, exist_ok=True)
+
+        session = http_requests.Session()
+        adapter = http_requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                paths = pool.map(lambda item: self._fetch(session, *item), sources.items())
+                found = {name: path for name, path in zip(sources, paths) if path}
+        finally:
+            session.close()
+
+        self.evict(keep=set(found.values()))
+        return found
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    # ── Entradas ──────────────────────────────────────────────────────
+    def _entry(self, name):
+        key = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f'{base}.png', f'{base}.etag'
+
+    @staticmethod
+    def original_path(image_path):
+        """Bytes originales de una entrada retornada por fetch_all."""
+        return f'{image_path[:-len(".png")]}.src'
+
+    def _cached_etag(self, image_path, etag_path):
+        if not (os.path.exists(image_path) and os.path.exists(self.original_path(image_path))):
+            return None
+        try:
+            with open(etag_path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _hit(self, image_path):
+        os.utime(image_path)  # LRU: marca el uso
+        self._count('hits')
+        return image_path
+
+    def _store(self, image_path, etag_path, data, etag):
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert('RGBA')
+        img.thumbnail(self.max_size, Image.LANCZOS)
+        tmp = f'{image_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        img.save(tmp, format='PNG', compress_level=1)
+        with open(f'{tmp}.src', 'wb') as f:
+            f.write(data)
+        with open(f'{tmp}.etag', 'w', encoding='utf-8') as f:
+            f.write(etag)
+        os.replace(f'{tmp}.src', self.original_path(image_path))
+        os.replace(f'{tmp}.etag', etag_path)
+        os.replace(tmp, image_path)
+        self._count('misses')
+        return image_path
+
+    def _fetch(self, session, name, source):
+        image_path, etag_path = self._entry(name)
+        cached_etag = self._cached_etag(image_path, etag_path)
+        try:
+            if not source.startswith('http'):
+                # Storage local: lectura directa, el validador sale de stat()
+                stat = os.stat(source)
+                etag = f'{stat.st_mtime_ns}-{stat.st_size}'
+                if etag == cached_etag:
+                    return self._hit(image_path)
+                with open(source, 'rb') as f:
+                    return self._store(image_path, etag_path, f.read(), etag)
+
+            headers = {}
+            if cached_etag:
+                is_etag = cached_etag.startswith(('"', 'W/'))
+                headers['If-None-Match' if is_etag else 'If-Modified-Since'] = cached_etag
+            resp = session.get(source, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304 and cached_etag:
+                return self._hit(image_path)
+            if resp.status_code != 200:
+                self._count('errors')
+                return None
+            etag = resp.headers.get('ETag') or resp.headers.get('Last-Modified') or hashlib.sha1(resp.content).hexdigest()
+            return self._store(image_path, etag_path, resp.content, etag)
+        except Exception:
+            self._count('errors')
+            return None
+
+    # ── Límite de tamaño ─────────────────────────────────────────────
+    def evict(self, keep=()):
+        """Borra las imágenes menos usadas hasta quedar bajo max_bytes (nunca las de `keep`)."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.png'):
+                    continue
+                stat = entry.stat()
+                try:
+                    size = stat.st_size + os.path.getsize(self.original_path(entry.path))
+                except OSError:
+                    size = stat.st_size
+                total += size
+                entries.append((stat.st_mtime, size, entry.path))
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            for victim in (path, self.original_path(path), path[:-len('.png')] + '.etag'):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.stats['evicted'] += 1
+        return total
@@ -0,0 +1,311 @@
+"""
+Importación offline de diseños al catálogo desde un directorio o un ZIP local
+(ver `manage.py import_catalog`). Reemplaza el flujo de BULK_UPLOAD_PRODUCTION.md
+de pasar cada archivo por el formulario web:
+- recorre la fuente como stream (os.walk / miembros del ZIP, sin descomprimir todo),
+- hashea y sube los archivos a storage en paralelo con un pool acotado,
+- crea los productos por bloques con bulk_create (una consulta por bloque),
+- guarda un checkpoint JSON después de cada bloque para poder reanudar.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.core.files import File
+from django.db import transaction
+
+from .models import PreviewJob, Product
+from .previews import PREVIEW_IMAGE_EXTENSIONS, _spool_threshold
+from .search import PRODUCT, index_ids
+from .services import sincronizar_variantes_producto
+from .tasks import build_upload_product
+
+logger = logging.getLogger(__name__)
+
+IMPORT_EXTENSIONS = ('.pdf',) + PREVIEW_IMAGE_EXTENSIONS
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ImportEntry:
+    """Archivo de la fuente: `key` es su ruta relativa (identifica la entrada en el checkpoint)."""
+    key: str
+    filename: str
+    size: int
+    opener: object
+
+
+@dataclass
+class StagedFile:
+    """Archivo volcado a un temporal (RAM o disco) con su SHA-256 calculado en la misma pasada."""
+    entry: ImportEntry
+    spool: object = None
+    content_hash: str = ''
+    stored_name: str = ''
+    error: str = ''
+
+
+@dataclass
+class ChunkResult:
+    created: dict = field(default_factory=dict)      # key -> product_id
+    duplicates: list = field(default_factory=list)   # keys
+    failed: dict = field(default_factory=dict)       # key -> error
+    bytes_read: int = 0
+
+
+def _is_importable(name):
+    base = os.path.basename(name)
+    if not base or base.startswith('.') or '__MACOSX' in name:
+        return False
+    return os.path.splitext(base)[1].lower() in IMPORT_EXTENSIONS
+
+
+def iter_directory(root):
+    """Entradas de un directorio (recursivo, orden estable)."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            key = os.path.relpath(path, root).replace(os.sep, '/')
+            if not _is_importable(key):
+                continue
+            yield ImportEntry(
+                key=key,
+                filename=filename,
+                size=os.path.getsize(path),
+                opener=lambda path=path: open(path, 'rb'),
+            )
+
+
+def iter_zip(archive):
+    """Entradas de un ZIP abierto: cada miembro se lee como stream al procesarlo."""
+    for info in archive.infolist():
+        if info.is_dir() or not _is_importable(info.filename):
+            continue
+        yield ImportEntry(
+            key=info.filename,
+            filename=os.path.basename(info.filename),
+            size=info.file_size,
+            opener=lambda info=info: archive.open(info),
+        )
+
+
+class ImportCheckpoint:
+    """
+    Estado reanudable de una importación: {"entries": {key: {"status", "product_id", "error"}}}.
+    Se reescribe de forma atómica (archivo temporal + os.replace).
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.entries = {}
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+
+    def is_done(self, key, retry_failed=False):
+        state = self.entries.get(key)
+        if not state:
+            return False
+        return not (retry_failed and state['status'] == 'failed')
+
+    def record(self, result):
+        for key, product_id in result.created.items():
+            self.entries[key] = {'status': 'created', 'product_id': product_id}
+        for key in result.duplicates:
+            self.entries[key] = {'status': 'duplicate'}
+        for key, error in result.failed.items():
+            self.entries[key] = {'status': 'failed', 'error': error}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def _stage(entry):
+    """Copia la entrada a un SpooledTemporaryFile por bloques calculando el SHA-256."""
+    staged = StagedFile(entry=entry)
+    try:
+        digest = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(max_size=_spool_threshold())
+        with entry.opener() as stream:
+            while True:
+                chunk = stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                spool.write(chunk)
+        spool.seek(0)
+        staged.spool = spool
+        staged.content_hash = digest.hexdigest()
+    except Exception as e:
+        staged.error = str(e)
+    return staged
+
+
+def _upload(staged):
+    """Sube el archivo a la ruta de Product.source_file (S3 en producción)."""
+    try:
+        source_field = Product._meta.get_field('source_file')
+        name = source_field.generate_filename(None, staged.entry.filename)
+        staged.stored_name = source_field.storage.save(name, File(staged.spool, name=staged.entry.filename))
+    except Exception as e:
+        staged.error = str(e)
+    return staged
+
+
+def _discard(staged_files):
+    for staged in staged_files:
+        if staged.spool is not None:
+            staged.spool.close()
+            staged.spool = None
+
+
+def import_chunk(entries, product_type, executor):
+    """
+    Importa un bloque de entradas:
+    1. hashea en paralelo, 2. descarta duplicados con dos consultas (hash / referencia),
+    3. sube los nuevos en paralelo, 4. bulk_create de productos y trabajos de preview,
+    5. genera variantes (los signals no corren con bulk_create).
+    """
+    result = ChunkResult()
+    staged_files = list(executor.map(_stage, entries))
+    try:
+        candidates = []
+        for staged in staged_files:
+            result.bytes_read += staged.entry.size
+            if staged.error:
+                result.failed[staged.entry.key] = staged.error
+            else:
+                candidates.append(staged)
+
+        # Duplicados: mismo contenido (SHA-256) o misma referencia (nombre sin extensión),
+        # igual que la carga masiva web
+        hashes = {staged.content_hash for staged in candidates}
+        references = {os.path.splitext(staged.entry.filename)[0] for staged in candidates}
+        seen_hashes = set(
+            Product.objects.filter(source_hash__in=hashes).values_list('source_hash', flat=True)
+        )
+        seen_references = set(
+            Product.objects.filter(name__in=references).values_list('name', flat=True)
+        )
+
+        to_upload = []
+        for staged in candidates:
+            reference = os.path.splitext(staged.entry.filename)[0]
+            if staged.content_hash in seen_hashes or reference in seen_references:
+                result.duplicates.append(staged.entry.key)
+                continue
+            seen_hashes.add(staged.content_hash)
+            seen_references.add(reference)
+            to_upload.append(staged)
+
+        uploaded = []
+        for staged in executor.map(_upload, to_upload):
+            if staged.error:
+                result.failed[staged.entry.key] = staged.error
+            else:
+                uploaded.append(staged)
+
+        if not uploaded:
+            return result
+
+        products = []
+        for staged in uploaded:
+            product = build_upload_product(staged.entry.filename, product_type, source_hash=staged.content_hash)
+            product.source_file = staged.stored_name
+            products.append(product)
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                # MySQL no retorna los ids de bulk_create: se recuperan por hash (único en el bloque)
+                ids_by_hash = dict(
+                    Product.objects.filter(source_hash__in=[p.source_hash for p in products])
+                    .order_by('id')
+                    .values_list('source_hash', 'id')
+                )
+                PreviewJob.objects.bulk_create(
+                    [PreviewJob(product_id=ids_by_hash[p.source_hash]) for p in products]
+                )
+        except Exception as e:
+            logger.exception("Falló el bulk_create del bloque")
+            storage = Product._meta.get_field('source_file').storage
+            for staged in uploaded:
+                storage.delete(staged.stored_name)
+                result.failed[staged.entry.key] = str(e)
+            return result
+
+        for staged, product in zip(uploaded, products):
+            product.id = ids_by_hash[product.source_hash]
+            result.created[staged.entry.key] = product.id
+            try:
+                sincronizar_variantes_producto(product)
+            except Exception:
+                logger.exception("No se pudieron generar variantes para el producto #%d", product.id)
+        # bulk_create no dispara signals: se indexan para la búsqueda de texto
+        index_ids(PRODUCT, ids_by_hash.values())
+        return result
+    finally:
+        _discard(staged_files)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_import(entries, product_type, checkpoint, workers=4, chunk_size=50, retry_failed=False, on_chunk=None):
+    """
+    Importa las entradas pendientes por bloques, guardando el checkpoint tras cada uno.
+    `on_chunk(result, totals)` permite reportar progreso. Retorna los totales.
+    """
+    totals = {'created': 0, 'duplicates': 0, 'failed': 0, 'skipped': 0, 'files': 0, 'bytes': 0}
+
+    def pending():
+        for entry in entries:
+            if checkpoint.is_done(entry.key, retry_failed=retry_failed):
+                totals['skipped'] += 1
+                continue
+            yield entry
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk in chunked(pending(), chunk_size):
+            result = import_chunk(chunk, product_type, executor)
+            checkpoint.record(result)
+            checkpoint.save()
+
+            totals['created'] += len(result.created)
+            totals['duplicates'] += len(result.duplicates)
+            totals['failed'] += len(result.failed)
+            totals['files'] += len(chunk)
+            totals['bytes'] += result.bytes_read
+            if on_chunk:
+                on_chunk(result, totals)
+    return totals
+
+
+def open_source_entries(source):
+    """
+    Retorna (entries, closer) para un directorio o un ZIP.
+    `closer()` libera el ZIP al terminar.
+    """
+    if os.path.isdir(source):
+        return iter_directory(source), lambda: None
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        return iter_zip(archive), archive.close
+    raise ValueError(f"{source} no es un directorio ni un archivo ZIP")
@@ -0,0 +1,941 @@
+"""
+Motor de render del catálogo formato historia (1080x1920).
+
+Cada página pasa una sola vez por el layout (layout_page): a partir de una
+especificación simple (dicts con nombres, categorías y la ruta/URL de la imagen, sin
+modelos ni consultas) se calcula la lista de operaciones de dibujo (textos ya
+posicionados, formas e imágenes con su caja final). De esa misma lista salen todos
+los formatos pedidos en OUTPUT_FORMATS:
+
+  - 'pdf': página rasterizada y comprimida en JPEG (PDFStreamWriter).
+  - 'pdf_vector': textos como texto con las fuentes Poppins incrustadas, formas
+    como vectores y cada imagen (fondos de capa y fotos de producto) escrita una
+    sola vez en el archivo (VectorPDFWriter).
+  - 'webp' / 'jpeg': un cuadro por página para historias de Instagram/WhatsApp,
+    escritos uno a uno en un ZIP (FrameZipWriter).
+
+    specs = catalog_page_specs(nombre, tipo, telefono, products)
+    render_catalog(specs, {'pdf': archivo_pdf, 'webp': archivo_zip}, workers=4, max_in_flight=8)
+
+El layout y el rasterizado corren en un pool de procesos; la página rasterizada se
+codifica una vez por cada codificación que necesiten los formatos pedidos (el JPEG
+sirve para el PDF y para el ZIP de JPEG), y si sólo se pide el PDF vectorial no se
+rasteriza nada. Los archivos se escriben página por página, así que en memoria sólo
+hay las páginas en vuelo (max_in_flight), no el catálogo completo.
+
+El fondo y los elementos fijos de cada tipo de página (capas) se dibujan una sola vez
+y se guardan en memoria y en layer_dir; cada página copia su capa y dibuja encima
+sólo nombre, imagen, categorías y teléfono.
+
+Este módulo no importa Django ni consulta la BD: lo que corre en los workers sólo
+necesita PIL y requests.
+"""
+import hashlib
+import io
+import math
+import os
+import struct
+import zipfile
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import requests as http_requests
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
+
+# ── Constantes de diseño ──────────────────────────────────────────────
+W, H = 1080, 1920  # Instagram Story 9:16
+
+# Paleta minimalista lavanda
+LAVENDER_LIGHT = (230, 220, 245)
+LAVENDER       = (200, 180, 220)
+LAVENDER_DARK  = (150, 130, 180)
+PURPLE_SOFT    = (120, 90, 160)
+PURPLE_DEEP    = (80, 50, 120)
+TEAL           = (64, 180, 180)
+TEAL_SOFT      = (100, 200, 200)
+WHITE          = (255, 255, 255)
+WHITE_90       = (255, 255, 255, 230)
+WHITE_70       = (255, 255, 255, 180)
+WHITE_50       = (255, 255, 255, 128)
+DARK_TEXT      = (60, 40, 80)
+
+# ── Helpers ───────────────────────────────────────────────────────────
+# Relativo al paquete (= BASE_DIR/static/fonts): los workers no cargan Django
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'fonts')
+
+
+def _font_path(weight):
+    # static/fonts no trae Poppins-Medium: se usa la Regular (la misma que se incrusta en el PDF vectorial)
+    path = os.path.join(FONT_DIR, f'Poppins-{weight}.ttf')
+    return path if os.path.exists(path) else os.path.join(FONT_DIR, 'Poppins-Regular.ttf')
+
+
+@lru_cache(maxsize=None)
+def _font(weight='Regular', size=40):
+    # Memoizado: cada página pide las mismas ~10 combinaciones de peso/tamaño
+    try:
+        return ImageFont.truetype(_font_path(weight), size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _gradient_smooth(size, color_top, color_bottom, blur=(3,)):
+    """
+    Genera un gradiente vertical suave con mejor difuminado.
+
+    Como cada fila es de un solo color, el gradiente y sus desenfoques se calculan
+    sobre una columna de 1px y se estiran al ancho final: el mismo resultado que
+    dibujar línea por línea y desenfocar la página completa.
+    """
+    w, h = size
+    column = Image.new('RGB', (1, h))
+    colors = []
+    for y in range(h):
+        ratio = y / h
+        ratio = ratio * ratio * (3 - 2 * ratio)
+        colors.append(tuple(
+            int(top + (bottom - top) * ratio) for top, bottom in zip(color_top, color_bottom)
+        ))
+    column.putdata(colors)
+    for radius in blur:
+        column = column.filter(ImageFilter.GaussianBlur(radius=radius))
+    return column.resize((w, h), Image.NEAREST)
+
+
+def _text_width(text, font):
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
+
+
+def _center_text(text, y, weight, size, fill, width=W):
+    x = (width - _text_width(text, _font(weight, size))) // 2
+    return ('text', x, y, text, weight, size, fill)
+
+
+def _wrap_text(text, font, max_width):
+    words = text.split()
+    lines = []
+    current = ""
+    for word in words:
+        test = f"{current} {word}".strip()
+        if _text_width(test, font) <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _load_product_image(source):
+    if not source:
+        return None
+    try:
+        if source.startswith('http'):
+            resp = http_requests.get(source, timeout=10)
+            if resp.status_code == 200:
+                return Image.open(io.BytesIO(resp.content)).convert('RGBA')
+        elif os.path.exists(source):
+            return Image.open(source).convert('RGBA')
+    except Exception:
+        pass
+    return None
+
+
+def _product_image_size(source):
+    """Tamaño de la imagen leyendo sólo su cabecera (None si no se puede abrir)."""
+    if not source:
+        return None
+    if source.startswith('http'):
+        # Sin ImageCache la URL se descarga aquí y otra vez al dibujar; el flujo
+        # normal (catalog_page_specs con image_cache) siempre trae rutas locales.
+        img = _load_product_image(source)
+        return img.size if img else None
+    try:
+        with Image.open(source) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _draw_soft_glow(img, cx, cy, radius, color, alpha=30):
+    glow = Image.new('RGBA', (radius * 2, radius * 2), (0, 0, 0, 0))
+    glow_draw = ImageDraw.Draw(glow)
+    for i in range(radius, 0, -3):
+        a = int(alpha * (i / radius) ** 2)
+        glow_draw.ellipse([radius - i, radius - i, radius + i, radius + i],
+                          fill=(*color[:3], a))
+    glow = glow.filter(ImageFilter.GaussianBlur(radius=radius // 3))
+    img.paste(glow, (cx - radius, cy - radius), glow)
+
+
+def _arrow_down(cx, cy, size, color):
+    half = size // 2
+    return ('polygon', ((cx, cy + half), (cx - half, cy - half), (cx + half, cy - half)), color)
+
+
+def _whatsapp_icon(cx, cy, size, color):
+    outer_r = size // 2
+    inner_r = size // 2 - 4
+    phone_size = size // 3
+    bubble_x = cx + size // 4
+    bubble_y = cy + size // 3
+    return [
+        ('ellipse', (cx - outer_r, cy - outer_r, cx + outer_r, cy + outer_r), color),
+        ('ellipse', (cx - inner_r + 3, cy - inner_r + 3, cx + inner_r - 3, cy + inner_r - 3), color),
+        ('arc', (cx - phone_size, cy - phone_size, cx + phone_size, cy + phone_size), 200, 340, WHITE, 4),
+        ('polygon', ((bubble_x, bubble_y), (bubble_x - 8, bubble_y + 12), (bubble_x + 4, bubble_y + 8)), color),
+    ]
+
+
+# ── Operaciones de dibujo ─────────────────────────────────────────────
+# El layout de una página es una lista de tuplas en coordenadas de píxel de la
+# historia (y hacia abajo), las mismas que recibe ImageDraw:
+#   ('text', x, y, texto, peso, tamaño, color)      y = línea superior (ascendente)
+#   ('rect', caja, color)
+#   ('rrect', caja, radio, relleno | None, borde | None)   borde de 1px
+#   ('polygon', puntos, color)
+#   ('ellipse', caja, color)
+#   ('arc', caja, inicio, fin, color, grosor)        grados, sentido horario
+#   ('image', (x, y, ancho, alto), origen, original) origen = ruta o URL; original = bytes
+#                                                    originales para el PDF vectorial (o None)
+# Se pasan entre procesos tal cual, así que sólo contienen tipos simples.
+Layout = namedtuple('Layout', 'layer ops')  # layer = (nombre de la capa, args)
+
+
+def _draw_ops(page, ops):
+    """Rasteriza las operaciones sobre `page` (RGBA)."""
+    draw = ImageDraw.Draw(page, 'RGBA')
+    for op in ops:
+        kind = op[0]
+        if kind == 'text':
+            _, x, y, text, weight, size, fill = op
+            draw.text((x, y), text, font=_font(weight, size), fill=fill)
+        elif kind == 'rect':
+            draw.rectangle(op[1], fill=op[2])
+        elif kind == 'rrect':
+            _, box, radius, fill, outline = op
+            draw.rounded_rectangle(box, radius=radius, fill=fill, outline=outline, width=1)
+        elif kind == 'polygon':
+            draw.polygon(op[1], fill=op[2])
+        elif kind == 'ellipse':
+            draw.ellipse(op[1], fill=op[2])
+        elif kind == 'arc':
+            _, box, start, end, fill, width = op
+            draw.arc(box, start=start, end=end, fill=fill, width=width)
+        elif kind == 'image':
+            _, (x, y, width, height), source, _ = op
+            product_img = _load_product_image(source)
+            if product_img:
+                product_img = product_img.resize((width, height), Image.LANCZOS)
+                page.paste(product_img, (x, y), product_img)
+    return page
+
+
+# ── Capas fijas ───────────────────────────────────────────────────────
+# Fondo, brillos y textos fijos de cada tipo de página son idénticos en todas las
+# páginas de todos los catálogos: se dibujan una vez por proceso (o se leen del
+# disco, compartidas entre workers) y cada página sólo dibuja su contenido encima.
+# El PDF vectorial incrusta sólo el fondo (gradiente y brillos) y dibuja los
+# elementos fijos como vectores.
+# Subir LAYER_VERSION al cambiar el dibujo de una capa invalida las guardadas.
+LAYER_VERSION = 2
+_LAYER_KEY = hashlib.sha1(repr((
+    LAYER_VERSION, W, H, LAVENDER_LIGHT, LAVENDER, LAVENDER_DARK, PURPLE_SOFT, PURPLE_DEEP,
+    TEAL, TEAL_SOFT, WHITE, WHITE_90, WHITE_70, WHITE_50,
+)).encode()).hexdigest()[:12]
+
+_layer_dir = None
+_layers = {}
+
+CARD_MARGIN = 35
+CARD_W = W - CARD_MARGIN * 2
+CARD_RADIUS = 25
+CARD_INFO_H = 200
+
+# El teléfono cambia por catálogo: se dibuja sobre la capa, en estas alturas
+COVER_PHONE_Y = H - 180
+BACK_PHONE_Y = 960
+
+
+def configure_layer_cache(directory):
+    """Directorio donde guardar las capas entre procesos (None = sólo en memoria)."""
+    global _layer_dir
+    _layer_dir = directory
+
+
+def _layer(name, *args):
+    """Copia de la capa `name` (fondo + elementos fijos), dibujándola (y guardándola) la primera vez."""
+    key = '-'.join([name, *map(str, args), _LAYER_KEY])
+    layer = _layers.get(key)
+    if layer is None:
+        path = os.path.join(_layer_dir, f'{key}.png') if _layer_dir else None
+        if path and os.path.exists(path):
+            try:
+                with Image.open(path) as img:
+                    layer = img.convert('RGBA')
+            except OSError:
+                layer = None
+        if layer is None:
+            background, fixed_ops = LAYERS[name]
+            layer = _draw_ops(background(), fixed_ops(*args))
+            if path:
+                os.makedirs(_layer_dir, exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                layer.save(tmp_path, format='PNG', compress_level=1)
+                os.replace(tmp_path, path)
+        _layers[key] = layer
+    return layer.copy()
+
+
+def _card_slots(count):
+    """(y, alto) de cada tarjeta de producto en una página con `count` productos."""
+    card_h = 1680 if count == 1 else 820
+    return [(130 + idx * (card_h + 25), card_h) for idx in range(count)]
+
+
+def _cover_background():
+    page = _gradient_smooth((W, H), LAVENDER_LIGHT, LAVENDER_DARK, blur=(3, 5)).convert('RGBA')
+    _draw_soft_glow(page, W - 150, 200, 250, LAVENDER, 15)
+    _draw_soft_glow(page, 150, H - 400, 200, PURPLE_SOFT, 12)
+    return page
+
+
+def _cover_ops():
+    y = 200
+    footer_y = H - 280
+    line_w = 200
+    return [
+        _center_text("JEMA", y, 'Bold', 48, PURPLE_DEEP),
+        _center_text("Stickers", y + 55, 'Light', 28, PURPLE_SOFT),
+        ('rect', ((W - line_w) // 2, footer_y, (W + line_w) // 2, footer_y + 3), TEAL),
+        _center_text("VENTA EXCLUSIVA MAYORISTAS", footer_y + 40, 'Medium', 26, PURPLE_DEEP),
+        _center_text("2025", H - 80, 'Light', 24, PURPLE_SOFT),
+    ]
+
+
+def _product_background():
+    return _gradient_smooth((W, H), LAVENDER_LIGHT, LAVENDER, blur=(3, 4)).convert('RGBA')
+
+
+def _product_ops(count):
+    ops = [
+        ('rect', (0, 0, W, 100), (*PURPLE_DEEP, 240)),
+        ('text', 40, 28, "JEMA", 'Bold', 38, WHITE),
+    ]
+    for card_y, card_h in _card_slots(count):
+        box = (CARD_MARGIN, card_y, CARD_MARGIN + CARD_W, card_y + card_h)
+        info_y = card_y + card_h - CARD_INFO_H
+        ops += [
+            ('rrect', box, CARD_RADIUS, WHITE, None),
+            ('rrect', box, CARD_RADIUS, None, (*LAVENDER_DARK, 80)),
+            ('rect', (CARD_MARGIN + 30, info_y, CARD_MARGIN + CARD_W - 30, info_y + 3), TEAL),
+        ]
+
+    footer_y = H - 55
+    ops += [
+        ('rect', (0, footer_y, W, H), (*PURPLE_DEEP, 200)),
+        _center_text("JEMA · Stickers que destacan tu negocio", footer_y + 14, 'Medium', 20, WHITE_90),
+    ]
+    return ops
+
+
+def _back_cover_background():
+    page = _gradient_smooth((W, H), LAVENDER, PURPLE_SOFT, blur=(3, 5)).convert('RGBA')
+    _draw_soft_glow(page, W // 2, H // 2 - 100, 350, LAVENDER_LIGHT, 20)
+    return page
+
+
+def _back_cover_ops():
+    y = 550
+    ops = [_center_text("¡Gracias!", y, 'ExtraBold', 90, WHITE)]
+
+    y += 130
+    line_w = 150
+    ops.append(('rect', ((W - line_w) // 2, y, (W + line_w) // 2, y + 4), TEAL))
+
+    y += 50
+    ops.append(_center_text("¿Te interesa algún diseño?", y, 'Regular', 36, WHITE_90))
+    y += 55
+    ops.append(_center_text("Contáctanos, con gusto te asesoramos", y, 'Light', 28, WHITE_70))
+
+    ops += [
+        _center_text("WHATSAPP", BACK_PHONE_Y - 55, 'SemiBold', 28, TEAL_SOFT),
+        _center_text("JEMA", H - 200, 'Bold', 50, WHITE_50),
+        _center_text("Stickers que destacan tu negocio", H - 140, 'Light', 24, WHITE_50),
+        _center_text("2025", H - 80, 'Light', 22, WHITE_50),
+    ]
+    return ops
+
+
+# nombre -> (fondo rasterizado, operaciones fijas)
+LAYERS = {
+    'cover': (_cover_background, _cover_ops),
+    'products': (_product_background, _product_ops),
+    'back': (_back_cover_background, _back_cover_ops),
+}
+
+
+# ── Páginas ───────────────────────────────────────────────────────────
+def _layout_cover(catalog_name, catalog_type, phone, product_count):
+    ops = []
+    y = 480
+    lines = _wrap_text(catalog_name.upper(), _font('ExtraBold', 72), W - 120)
+    for line in lines[:3]:
+        ops.append(_center_text(line, y, 'ExtraBold', 72, PURPLE_DEEP))
+        y += 90
+
+    y += 30
+    ops.append(_center_text(catalog_type, y, 'Medium', 36, TEAL))
+
+    y += 100
+    ops.append(_center_text(f"{product_count} productos", y, 'SemiBold', 32, WHITE))
+
+    arrow_y = y + 100
+    ops.append(_arrow_down(W // 2, arrow_y, 30, TEAL))
+
+    icon_size = 36
+    icon_cx = W // 2 - 130
+    ops += _whatsapp_icon(icon_cx, COVER_PHONE_Y + 20, icon_size, TEAL)
+    ops.append(('text', icon_cx + 40, COVER_PHONE_Y, phone, 'Bold', 42, PURPLE_DEEP))
+
+    return Layout(('cover', ()), ops)
+
+
+def _layout_product_page(product1, product2, page_num, total_pages):
+    products = [p for p in [product1, product2] if p is not None]
+
+    page_text = f"{page_num}/{total_pages}"
+    ops = [('text', W - _text_width(page_text, _font('Medium', 26)) - 40, 34, page_text, 'Medium', 26, WHITE_70)]
+
+    for product, (card_y, card_h) in zip(products, _card_slots(len(products))):
+        img_area_h = card_h - CARD_INFO_H - 30
+        img_area_y = card_y + 20
+        img_size = _product_image_size(product['image'])
+
+        if img_size:
+            max_w = CARD_W - 50
+            max_h = img_area_h - 20
+            img_w, img_h = img_size
+            ratio = min(max_w / img_w, max_h / img_h)
+            new_w = int(img_w * ratio)
+            new_h = int(img_h * ratio)
+
+            img_x = CARD_MARGIN + (CARD_W - new_w) // 2
+            img_y = img_area_y + (img_area_h - new_h) // 2
+            ops.append(('image', (img_x, img_y, new_w, new_h), product['image'], product.get('original')))
+        else:
+            ops.append(_center_text("Sin imagen", img_area_y + img_area_h // 2 - 15, 'Regular', 32, LAVENDER_DARK))
+
+        info_y = card_y + card_h - CARD_INFO_H
+
+        cats = product['categories']
+        cat_text = " · ".join([c.upper() for c in cats]) if cats else "GENERAL"
+        ops.append(_center_text(cat_text, info_y + 25, 'SemiBold', 26, TEAL))
+
+        ref_lines = _wrap_text(product['name'].upper(), _font('Bold', 40), CARD_W - 60)
+        ref_y = info_y + 70
+
+        for line in ref_lines[:2]:
+            ops.append(_center_text(line, ref_y, 'Bold', 40, PURPLE_DEEP))
+            ref_y += 50
+
+        ops.append(_center_text("REFERENCIA", ref_y + 15, 'Regular', 20, PURPLE_SOFT))
+
+    return Layout(('products', (len(products),)), ops)
+
+
+def _layout_back_cover(phone):
+    return Layout(('back', ()), [_center_text(phone, BACK_PHONE_Y, 'Bold', 60, WHITE)])
+
+
+# ── Especificación de páginas ─────────────────────────────────────────
+def product_card(product):
+    """Datos de un producto para su tarjeta (con categories prefetcheadas)."""
+    image = image_name = None
+    if product.image:
+        # Derivado 'story' (960px): evita descargar y reescalar la imagen completa
+        image_name = product.get_image_name('story')
+        storage = product.image.storage
+        image = storage.url(image_name)
+        if not image.startswith('http'):
+            image = storage.path(image_name)
+    return {
+        'name': product.name,
+        'categories': [c.name for c in product.categories.all()],
+        'image': image,
+        'image_name': image_name,
+        'original': None,
+    }
+
+
+def catalog_page_specs(catalog_name, catalog_type, phone, products, image_cache=None):
+    """
+    Portada, una página por cada dos productos y contraportada. Con image_cache
+    (catalog_images.ImageCache) las imágenes se traen todas antes, en paralelo, y
+    las páginas las leen de la copia local (el PDF vectorial, de los bytes originales).
+    """
+    cards = [product_card(p) for p in products]
+    if image_cache is not None:
+        local = image_cache.fetch_all((card['image_name'], card['image']) for card in cards if card['image'])
+        for card in cards:
+            card['image'] = local.get(card['image_name'])
+            card['original'] = image_cache.original_path(card['image']) if card['image'] else None
+    total_product_pages = (len(cards) + 1) // 2
+    specs = [('cover', (catalog_name, catalog_type, phone, len(cards)))]
+    for i in range(0, len(cards), 2):
+        pair = cards[i:i + 2]
+        specs.append(('products', (pair[0], pair[1] if len(pair) > 1 else None, i // 2 + 1, total_product_pages)))
+    specs.append(('back', (phone,)))
+    return specs
+
+
+PAGE_LAYOUTS = {
+    'cover': _layout_cover,
+    'products': _layout_product_page,
+    'back': _layout_back_cover,
+}
+
+# El mismo que usaba Image.save(format='PDF') con las páginas RGB
+JPEG_QUALITY = 75
+# Imágenes de producto del PDF vectorial que no son JPEG (derivados WebP, PNG)
+PRODUCT_IMAGE_QUALITY = 85
+WEBP_QUALITY = 85
+RESOLUTION = 150.0
+
+# Codificaciones de la página rasterizada: (formato PIL, extensión, opciones de save)
+FRAME_ENCODINGS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': JPEG_QUALITY}),
+    'webp': ('WEBP', 'webp', {'quality': WEBP_QUALITY, 'method': 2}),
+}
+
+RenderedPage = namedtuple('RenderedPage', 'layout width height frames')  # frames = {codificación: bytes}
+
+
+def layout_page(spec):
+    kind, args = spec
+    return PAGE_LAYOUTS[kind](*args)
+
+
+def rasterize(layout):
+    name, args = layout.layer
+    return _draw_ops(_layer(name, *args), layout.ops).convert('RGB')
+
+
+def render_page_image(spec):
+    return rasterize(layout_page(spec))
+
+
+def render_page(spec, encodings=('jpeg',)):
+    """
+    Layout de la página y, si se piden codificaciones, la página rasterizada una
+    vez y comprimida en cada una de ellas.
+    """
+    layout = layout_page(spec)
+    frames = {}
+    if encodings:
+        page = rasterize(layout)
+        for encoding in encodings:
+            pil_format, _, options = FRAME_ENCODINGS[encoding]
+            buffer = io.BytesIO()
+            page.save(buffer, format=pil_format, **options)
+            frames[encoding] = buffer.getvalue()
+    return RenderedPage(layout, W, H, frames)
+
+
+def render_pages(specs, encodings=('jpeg',), workers=1, max_in_flight=None, layer_dir=None):
+    """
+    Genera las páginas en orden. Con workers > 1 las dibuja en un pool de procesos
+    con a lo sumo max_in_flight páginas encargadas o esperando a ser escritas.
+    """
+    configure_layer_cache(layer_dir)
+    if workers <= 1:
+        for spec in specs:
+            yield render_page(spec, encodings)
+        return
+
+    max_in_flight = max(max_in_flight or workers * 2, workers)
+    # Contexto por defecto (fork en Linux): 'spawn' relanzaría sys.executable, que
+    # bajo uWSGI no es Python. Los workers no usan la conexión a la BD heredada.
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_layer_cache, initargs=(layer_dir,)) as pool:
+        pending = deque()
+        for spec in specs:
+            pending.append(pool.submit(render_page, spec, encodings))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ── Salidas ───────────────────────────────────────────────────────────
+class PDFStreamWriter:
+    """
+    PDF mínimo de una imagen JPEG por página, escrito a medida que llegan las
+    páginas: cada imagen se vuelca al archivo y sólo se guardan los offsets para
+    la tabla xref final.
+    """
+    encoding = 'jpeg'
+
+    def __init__(self, fileobj, resolution=RESOLUTION):
+        self.file = fileobj
+        self.resolution = resolution
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3  # 1 = Catalog, 2 = Pages (se escriben al cerrar)
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.file.write(data)
+
+    def _object(self, obj_id, head, stream=None):
+        self.offsets[obj_id] = self.file.tell()
+        self._write(b'%d 0 obj\n' % obj_id + head)
+        if stream is not None:
+            self._write(b'\nstream\n')
+            self._write(stream)
+            self._write(b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def _reserve(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _page(self, width, height, content, resources, filters=b''):
+        content_id, page_id = self._reserve(), self._reserve()
+        page_w = width * 72.0 / self.resolution
+        page_h = height * 72.0 / self.resolution
+        self._object(content_id, b'<< /Length %d%s >>' % (len(content), filters), content)
+        self._object(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources %s /Contents %d 0 R >>'
+            % (page_w, page_h, resources, content_id)
+        ))
+        self.page_ids.append(page_id)
+
+    def add_jpeg(self, width, height, data):
+        image_id = self._reserve()
+        self._object(image_id, (
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB'
+            b' /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>' % (width, height, len(data))
+        ), data)
+        content = b'q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q' % (width * 72.0 / self.resolution, height * 72.0 / self.resolution)
+        self._page(width, height, content, b'<< /XObject << /Im0 %d 0 R >> >>' % image_id)
+
+    def add_page(self, page):
+        self.add_jpeg(page.width, page.height, page.frames['jpeg'])
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref_at = self.file.tell()
+        size = self.next_id
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for obj_id in range(1, size):
+            self._write(b'%010d 00000 n \n' % self.offsets[obj_id])
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref_at))
+
+
+def _ttf_metrics(data):
+    """Caja, ascendente, descendente y altura de mayúsculas de un TTF, en unidades de 1/1000 em."""
+    tables = {}
+    for i in range(struct.unpack('>H', data[4:6])[0]):
+        tag, _, offset, _ = struct.unpack('>4sIII', data[12 + 16 * i:28 + 16 * i])
+        tables[tag] = offset
+    head, hhea, os2 = tables[b'head'], tables[b'hhea'], tables.get(b'OS/2')
+    scale = 1000.0 / struct.unpack('>H', data[head + 18:head + 20])[0]
+    bbox = [round(v * scale) for v in struct.unpack('>4h', data[head + 36:head + 44])]
+    ascent, descent = (round(v * scale) for v in struct.unpack('>hh', data[hhea + 4:hhea + 8]))
+    cap_height = ascent
+    if os2 is not None and struct.unpack('>H', data[os2:os2 + 2])[0] >= 2:
+        cap_height = round(struct.unpack('>h', data[os2 + 88:os2 + 90])[0] * scale)
+    return bbox, ascent, descent, cap_height
+
+
+# Curvas de Bézier que aproximan un cuarto de elipse
+_KAPPA = 0.5522847498
+
+
+def _ellipse_path(x0, y0, x1, y1):
+    cx, cy, rx, ry = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2
+    kx, ky = rx * _KAPPA, ry * _KAPPA
+    return (
+        b'%.2f %.2f m ' % (cx + rx, cy)
+        + b'%.2f %.2f %.2f %.2f %.2f %.2f c ' % (cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry)
+        + b'%.2f %.2f %.2f %.2f %.2f %.2f c ' % (cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy)
+        + b'%.2f %.2f %.2f %.2f %.2f %.2f c ' % (cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry)
+        + b'%.2f %.2f %.2f %.2f %.2f %.2f c h' % (cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy)
+    )
+
+
+def _rounded_rect_path(x0, y0, x1, y1, radius):
+    r = min(radius, (x1 - x0) / 2, (y1 - y0) / 2)
+    k = r * (1 - _KAPPA)
+    return (
+        b'%.2f %.2f m ' % (x0 + r, y0)
+        + b'%.2f %.2f l %.2f %.2f %.2f %.2f %.2f %.2f c ' % (x1 - r, y0, x1 - k, y0, x1, y0 + k, x1, y0 + r)
+        + b'%.2f %.2f l %.2f %.2f %.2f %.2f %.2f %.2f c ' % (x1, y1 - r, x1, y1 - k, x1 - k, y1, x1 - r, y1)
+        + b'%.2f %.2f l %.2f %.2f %.2f %.2f %.2f %.2f c ' % (x0 + r, y1, x0 + k, y1, x0, y1 - k, x0, y1 - r)
+        + b'%.2f %.2f l %.2f %.2f %.2f %.2f %.2f %.2f c h' % (x0, y0 + r, x0, y0 + k, x0 + k, y0, x0 + r, y0)
+    )
+
+
+def _source_bytes(source):
+    try:
+        if source.startswith('http'):
+            resp = http_requests.get(source, timeout=10)
+            return resp.content if resp.status_code == 200 else None
+        with open(source, 'rb') as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+class VectorPDFWriter(PDFStreamWriter):
+    """
+    PDF con los textos como texto (Poppins incrustada, codificación WinAnsi) y las
+    formas como vectores. Los fondos de las capas y las imágenes de producto se
+    escriben la primera vez que aparecen, a su tamaño original, y las páginas
+    siguientes sólo los referencian. Las de producto salen de los bytes originales
+    (ImageCache.original_path): los JPEG tal cual, sin recomprimir, y los WebP/PNG
+    en JPEG con la transparencia como máscara aparte. Todas las
+    páginas comparten un único diccionario de recursos que se escribe al cerrar.
+
+    Trabaja en las mismas coordenadas de píxel que el layout: cada página empieza
+    con una matriz que escala a puntos e invierte el eje y.
+    """
+    encoding = None
+
+    def __init__(self, fileobj, resolution=RESOLUTION):
+        super().__init__(fileobj, resolution)
+        self.resources_id = self._reserve()
+        self.fonts = {}   # archivo TTF -> (nombre del recurso, id)
+        self.images = {}  # fondo u origen -> (nombre del recurso, id) o None si no se pudo leer
+
+    # ── Recursos ─────────────────────────────────────────────────────
+    def _font_resource(self, weight):
+        path = _font_path(weight)
+        if path not in self.fonts:
+            with open(path, 'rb') as f:
+                data = f.read()
+            bbox, ascent, descent, cap_height = _ttf_metrics(data)
+            measure = ImageFont.truetype(path, 1000)
+            widths = []
+            for code in range(32, 256):
+                try:
+                    widths.append(round(measure.getlength(bytes([code]).decode('cp1252'))))
+                except UnicodeDecodeError:
+                    widths.append(0)
+
+            base_font = os.path.splitext(os.path.basename(path))[0].encode('ascii')
+            file_id, descriptor_id, font_id = self._reserve(), self._reserve(), self._reserve()
+            compressed = zlib.compress(data)
+            self._object(file_id, b'<< /Length %d /Length1 %d /Filter /FlateDecode >>' % (len(compressed), len(data)), compressed)
+            self._object(descriptor_id, (
+                b'<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [%d %d %d %d] /ItalicAngle 0'
+                b' /Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>'
+                % (base_font, *bbox, ascent, descent, cap_height, file_id)
+            ))
+            self._object(font_id, (
+                b'<< /Type /Font /Subtype /TrueType /BaseFont /%s /FirstChar 32 /LastChar 255 /Widths [%s]'
+                b' /Encoding /WinAnsiEncoding /FontDescriptor %d 0 R >>'
+                % (base_font, b' '.join(b'%d' % w for w in widths), descriptor_id)
+            ))
+            self.fonts[path] = (b'F%d' % len(self.fonts), font_id)
+        return self.fonts[path][0]
+
+    def _image_object(self, img, jpeg=None):
+        """
+        Escribe la imagen y retorna su id. El color va siempre en JPEG (DCTDecode):
+        `jpeg` tal cual si se da, si no recomprimido a PRODUCT_IMAGE_QUALITY. La
+        transparencia, si la hay, va aparte como máscara sin pérdida (SMask).
+        """
+        image_id = self._reserve()
+        smask = b''
+        if jpeg is None:
+            img = img.convert('RGBA')
+            alpha = img.getchannel('A')
+            if alpha.getextrema()[0] < 255:
+                mask_id = self._reserve()
+                data = zlib.compress(alpha.tobytes())
+                self._object(mask_id, (
+                    b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray'
+                    b' /BitsPerComponent 8 /Filter /FlateDecode /Length %d >>' % (*img.size, len(data))
+                ), data)
+                smask = b' /SMask %d 0 R' % mask_id
+            img = img.convert('RGB')
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=PRODUCT_IMAGE_QUALITY)
+            jpeg = buffer.getvalue()
+        colorspace = b'/DeviceGray' if img.mode == 'L' else b'/DeviceRGB'
+        self._object(image_id, (
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s'
+            b' /BitsPerComponent 8 /Filter /DCTDecode%s /Length %d >>' % (*img.size, colorspace, smask, len(jpeg))
+        ), jpeg)
+        return image_id
+
+    def _background_resource(self, name):
+        key = ('fondo', name)
+        if key not in self.images:
+            buffer = io.BytesIO()
+            background = LAYERS[name][0]().convert('RGB')
+            background.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+            self.images[key] = (b'Im%d' % len(self.images), self._image_object(background, jpeg=buffer.getvalue()))
+        return self.images[key][0]
+
+    def _product_image_resource(self, source):
+        if source not in self.images:
+            resource = None
+            data = _source_bytes(source)
+            if data:
+                try:
+                    with Image.open(io.BytesIO(data)) as img:
+                        img.load()
+                        jpeg = data if img.format == 'JPEG' and img.mode in ('RGB', 'L') else None
+                        resource = (b'Im%d' % len(self.images), self._image_object(img, jpeg=jpeg))
+                except Exception:
+                    resource = None
+            self.images[source] = resource
+        return self.images[source][0] if self.images[source] else None
+
+    # ── Dibujo ────────────────────────────────────────────────────────
+    def _fill(self, color):
+        # Como en el raster: ImageDraw sobre la capa RGBA reemplaza los píxeles en vez
+        # de mezclarlos y la conversión final a RGB descarta el alfa, así que los
+        # colores con alfa se ven opacos.
+        return b'%.3f %.3f %.3f rg' % (color[0] / 255, color[1] / 255, color[2] / 255)
+
+    def _stroke(self, color, width):
+        return b'%.3f %.3f %.3f RG %.2f w' % (color[0] / 255, color[1] / 255, color[2] / 255, width)
+
+    def _op(self, op):
+        kind = op[0]
+        if kind == 'text':
+            _, x, y, text, weight, size, fill = op
+            baseline = y + _font(weight, size).getmetrics()[0]
+            encoded = text.encode('cp1252', errors='replace').hex().encode('ascii')
+            return b'%s BT /%s %d Tf 1 0 0 -1 %.2f %.2f Tm <%s> Tj ET' % (
+                self._fill(fill), self._font_resource(weight), size, x, baseline, encoded,
+            )
+        if kind == 'rect':
+            x0, y0, x1, y1 = op[1]
+            # ImageDraw incluye el último píxel de la caja
+            return b'%s %.2f %.2f %.2f %.2f re f' % (self._fill(op[2]), x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+        if kind == 'rrect':
+            _, (x0, y0, x1, y1), radius, fill, outline = op
+            if fill is not None:
+                return b'%s %s f' % (self._fill(fill), _rounded_rect_path(x0, y0, x1 + 1, y1 + 1, radius))
+            return b'%s %s S' % (self._stroke(outline, 1), _rounded_rect_path(x0 + 0.5, y0 + 0.5, x1 + 0.5, y1 + 0.5, radius))
+        if kind == 'polygon':
+            points = b' '.join(b'%.2f %.2f l' % point for point in op[1][1:])
+            return b'%s %.2f %.2f m %s h f' % (self._fill(op[2]), *op[1][0], points)
+        if kind == 'ellipse':
+            x0, y0, x1, y1 = op[1]
+            return b'%s %s f' % (self._fill(op[2]), _ellipse_path(x0, y0, x1 + 1, y1 + 1))
+        if kind == 'arc':
+            _, (x0, y0, x1, y1), start, end, color, width = op
+            # ImageDraw dibuja el grosor hacia adentro de la caja
+            cx, cy = (x0 + x1 + 1) / 2, (y0 + y1 + 1) / 2
+            rx, ry = (x1 - x0 + 1 - width) / 2, (y1 - y0 + 1 - width) / 2
+            steps = max(2, int(end - start) // 5)
+            points = [
+                (cx + rx * math.cos(math.radians(start + (end - start) * i / steps)),
+                 cy + ry * math.sin(math.radians(start + (end - start) * i / steps)))
+                for i in range(steps + 1)
+            ]
+            path = b' '.join(b'%.2f %.2f l' % point for point in points[1:])
+            return b'%s %.2f %.2f m %s S' % (self._stroke(color, width), *points[0], path)
+        if kind == 'image':
+            _, (x, y, width, height), source, original = op
+            name = self._product_image_resource(original or source)
+            if name is None:
+                return b''
+            return b'%d 0 0 %d %d %d cm /%s Do' % (width, -height, x, y + height, name)
+        raise ValueError(f"Operación de dibujo desconocida: {kind}")
+
+    def add_page(self, page):
+        name, args = page.layout.layer
+        scale = 72.0 / self.resolution
+        parts = [
+            b'%.4f 0 0 %.4f 0 %.2f cm' % (scale, -scale, page.height * scale),
+            b'q %d 0 0 %d 0 %d cm /%s Do Q' % (page.width, -page.height, page.height, self._background_resource(name)),
+        ]
+        for op in [*LAYERS[name][1](*args), *page.layout.ops]:
+            parts.append(b'q %s Q' % self._op(op))
+        content = zlib.compress(b'\n'.join(parts))
+        self._page(page.width, page.height, content, b'%d 0 R' % self.resources_id, filters=b' /Filter /FlateDecode')
+
+    def close(self):
+        def entries(resources):
+            return b' '.join(b'/%s %d 0 R' % resource for resource in resources if resource)
+
+        self._object(self.resources_id, b'<< /Font << %s >> /XObject << %s >> >>' % (
+            entries(self.fonts.values()), entries(self.images.values()),
+        ))
+        super().close()
+
+
+class FrameZipWriter:
+    """
+    ZIP con un cuadro por página (historia_001.webp, ...), escrito a medida que
+    llegan las páginas. Sin compresión: WebP y JPEG ya vienen comprimidos.
+    """
+
+    def __init__(self, fileobj, encoding='webp', prefix='historia'):
+        self.encoding = encoding
+        self.extension = FRAME_ENCODINGS[encoding][1]
+        self.prefix = prefix
+        self.zip = zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED)
+        self.count = 0
+
+    def add_page(self, page):
+        self.count += 1
+        self.zip.writestr(f'{self.prefix}_{self.count:03d}.{self.extension}', page.frames[self.encoding])
+
+    def close(self):
+        self.zip.close()
+
+
+# formato -> (etiqueta, extensión del archivo)
+OUTPUT_FORMATS = {
+    'pdf': ('PDF', 'pdf'),
+    'pdf_vector': ('PDF liviano (texto vectorial)', 'pdf'),
+    'webp': ('Historias WebP (ZIP)', 'zip'),
+    'jpeg': ('Historias JPEG (ZIP)', 'zip'),
+}
+
+
+def _output_writer(output_format, fileobj):
+    if output_format == 'pdf':
+        return PDFStreamWriter(fileobj)
+    if output_format == 'pdf_vector':
+        return VectorPDFWriter(fileobj)
+    if output_format in FRAME_ENCODINGS:
+        return FrameZipWriter(fileobj, encoding=output_format)
+    raise ValueError(f"Formato de catálogo desconocido: {output_format}")
+
+
+def render_catalog(specs, outputs, workers=1, max_in_flight=None, layer_dir=None):
+    """
+    Dibuja el catálogo una sola vez y lo escribe en cada formato pedido
+    ({formato: archivo}). Retorna el número de páginas.
+    """
+    writers = [_output_writer(output_format, fileobj) for output_format, fileobj in outputs.items()]
+    encodings = sorted({writer.encoding for writer in writers if writer.encoding})
+    pages = 0
+    for page in render_pages(specs, encodings, workers=workers, max_in_flight=max_in_flight, layer_dir=layer_dir):
+        for writer in writers:
+            writer.add_page(page)
+        pages += 1
+    for writer in writers:
+        writer.close()
+    return pages
+
+
+def render_catalog_pdf(specs, fileobj, workers=1, max_in_flight=None, layer_dir=None):
+    """Dibuja y escribe el catálogo en fileobj. Retorna el número de páginas."""
+    return render_catalog(specs, {'pdf': fileobj}, workers=workers, max_in_flight=max_in_flight, layer_dir=layer_dir)
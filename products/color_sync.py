@@ -0,0 +1,75 @@
+"""
+Propagación de colores nuevos al catálogo como trabajo en BD.
+Con COLOR_SYNC_IN_BACKGROUND=True el alta de un color solo encola el trabajo y
+lo procesa un hilo de fondo al confirmar la transacción; los pendientes que
+queden (proceso reiniciado) los toma `manage.py sync_catalog_variants --pending-color-jobs`.
+SIN Celery - compatible con PythonAnywhere.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ColorSyncJob
+from .services import propagar_color
+
+logger = logging.getLogger(__name__)
+
+
+def process_color_sync_job(job_id):
+    """Ejecuta un trabajo pendiente. Retorna el trabajo, o None si otro proceso ya lo tomó."""
+    claimed = ColorSyncJob.objects.filter(id=job_id, status='pending').update(status='processing')
+    if not claimed:
+        return None
+
+    job = ColorSyncJob.objects.select_related('color').get(id=job_id)
+    try:
+        report = propagar_color(job.color, only_active=job.only_active)
+        job.status = 'completed'
+        job.variants_created = report['created']
+        job.products_scanned = report['products']
+        job.duration_ms = report['elapsed_ms']
+    except Exception as e:
+        logger.exception("Falló la propagación del color #%d", job.color_id)
+        job.status = 'failed'
+        job.error_message = str(e)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def _run_in_thread(job_id):
+    def _run():
+        try:
+            process_color_sync_job(job_id)
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=_run, name=f"color-sync-{job_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def sync_color(color, only_active=True):
+    """
+    Registra la propagación de `color` y la ejecuta: en línea por defecto, o en un
+    hilo de fondo tras el commit si COLOR_SYNC_IN_BACKGROUND=True.
+    Retorna el ColorSyncJob (con filas creadas y duración si corrió en línea).
+    """
+    job = ColorSyncJob.objects.create(color=color, only_active=only_active)
+    if getattr(settings, 'COLOR_SYNC_IN_BACKGROUND', False):
+        transaction.on_commit(lambda: _run_in_thread(job.id))
+        return job
+    return process_color_sync_job(job.id)
+
+
+def process_pending_color_syncs():
+    """Procesa los trabajos pendientes en orden. Retorna los trabajos ejecutados."""
+    jobs = []
+    for job_id in ColorSyncJob.objects.filter(status='pending').values_list('id', flat=True):
+        job = process_color_sync_job(job_id)
+        if job:
+            jobs.append(job)
+    return jobs
@@ -0,0 +1,41 @@
+"""
+Vistas de exportación (CSV / XLSX en streaming) - ver products/exports.py
+"""
+from datetime import date
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+
+from .exports import CSV, export_response
+
+
+def is_staff(user):
+    return user.is_staff or user.is_superuser
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _parse_ids(value):
+    return [int(part) for part in (value or '').split(',') if part.strip().isdigit()]
+
+
+@login_required
+@user_passes_test(is_staff)
+def export_dataset_view(request, dataset):
+    """
+    Exporta un dataset completo o filtrado:
+        /panel/exportar/pedidos-internos/?formato=xlsx&pedidos=3,7
+        /panel/exportar/transacciones/?desde=2025-01-01&hasta=2025-03-31
+    Datasets: pedidos-internos, pedidos, transacciones, costos (ver DATASETS).
+    """
+    return export_response(
+        dataset,
+        request.GET.get('formato', CSV),
+        order_ids=_parse_ids(request.GET.get('pedidos')),
+        date_from=_parse_date(request.GET.get('desde')),
+        date_to=_parse_date(request.GET.get('hasta')),
+    )
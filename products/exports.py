@@ -0,0 +1,321 @@
+"""
+Exportaciones en streaming (CSV y XLSX) de pedidos internos, pedidos de la tienda,
+transacciones contables y gastos por pedido.
+
+Las filas se leen con values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE) y se
+escriben a medida que llegan en un StreamingHttpResponse: la memoria no crece con el
+número de filas y el navegador recibe los primeros bytes de inmediato.
+
+El XLSX se arma sin dependencias: un ZIP escrito en streaming (zipfile acepta salidas
+no posicionables) con una sola hoja de celdas en línea (inlineStr), sin estilos ni
+tabla de strings compartidos, que es lo que obliga a otras librerías a esperar al
+final para escribir.
+"""
+import csv
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = {
+    CSV: 'text/csv; charset=utf-8',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    title: str
+    model: str                 # "app_label.Model"
+    columns: tuple             # ((encabezado, lookup), ...)
+    date_lookup: str           # campo (o __date) para desde/hasta
+    order_lookup: str = ''     # campo para filtrar por ids de pedido
+    ordering: tuple = ('pk',)
+
+    def queryset(self):
+        from django.apps import apps
+        return apps.get_model(self.model).objects.all()
+
+
+DATASETS = {
+    # Columnas del CSV histórico de un pedido interno (internal_order_export_csv_view)
+    'pedido-interno': Dataset(
+        title='Pedido',
+        model='products.InternalOrderItem',
+        columns=(
+            ('Referencia', 'product_name'),
+            ('Cantidad', 'quantity'),
+            ('Tamaño', 'variant__size__name'),
+            ('Color', 'variant__color__name'),
+            ('Material', 'variant__material__name'),
+            ('Detalles Completos', 'variant_details'),
+        ),
+        date_lookup='order__created_at__date',
+        order_lookup='order_id',
+        ordering=('position', 'created_at', 'pk'),
+    ),
+    'pedidos-internos': Dataset(
+        title='Pedidos internos',
+        model='products.InternalOrderItem',
+        columns=(
+            ('Pedido', 'order_id'),
+            ('Nombre del pedido', 'order__name'),
+            ('Estado', 'order__status'),
+            ('Fecha', 'order__created_at'),
+            ('Referencia', 'product_name'),
+            ('Tamaño', 'variant__size__name'),
+            ('Color', 'variant__color__name'),
+            ('Material', 'variant__material__name'),
+            ('Detalles Completos', 'variant_details'),
+            ('Cantidad', 'quantity'),
+            ('Completadas', 'completed_quantity'),
+            ('Precio unitario', 'unit_price'),
+        ),
+        date_lookup='order__created_at__date',
+        order_lookup='order_id',
+        ordering=('order_id', 'position', 'created_at', 'pk'),
+    ),
+    'pedidos': Dataset(
+        title='Pedidos tienda',
+        model='products.OrderItem',
+        columns=(
+            ('Pedido', 'order_id'),
+            ('Fecha', 'order__created_at'),
+            ('Cliente', 'order__user__username'),
+            ('Estado', 'order__status__name'),
+            ('Producto', 'product_name'),
+            ('Variante', 'variant_text'),
+            ('Cantidad', 'quantity'),
+            ('Precio', 'price'),
+        ),
+        date_lookup='order__created_at__date',
+        order_lookup='order_id',
+        ordering=('order_id', 'pk'),
+    ),
+    'transacciones': Dataset(
+        title='Transacciones',
+        model='contabilidad.Transaction',
+        columns=(
+            ('Fecha', 'date'),
+            ('Cuenta', 'account__name'),
+            ('Categoría', 'category__name'),
+            ('Tipo', 'category__transaction_type'),
+            ('Descripción', 'description'),
+            ('Monto', 'amount'),
+            ('Cliente / Tercero', 'client_name'),
+            ('Proveedor', 'provider__name'),
+            ('Pedido', 'related_order_id'),
+        ),
+        date_lookup='date',
+        order_lookup='related_order_id',
+        ordering=('date', 'pk'),
+    ),
+    'costos': Dataset(
+        title='Gastos por pedido',
+        model='products.OrderCostBreakdown',
+        columns=(
+            ('Fecha', 'created_at'),
+            ('Pedido interno', 'internal_order_id'),
+            ('Pedido', 'order_id'),
+            ('Tipo de costo', 'cost_type__name'),
+            ('Descripción', 'description'),
+            ('Cantidad', 'calculated_quantity'),
+            ('Precio unitario', 'unit_price'),
+            ('Total', 'total'),
+            ('Estado contable', 'accounting_status'),
+        ),
+        date_lookup='created_at__date',
+        order_lookup='internal_order_id',
+        ordering=('created_at', 'pk'),
+    ),
+}
+
+
+def export_rows(dataset, order_ids=None, date_from=None, date_to=None):
+    """Filas (tuplas) del dataset con los filtros, leídas por bloques."""
+    rows = dataset.queryset()
+    if order_ids:
+        rows = rows.filter(**{f"{dataset.order_lookup}__in": order_ids})
+    if date_from:
+        rows = rows.filter(**{f"{dataset.date_lookup}__gte": date_from})
+    if date_to:
+        rows = rows.filter(**{f"{dataset.date_lookup}__lte": date_to})
+    lookups = [lookup for _, lookup in dataset.columns]
+    return rows.order_by(*dataset.ordering).values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _plain(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+# --- CSV ---
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: retorna lo escrito en vez de guardarlo."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(headers, rows):
+    writer = csv.writer(_Echo())
+    # BOM para que Excel abra el archivo como UTF-8
+    yield ('\ufeff' + writer.writerow(headers)).encode('utf-8')
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_plain(value) for value in row]))
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+# --- XLSX ---
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+class _ChunkSink:
+    """Salida del ZIP: acumula lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(number, values, letters):
+    cells = []
+    for letter, value in zip(letters, values):
+        value = _plain(value)
+        ref = f"{letter}{number}"
+        if isinstance(value, bool):
+            cells.append(f'<c r="{ref}" t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float, Decimal)):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value != '':
+            text = escape(_ILLEGAL_XML.sub('', str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def xlsx_stream(headers, rows, sheet_name='Datos'):
+    sink = _ChunkSink()
+    sheet_name = escape(re.sub(r'[\[\]:*?/\\]', ' ', sheet_name)[:31] or 'Datos')
+    letters = [_column_letter(index) for index in range(len(headers))]
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=sheet_name))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(1, headers, letters)).encode('utf-8'))
+            buffer = []
+            for number, row in enumerate(rows, start=2):
+                buffer.append(_xlsx_row(number, row, letters))
+                if len(buffer) >= ROWS_PER_WRITE:
+                    sheet.write(''.join(buffer).encode('utf-8'))
+                    buffer = []
+                    yield sink.drain()
+            sheet.write((''.join(buffer) + _SHEET_END).encode('utf-8'))
+    yield sink.drain()
+
+
+# --- Respuesta HTTP ---
+
+def export_response(dataset_key, fmt=CSV, filename=None, **filters):
+    """
+    StreamingHttpResponse con el dataset en CSV o XLSX. Filtros: order_ids, date_from,
+    date_to (ver export_rows).
+    """
+    dataset = DATASETS.get(dataset_key)
+    if dataset is None:
+        raise Http404("Exportación no encontrada")
+    if fmt not in FORMATS:
+        fmt = CSV
+    headers = [header for header, _ in dataset.columns]
+    rows = export_rows(dataset, **filters)
+    content = csv_stream(headers, rows) if fmt == CSV else xlsx_stream(headers, rows, dataset.title)
+
+    response = StreamingHttpResponse(content, content_type=FORMATS[fmt])
+    filename = filename or f"{dataset_key}_{timezone.localdate():%Y-%m-%d}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
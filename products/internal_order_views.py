@@ -3,20 +3,37 @@ Vistas para el sistema de Pedidos Internos con Drag & Drop
 Compatible con PythonAnywhere - Solo Vanilla JS + Bootstrap 5
 """
 import json
-import random
 from decimal import Decimal
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
-from django.db.models import Count, F, Max, Q, Sum
+from django.http import Http404, JsonResponse
+from django.db.models import Count, F, Q, Sum
 from django.views.decorators.http import require_POST, require_GET
 from django.core.paginator import Paginator
 
 from .models import (
     Product, ProductVariant, Category, Material, Size, Color,
-    InternalOrder, InternalOrderItem, InternalOrderGroup
+    InternalOrder, InternalOrderItem, InternalOrderGroup, VariantSearchIndex
+)
+from .exports import CSV, export_response
+from .internal_orders import (
+    BatchError,
+    VersionConflict,
+    add_variants_to_order,
+    apply_item_operations,
+    clear_order,
+    complete_production,
+    production_queue,
+    remove_item,
+    set_item_quantity,
+)
+from .reference_data import get_reference_data
+from .variant_search import (
+    entry_image_url,
+    entry_variant_text,
+    search_variants,
 )
 
 
@@ -25,19 +42,15 @@ def is_staff(user):
     return user.is_staff or user.is_superuser
 
 
-def _latest_active_product_ids(product_type=None):
+def _ensure_search_index(product_type):
     """
-    Retorna IDs de productos activos manteniendo solo el registro mas reciente
-    por combinacion (name, product_type). Evita mostrar duplicados antiguos.
+    Si el tipo no tiene filas en el índice, genera las variantes que le falten (los
+    signals las indexan al confirmar). El índice completo lo llenan la migración 0031
+    y `manage.py reconstruir_indice_variantes`, nunca un request.
     """
-    # Solo productos que realmente tengan variantes disponibles.
-    products = Product.objects.filter(is_active=True, variants__isnull=False).distinct()
-    if product_type:
-        products = products.filter(product_type=product_type)
-
-    return products.values('name', 'product_type').annotate(
-        latest_id=Max('id')
-    ).values_list('latest_id', flat=True)
+    if not product_type or VariantSearchIndex.objects.filter(product_type=product_type).exists():
+        return
+    _ensure_variants_for_product_type(product_type)
 
 
 def _ensure_variants_for_product_type(product_type):
@@ -147,42 +160,17 @@ def internal_order_create_view(request):
     return render(request, 'dashboard/internal_orders/create.html')
 
 
-import csv
-from django.http import HttpResponse
-
 @login_required
 @user_passes_test(is_staff)
 def internal_order_export_csv_view(request, order_id):
-    """Exporta el pedido a CSV"""
+    """Exporta el pedido a CSV (o XLSX con ?formato=xlsx), en streaming"""
     order = get_object_or_404(InternalOrder, id=order_id)
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="Pedido_{order.id}_{order.created_at.strftime("%Y-%m-%d")}.csv"'
-    
-    # Escribir BOM para Excel
-    response.write(u'\ufeff'.encode('utf8'))
-    
-    writer = csv.writer(response)
-    # Encabezados
-    writer.writerow(['Referencia', 'Cantidad', 'Tamaño', 'Color', 'Material', 'Detalles Completos'])
-    
-    items = order.items.select_related('variant', 'variant__size', 'variant__color', 'variant__material').all()
-    
-    for item in items:
-        size = item.variant.size.name if item.variant and item.variant.size else ''
-        color = item.variant.color.name if item.variant and item.variant.color else ''
-        material = item.variant.material.name if item.variant and item.variant.material else ''
-        
-        writer.writerow([
-            item.product_name,
-            item.quantity,
-            size,
-            color,
-            material,
-            item.variant_details
-        ])
-            
-    return response
+    return export_response(
+        'pedido-interno',
+        request.GET.get('formato', CSV),
+        filename=f'Pedido_{order.id}_{order.created_at.strftime("%Y-%m-%d")}',
+        order_ids=[order.id],
+    )
 
 @login_required
 @user_passes_test(is_staff)
@@ -190,12 +178,13 @@ def internal_order_edit_view(request, order_id):
     """Editor principal con drag & drop"""
     order = get_object_or_404(InternalOrder, id=order_id)
 
-    # Datos para los filtros
+    # Datos para los filtros (caché de datos de referencia)
     product_types = Product.TYPE_CHOICES
-    categories = Category.objects.all().order_by('name')
-    materials = Material.objects.all().order_by('name')
-    sizes = Size.objects.all().order_by('name')
-    colors = Color.objects.all().order_by('name')
+    reference = get_reference_data()
+    categories = reference.sorted_categories
+    materials = reference.sorted_materials
+    sizes = reference.sorted_sizes
+    colors = reference.sorted_colors
 
     # Items actuales del pedido
     order_items = order.items.all().select_related(
@@ -380,36 +369,41 @@ def api_get_available_filters(request):
         return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
 
     product_type = data.get('product_type', '')
-    _ensure_variants_for_product_type(product_type)
-
-    # 1. Base: solo variantes de productos activos y no duplicados por nombre/tipo
-    latest_product_ids = _latest_active_product_ids(product_type if product_type else None)
-    variants_query = ProductVariant.objects.filter(product_id__in=latest_product_ids)
+    _ensure_search_index(product_type)
 
+    # 1. Base: índice de búsqueda (solo variantes de productos activos y no duplicados)
     # 2. Si hay tipo seleccionado, filtramos estrictamente
-    if product_type:
-        variants_query = variants_query.filter(product__product_type=product_type)
+    entries = search_variants({'product_type': product_type})
 
     # 3. Obtener IDs únicos de atributos que están EN USO por estas variantes
     # Esto soluciona que salgan materiales de Vinilo cuando estás en Impresos
-    material_ids = variants_query.values_list('material_id', flat=True).distinct()
-    size_ids = variants_query.values_list('size_id', flat=True).distinct()
-    color_ids = variants_query.values_list('color_id', flat=True).distinct()
-    category_ids = variants_query.values_list('product__categories__id', flat=True).distinct()
+    material_ids = entries.values_list('material_id', flat=True).distinct()
+    size_ids = entries.values_list('size_id', flat=True).distinct()
+    color_ids = entries.values_list('color_id', flat=True).distinct()
+    category_ids = {
+        int(category_id)
+        for value in entries.exclude(category_ids='').values_list('category_ids', flat=True).distinct()
+        for category_id in value.strip(',').split(',')
+    }
+
+    # 4. Construir las listas desde el caché de referencia (sin consultar las tablas)
+    reference = get_reference_data()
+
+    def _available(ids, dicts):
+        found = [dicts[i] for i in set(ids) if i in dicts]
+        return sorted(found, key=lambda item: item['name'].lower())
 
-    # 4. Construir las listas de objetos basados en los IDs encontrados
-    
     # Materiales
-    available_materials = list(Material.objects.filter(id__in=material_ids).values('id', 'name').order_by('name'))
-    
+    available_materials = _available(material_ids, reference.material_dicts)
+
     # Tamaños
-    available_sizes = list(Size.objects.filter(id__in=size_ids).values('id', 'name', 'dimensions').order_by('name'))
-    
+    available_sizes = _available(size_ids, reference.size_dicts)
+
     # Colores
-    available_colors = list(Color.objects.filter(id__in=color_ids).values('id', 'name', 'hex_code').order_by('name'))
+    available_colors = _available(color_ids, reference.color_dicts)
 
     # Categorías
-    available_categories = list(Category.objects.filter(id__in=category_ids).values('id', 'name').order_by('name'))
+    available_categories = _available(category_ids, reference.category_dicts)
 
     return JsonResponse({
         'status': 'ok',
@@ -436,66 +430,16 @@ def api_filter_variants(request):
     except json.JSONDecodeError:
         return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
 
-    product_type = data.get('product_type')
-    _ensure_variants_for_product_type(product_type)
-    latest_product_ids = _latest_active_product_ids(product_type if product_type else None)
-
-    # 1. Base: Solo productos activos no duplicados (evita productos viejos repetidos)
-    variants = ProductVariant.objects.select_related(
-        'product', 'size', 'material', 'color'
-    ).filter(product_id__in=latest_product_ids)
-
-    # --- APLICACIÓN DE FILTROS ---
-
-    # Tipo de Producto
-    if product_type:
-        variants = variants.filter(product__product_type=product_type)
-
-    # Categoría
-    category_id = data.get('category_id')
-    if category_id:
-        variants = variants.filter(product__categories__id=category_id)
-
-    # Material
-    material_id = data.get('material_id')
-    if material_id:
-        variants = variants.filter(material_id=material_id)
-
-    # Tamaño (Aquí estaba el problema, aseguramos que el ID venga como entero si no es nulo)
-    size_id = data.get('size_id')
-    if size_id:
-        variants = variants.filter(size_id=size_id)
-
-    # Color
-    color_id = data.get('color_id')
-    if color_id:
-        variants = variants.filter(color_id=color_id)
-
-    # Búsqueda de texto
-    search_query = data.get('search', '').strip()
-    if search_query:
-        variants = variants.filter(
-            Q(product__name__icontains=search_query) |
-            Q(product__description__icontains=search_query)
-        )
+    # Una sola tabla (VariantSearchIndex): solo productos activos no duplicados,
+    # con nombres y precios ya resueltos (ver products/variant_search.py)
+    _ensure_search_index(data.get('product_type'))
+    entries = search_variants(data).order_by('product_name', 'size_name', 'variant_id')
 
-    # Precios
-    min_price = data.get('min_price')
-    max_price = data.get('max_price')
-    if min_price:
-        variants = variants.filter(price__gte=Decimal(str(min_price)))
-    if max_price:
-        variants = variants.filter(price__lte=Decimal(str(max_price)))
-
-    # Limitar y ordenar
-    # Usamos distinct() para evitar duplicados si un producto tiene múltiples categorías
-    variants = variants.distinct().order_by('product__name', 'size__name')
-    
     # Paginación (50 items por página para mejorar rendimiento)
     page_number = data.get('page', 1)
     items_per_page = 50
-    paginator = Paginator(variants, items_per_page)
-    
+    paginator = Paginator(entries, items_per_page)
+
     try:
         variants_page = paginator.page(page_number)
     except:
@@ -503,32 +447,19 @@ def api_filter_variants(request):
 
     # Construir respuesta JSON
     items = []
-    for v in variants_page:
-        # Imagen segura
-        image_url = ''
-        if v.product.image:
-            try:
-                image_url = v.product.image.url
-            except:
-                pass
-        
-        # Construir texto de la variante explícitamente para depuración visual
-        variant_text = f"{v.size.name if v.size else ''} - {v.material.name if v.material else ''}"
-        if v.color:
-            variant_text += f" - {v.color.name}"
-
+    for entry in variants_page:
         items.append({
-            'id': v.id,
-            'product_id': v.product.id,
-            'product_name': v.product.name,
-            'product_image': image_url,
-            'size': v.size.name if v.size else '',
-            'size_dimensions': v.size.dimensions if v.size else '',
-            'material': v.material.name if v.material else '',
-            'color': v.color.name if v.color else '',
-            'color_hex': v.color.hex_code if v.color else '#cccccc',
-            'price': float(v.price) if v.price else 0,
-            'variant_text': variant_text
+            'id': entry.variant_id,
+            'product_id': entry.product_id,
+            'product_name': entry.product_name,
+            'product_image': entry_image_url(entry),
+            'size': entry.size_name,
+            'size_dimensions': entry.size_dimensions,
+            'material': entry.material_name,
+            'color': entry.color_name,
+            'color_hex': entry.color_hex or '#cccccc',
+            'price': float(entry.price) if entry.price else 0,
+            'variant_text': entry_variant_text(entry)
         })
 
     return JsonResponse({
@@ -553,7 +484,7 @@ def api_internal_order_add_item(request):
 
     order_id = data.get('order_id')
     variant_id = data.get('variant_id')
-    quantity = int(data.get('quantity', 1))
+    quantity = data.get('quantity', 1)
 
     if not order_id or not variant_id:
         return JsonResponse({
@@ -561,38 +492,34 @@ def api_internal_order_add_item(request):
             'message': 'Faltan parámetros requeridos'
         }, status=400)
 
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity < 1:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Cantidad inválida'
+        }, status=400)
+
     order = get_object_or_404(InternalOrder, id=order_id)
     variant = get_object_or_404(ProductVariant, id=variant_id)
 
-    # Verificar si ya existe este item en el pedido
-    existing_item = order.items.filter(variant=variant).first()
-
-    if existing_item:
-        # Sumar cantidad
-        existing_item.quantity += quantity
-        existing_item.save()
-        item = existing_item
-        is_new = False
-    else:
-        # Crear nuevo item con snapshot
-        item = InternalOrderItem.objects.create(
-            order=order,
-            variant=variant,
-            quantity=quantity,
-            product_name=variant.product.name,
-            variant_details=_build_variant_text(variant),
-            unit_price=variant.price or 0
-        )
-        is_new = True
-
-    # Recalcular totales
-    order.recalculate_totals()
+    # Suma al item existente o crea uno nuevo con snapshot; totales por delta
+    added = add_variants_to_order(order, {variant.id: quantity})
+    if not added:
+        # La variante se eliminó entre la consulta y el bloqueo del pedido
+        raise Http404("Variante no encontrada")
+    added = added[0]
+    item = added.item
+    is_new = added.is_new
+    variant = added.variant
 
     # Obtener imagen
     image_url = ''
     if variant.product.image:
         try:
-            image_url = variant.product.image.url
+            image_url = variant.product.thumb_url
         except:
             pass
 
@@ -608,6 +535,7 @@ def api_internal_order_add_item(request):
             'subtotal': float(item.get_subtotal()),
             'image_url': image_url,
         },
+        'version': order.version,
         'order_totals': {
             'total_items': order.total_items,
             'total_estimated': float(order.total_estimated)
@@ -633,15 +561,13 @@ def api_internal_order_remove_item(request):
         }, status=400)
 
     item = get_object_or_404(InternalOrderItem, id=item_id)
-    order = item.order
-
-    item.delete()
 
-    # Recalcular totales
-    order.recalculate_totals()
+    # Borra el item y descuenta su subtotal de los totales
+    order = remove_item(item)
 
     return JsonResponse({
         'status': 'ok',
+        'version': order.version,
         'order_totals': {
             'total_items': order.total_items,
             'total_estimated': float(order.total_estimated)
@@ -678,11 +604,7 @@ def api_internal_order_update_qty(request):
         }, status=400)
 
     item = get_object_or_404(InternalOrderItem, id=item_id)
-    item.quantity = quantity
-    item.save()
-
-    order = item.order
-    order.recalculate_totals()
+    order = set_item_quantity(item, quantity)
 
     return JsonResponse({
         'status': 'ok',
@@ -691,6 +613,77 @@ def api_internal_order_update_qty(request):
             'quantity': item.quantity,
             'subtotal': float(item.get_subtotal())
         },
+        'version': order.version,
+        'order_totals': {
+            'total_items': order.total_items,
+            'total_estimated': float(order.total_estimated)
+        }
+    })
+
+
+def _serialize_item(item, variant=None):
+    data = {
+        'id': item.id,
+        'variant_id': item.variant_id,
+        'product_name': item.product_name,
+        'variant_details': item.variant_details,
+        'quantity': item.quantity,
+        'position': item.position,
+        'unit_price': float(item.unit_price),
+        'subtotal': float(item.get_subtotal()),
+    }
+    if variant is not None:
+        data['image_url'] = ''
+        if variant.product.image:
+            try:
+                data['image_url'] = variant.product.thumb_url
+            except Exception:
+                pass
+    return data
+
+
+@login_required
+@require_POST
+def api_internal_order_batch(request):
+    """
+    Aplica un lote de operaciones del editor (agregar, cambiar cantidad, quitar,
+    reordenar) en una sola transacción. El editor acumula los cambios y los envía
+    juntos con la versión del pedido que conoce; si otro cambio llegó antes responde
+    409 con la versión actual y no aplica nada.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
+
+    order_id = data.get('order_id')
+    if not order_id:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Falta order_id'
+        }, status=400)
+
+    order = get_object_or_404(InternalOrder, id=order_id)
+    version = data.get('version')
+    try:
+        result = apply_item_operations(
+            order, data.get('operations', []), version=int(version) if version is not None else None
+        )
+    except VersionConflict as conflict:
+        return JsonResponse({
+            'status': 'conflict',
+            'message': 'El pedido cambió en otra ventana. Recarga para ver la versión actual.',
+            'version': conflict.version,
+        }, status=409)
+    except (BatchError, ValueError) as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+
+    return JsonResponse({
+        'status': 'ok',
+        'version': order.version,
+        'created': [_serialize_item(entry.item, entry.variant) for entry in result.created],
+        'updated': [_serialize_item(item) for item in result.updated],
+        'removed': result.removed,
         'order_totals': {
             'total_items': order.total_items,
             'total_estimated': float(order.total_estimated)
@@ -728,154 +721,66 @@ def api_internal_order_auto_select(request):
 
     order = get_object_or_404(InternalOrder, id=order_id)
 
-    product_type = data.get('product_type')
-    _ensure_variants_for_product_type(product_type)
-    latest_product_ids = _latest_active_product_ids(product_type if product_type else None)
-
-    # Construir query con filtros
-    variants = ProductVariant.objects.select_related(
-        'product', 'size', 'material', 'color'
-    ).filter(product_id__in=latest_product_ids)
-
-    # Aplicar filtros
-    if product_type:
-        variants = variants.filter(product__product_type=product_type)
-
-    category_id = data.get('category_id')
-    if category_id:
-        variants = variants.filter(product__categories__id=category_id)
-
-    material_ids = data.get('material_ids', [])
-    material_id = data.get('material_id')
-    if material_id:
-        variants = variants.filter(material_id=material_id)
-    elif material_ids:
-        variants = variants.filter(material_id__in=material_ids)
-
-    size_id = data.get('size_id')
-    if size_id:
-        variants = variants.filter(size_id=size_id)
-
-    color_id = data.get('color_id')
-    if color_id:
-        variants = variants.filter(color_id=color_id)
-
-    min_price = data.get('min_price')
-    max_price = data.get('max_price')
-    if min_price:
-        try:
-            variants = variants.filter(price__gte=Decimal(str(min_price)))
-        except:
-            pass
-    if max_price:
-        try:
-            variants = variants.filter(price__lte=Decimal(str(max_price)))
-        except:
-            pass
+    # Candidatas desde el índice de búsqueda (una consulta sobre una sola tabla).
+    # El sorteo lo hace la BD: solo viajan los ids elegidos, no todas las candidatas.
+    _ensure_search_index(data.get('product_type'))
+    candidates = search_variants(data)
 
-    # Obtener todas las variantes disponibles (sin excluir existentes primero para repetir si es necesario)
-    all_variants_list = list(variants.distinct())
+    # Primera pasada: variantes que todavía no están en el pedido
+    selected = list(
+        candidates.exclude(variant_id__in=order.items.values('variant_id'))
+        .order_by('?').values_list('variant_id', flat=True)[:quantity]
+    )
+
+    if allow_repeat and len(selected) < quantity:
+        # Si aún faltan, repetir desde todas las variantes (pueden repetirse)
+        remaining = quantity - len(selected)
+        pool = list(candidates.order_by('?').values_list('variant_id', flat=True)[:remaining])
+        while pool and remaining > 0:
+            batch = pool[:remaining]
+            selected.extend(batch)
+            remaining -= len(batch)
 
-    if not all_variants_list:
+    if not selected:
         return JsonResponse({
             'status': 'ok',
             'added_count': 0,
             'added_items': [],
             'message': 'No hay variantes disponibles con estos filtros',
+            'version': order.version,
             'order_totals': {
                 'total_items': order.total_items,
                 'total_estimated': float(order.total_estimated)
             }
         })
 
-    # Excluir variantes que ya están en el pedido para la primera pasada
-    existing_variant_ids = set(order.items.values_list('variant_id', flat=True))
-    new_variants = [v for v in all_variants_list if v.id not in existing_variant_ids]
-
-    # Seleccionar variantes
-    selected = []
-
-    if allow_repeat and len(new_variants) < quantity:
-        # Primero agregar todas las nuevas
-        selected.extend(new_variants)
-        remaining = quantity - len(new_variants)
-
-        # Si aún faltan, repetir desde el inicio de todas las variantes
-        while remaining > 0:
-            # Elegir aleatoriamente de todas las variantes (pueden repetirse)
-            batch_size = min(remaining, len(all_variants_list))
-            if batch_size == len(all_variants_list):
-                selected.extend(all_variants_list)
-            else:
-                selected.extend(random.sample(all_variants_list, batch_size))
-            remaining -= batch_size
-    else:
-        # Comportamiento normal: solo nuevas variantes
-        if len(new_variants) > quantity:
-            selected = random.sample(new_variants, quantity)
-        else:
-            selected = new_variants
-
-    # Agregar al pedido
+    # Agregar al pedido en lote (una transacción, consultas fijas)
+    added = add_variants_to_order(order, selected)
+
     added_items = []
-    for variant in selected:
-        # Verificar si ya existe este item en el pedido
-        existing_item = order.items.filter(variant=variant).first()
-
-        if existing_item:
-            # Incrementar cantidad si ya existe
-            existing_item.quantity += 1
-            existing_item.save()
-
-            image_url = ''
-            if variant.product.image:
-                try:
-                    image_url = variant.product.image.url
-                except:
-                    pass
-
-            added_items.append({
-                'id': existing_item.id,
-                'product_name': existing_item.product_name,
-                'variant_details': existing_item.variant_details,
-                'quantity': existing_item.quantity,
-                'unit_price': float(existing_item.unit_price),
-                'image_url': image_url,
-            })
-        else:
-            # Crear nuevo item
-            item = InternalOrderItem.objects.create(
-                order=order,
-                variant=variant,
-                quantity=1,
-                product_name=variant.product.name,
-                variant_details=_build_variant_text(variant),
-                unit_price=variant.price or 0
-            )
-
-            image_url = ''
-            if variant.product.image:
-                try:
-                    image_url = variant.product.image.url
-                except:
-                    pass
-
-            added_items.append({
-                'id': item.id,
-                'product_name': item.product_name,
-                'variant_details': item.variant_details,
-                'quantity': item.quantity,
-                'unit_price': float(item.unit_price),
-                'image_url': image_url,
-            })
+    for entry in added:
+        image_url = ''
+        if entry.variant.product.image:
+            try:
+                image_url = entry.variant.product.thumb_url
+            except:
+                pass
 
-    # Recalcular totales
-    order.recalculate_totals()
+        added_items.append({
+            'id': entry.item.id,
+            'is_new': entry.is_new,
+            'product_name': entry.item.product_name,
+            'variant_details': entry.item.variant_details,
+            'quantity': entry.item.quantity,
+            'unit_price': float(entry.item.unit_price),
+            'image_url': image_url,
+        })
 
     return JsonResponse({
         'status': 'ok',
-        'added_count': len(added_items),
+        'added_count': sum(entry.added for entry in added),
         'added_items': added_items,
+        'version': order.version,
         'order_totals': {
             'total_items': order.total_items,
             'total_estimated': float(order.total_estimated)
@@ -902,16 +807,13 @@ def api_internal_order_clear(request):
 
     order = get_object_or_404(InternalOrder, id=order_id)
 
-    # Eliminar todos los items
-    deleted_count = order.items.count()
-    order.items.all().delete()
-
-    # Recalcular totales (serán 0)
-    order.recalculate_totals()
+    # Eliminar todos los items (los totales quedan en 0)
+    deleted_count = clear_order(order)
 
     return JsonResponse({
         'status': 'ok',
         'deleted_count': deleted_count,
+        'version': order.version,
         'order_totals': {
             'total_items': 0,
             'total_estimated': 0
@@ -959,20 +861,6 @@ def api_internal_order_update_info(request):
 # FUNCIONES AUXILIARES
 # ============================================================
 
-def _build_variant_text(variant):
-    """Construye el texto descriptivo de una variante"""
-    parts = []
-
-    if variant.size:
-        parts.append(variant.size.name)
-    if variant.material:
-        parts.append(variant.material.name)
-    if variant.color:
-        parts.append(variant.color.name)
-
-    return " - ".join(parts) if parts else "Sin especificar"
-
-
 @login_required
 @user_passes_test(is_staff)
 def internal_order_tasks_view(request, order_id):
@@ -1035,3 +923,60 @@ def api_internal_order_update_task(request):
             'is_completed': item.completed_quantity >= item.quantity
         }
     })
+
+
+@login_required
+@user_passes_test(is_staff)
+def production_queue_view(request):
+    """Cola de producción: lo pendiente de todos los pedidos en producción, por diseño"""
+    product_type = request.GET.get('tipo') or None
+    queue = production_queue(product_type=product_type)
+    products = Product.objects.in_bulk({row['variant__product_id'] for row in queue})
+    for row in queue:
+        row['product'] = products.get(row['variant__product_id'])
+
+    context = {
+        'queue': queue,
+        'total_pending': sum(row['pending'] for row in queue),
+        'product_type': product_type or '',
+        'type_choices': Product.TYPE_CHOICES,
+    }
+    return render(request, 'dashboard/internal_orders/production_queue.html', context)
+
+
+@login_required
+@user_passes_test(is_staff)
+@require_POST
+def api_production_complete(request):
+    """
+    Marca unidades terminadas de varias variantes a la vez, repartiéndolas entre los
+    pedidos (el más antiguo primero). Body: {"lines": [{"variant_id": 1, "units": 10}]}
+    """
+    try:
+        data = json.loads(request.body)
+        units_by_variant = {}
+        for line in data.get('lines') or []:
+            variant_id = int(line['variant_id'])
+            units_by_variant[variant_id] = units_by_variant.get(variant_id, 0) + int(line['units'])
+    except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
+
+    if not units_by_variant:
+        return JsonResponse({'status': 'error', 'message': 'Faltan parámetros'}, status=400)
+
+    result = complete_production(units_by_variant)
+    return JsonResponse({
+        'status': 'ok',
+        'items': [
+            {
+                'id': item.id,
+                'order_id': item.order_id,
+                'variant_id': item.variant_id,
+                'units': units,
+                'completed_quantity': item.completed_quantity,
+                'is_completed': item.completed_quantity >= item.quantity,
+            }
+            for item, units in result['updated']
+        ],
+        'leftover': {str(variant_id): units for variant_id, units in result['leftover'].items()},
+    })
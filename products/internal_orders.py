@@ -0,0 +1,431 @@
+"""
+Operaciones sobre los items de un pedido interno.
+
+add_variants_to_order agrega muchas variantes con un número fijo de consultas, sin
+importar cuántas sean: una para las variantes (con su producto), una para los items
+existentes, un bulk_update, un bulk_create y la actualización de totales, todo en una
+transacción con el pedido bloqueado (dos clics simultáneos no duplican items).
+
+Los totales del pedido (total_items, total_estimated) se mantienen por deltas
+(InternalOrder.apply_totals_delta) en la misma transacción que cambia los items, en
+vez de re-sumar todos los items en cada clic. `manage.py verificar_totales_pedidos`
+los recalcula desde cero y reporta desfases.
+
+La cola de producción (production_queue / complete_production) agrupa lo pendiente de
+todos los pedidos en producción por variante y reparte las unidades terminadas.
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import InternalOrder, InternalOrderItem, ProductVariant
+from .pricing import price_for_variant
+from .reference_data import get_reference_data
+
+
+BATCH_MAX_OPERATIONS = 500
+
+
+class BatchError(ValueError):
+    """Lote de operaciones inválido (tipo desconocido, item inexistente...)."""
+
+
+class VersionConflict(Exception):
+    """El pedido cambió desde la versión con la que el editor armó el lote."""
+
+    def __init__(self, version):
+        super().__init__(f"El pedido va en la versión {version}")
+        self.version = version
+
+
+@dataclass
+class AddedItem:
+    item: InternalOrderItem
+    variant: ProductVariant
+    is_new: bool
+    added: int
+
+
+def _new_item(order, variant, quantity, reference):
+    """Item sin guardar con el snapshot de nombre, detalle y precio de la variante."""
+    return InternalOrderItem(
+        order=order,
+        variant=variant,
+        quantity=quantity,
+        product_name=variant.product.name,
+        variant_details=reference.variant_text(variant.size_id, variant.material_id, variant.color_id),
+        unit_price=price_for_variant(variant),
+    )
+
+
+def _create_items(order, items, known_pks):
+    """
+    bulk_create de items nuevos, al final del pedido. `known_pks` son los items ya
+    cargados de esas variantes: en MySQL (bulk_create no retorna ids) los demás
+    items de esas variantes son los recién creados, con el pedido bloqueado.
+    """
+    position = (order.items.aggregate(last=Max('position'))['last'] or 0) + 1
+    for offset, item in enumerate(items):
+        item.position = position + offset
+    InternalOrderItem.objects.bulk_create(items)
+    if any(item.pk is None for item in items):
+        created_ids = dict(
+            order.items.filter(variant_id__in=[item.variant_id for item in items])
+            .exclude(pk__in=known_pks)
+            .values_list('variant_id', 'id')
+        )
+        for item in items:
+            item.pk = created_ids[item.variant_id]
+
+
+def _sync_totals(order, locked):
+    order.total_items = locked.total_items
+    order.total_estimated = locked.total_estimated
+    order.version = locked.version
+
+
+def add_variants_to_order(order, quantities):
+    """
+    Suma al pedido `quantities` ({variant_id: cantidad}, o una lista de ids donde cada
+    repetición suma una unidad). Las variantes que ya están en el pedido incrementan
+    su item; las nuevas se crean con el snapshot de nombre, detalle y precio.
+    Los ids que no existen se ignoran. Retorna un AddedItem por variante agregada.
+    """
+    if not isinstance(quantities, dict):
+        quantities = Counter(quantities)
+    quantities = {int(variant_id): qty for variant_id, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return []
+
+    variants = ProductVariant.objects.select_related('product').in_bulk(list(quantities))
+    reference = get_reference_data()
+
+    with transaction.atomic():
+        locked = InternalOrder.objects.select_for_update().get(pk=order.pk)
+        existing, known_pks = {}, []
+        for item in locked.items.filter(variant_id__in=list(variants)).order_by('created_at', 'id'):
+            existing.setdefault(item.variant_id, item)
+            known_pks.append(item.pk)
+
+        results, to_update, to_create = [], [], []
+        items_delta, amount_delta = 0, 0
+        for variant_id, qty in quantities.items():
+            variant = variants.get(variant_id)
+            if variant is None:
+                continue
+            item = existing.get(variant_id)
+            is_new = item is None
+            if not is_new:
+                item.quantity += qty
+                to_update.append(item)
+            else:
+                item = _new_item(locked, variant, qty, reference)
+                to_create.append(item)
+            results.append(AddedItem(item=item, variant=variant, is_new=is_new, added=qty))
+            items_delta += qty
+            amount_delta += qty * item.unit_price
+
+        if to_update:
+            InternalOrderItem.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            _create_items(locked, to_create, known_pks)
+        if results:
+            locked.apply_totals_delta(items_delta, amount_delta)
+
+    _sync_totals(order, locked)
+    return results
+
+
+def set_item_quantity(item, quantity):
+    """Cambia la cantidad de un item y ajusta los totales del pedido por la diferencia."""
+    with transaction.atomic():
+        locked = InternalOrderItem.objects.select_for_update().select_related('order').get(pk=item.pk)
+        delta = quantity - locked.quantity
+        if delta:
+            InternalOrderItem.objects.filter(pk=locked.pk).update(quantity=quantity)
+            locked.order.apply_totals_delta(delta, delta * locked.unit_price)
+    item.quantity = quantity
+    item.order = locked.order
+    return locked.order
+
+
+def remove_item(item):
+    """Borra un item y descuenta su subtotal de los totales del pedido. Retorna el pedido."""
+    with transaction.atomic():
+        locked = InternalOrderItem.objects.select_for_update().select_related('order').get(pk=item.pk)
+        locked.delete()
+        locked.order.apply_totals_delta(-locked.quantity, -locked.quantity * locked.unit_price)
+    return locked.order
+
+
+def clear_order(order):
+    """Borra todos los items del pedido; los totales quedan en cero (menos el descuento)."""
+    with transaction.atomic():
+        _, deleted = order.items.all().delete()
+        order.recalculate_totals()
+        InternalOrder.objects.filter(pk=order.pk).update(version=F('version') + 1)
+        order.refresh_from_db(fields=['version'])
+    return deleted.get(InternalOrderItem._meta.label, 0)
+
+
+# --- Lotes de operaciones del editor ---
+
+def _parse_target(op):
+    if op.get('item_id') is not None:
+        return 'item', int(op['item_id'])
+    return 'variant', int(op['variant_id'])
+
+
+def _parse_quantity(value, number):
+    quantity = int(value)
+    if quantity < 1:
+        raise BatchError(f"Operación #{number}: la cantidad debe ser al menos 1")
+    return quantity
+
+
+def _parse_operations(operations):
+    if not isinstance(operations, list):
+        raise BatchError("operations debe ser una lista")
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise BatchError(f"Máximo {BATCH_MAX_OPERATIONS} operaciones por lote")
+    parsed = []
+    for number, op in enumerate(operations, start=1):
+        try:
+            kind = op.get('op')
+            if kind == 'add':
+                parsed.append((kind, int(op['variant_id']), _parse_quantity(op.get('quantity', 1), number)))
+            elif kind == 'update':
+                parsed.append((kind, _parse_target(op), _parse_quantity(op['quantity'], number)))
+            elif kind == 'remove':
+                parsed.append((kind, _parse_target(op), None))
+            elif kind == 'reorder':
+                parsed.append((kind, [int(item_id) for item_id in op['item_ids']], None))
+            else:
+                raise BatchError(f"Operación #{number}: tipo desconocido '{kind}'")
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            if isinstance(exc, BatchError):
+                raise
+            raise BatchError(f"Operación #{number} inválida") from exc
+    return parsed
+
+
+@dataclass
+class BatchResult:
+    created: list  # AddedItem de los items nuevos
+    updated: list  # items existentes con cantidad o posición cambiada
+    removed: list  # ids borrados
+
+
+def apply_item_operations(order, operations, version=None):
+    """
+    Aplica en orden un lote de operaciones del editor, en una transacción:
+
+        {"op": "add", "variant_id": 7, "quantity": 2}
+        {"op": "update", "item_id": 31, "quantity": 5}    # o "variant_id"
+        {"op": "remove", "item_id": 31}                   # o "variant_id"
+        {"op": "reorder", "item_ids": [33, 31, 32]}
+
+    Las operaciones se resuelven en memoria y se escriben de una vez (un DELETE, un
+    bulk_update, un bulk_create y un UPDATE de totales por delta). Si `version` no
+    coincide con la del pedido se lanza VersionConflict sin tocar nada; un lote inválido
+    lanza BatchError y se revierte completo.
+    """
+    parsed = _parse_operations(operations)
+    item_ids, variant_ids, add_ids = set(), set(), set()
+    for kind, target, _ in parsed:
+        if kind == 'add':
+            add_ids.add(target)
+        elif kind == 'reorder':
+            item_ids.update(target)
+        else:
+            (item_ids if target[0] == 'item' else variant_ids).add(target[1])
+    variants = ProductVariant.objects.select_related('product').in_bulk(list(add_ids)) if add_ids else {}
+    reference = get_reference_data()
+
+    with transaction.atomic():
+        locked = InternalOrder.objects.select_for_update().get(pk=order.pk)
+        if version is not None and int(version) != locked.version:
+            raise VersionConflict(locked.version)
+
+        loaded = list(
+            locked.items.filter(Q(pk__in=item_ids) | Q(variant_id__in=variant_ids | add_ids))
+            .order_by('created_at', 'id')
+        )
+        by_id = {item.pk: item for item in loaded}
+        by_variant = {}
+        for item in loaded:
+            by_variant.setdefault(item.variant_id, item)
+        original = {item.pk: (item.quantity, item.position) for item in loaded}
+        new_items = {}  # variant_id -> item sin guardar
+        removed = set()
+
+        def resolve(target, number):
+            kind, key = target
+            item = by_id.get(key) if kind == 'item' else (new_items.get(key) or by_variant.get(key))
+            if item is None:
+                raise BatchError(f"Operación #{number}: el item no está en el pedido")
+            return item
+
+        for number, (kind, target, quantity) in enumerate(parsed, start=1):
+            if kind == 'add':
+                item = new_items.get(target) or by_variant.get(target)
+                if item is not None:
+                    item.quantity += quantity
+                elif target in variants:
+                    new_items[target] = _new_item(locked, variants[target], quantity, reference)
+                else:
+                    raise BatchError(f"Operación #{number}: la variante {target} no existe")
+            elif kind == 'update':
+                resolve(target, number).quantity = quantity
+            elif kind == 'remove':
+                item = resolve(target, number)
+                if item.pk is None:
+                    del new_items[item.variant_id]
+                else:
+                    removed.add(item.pk)
+                    del by_id[item.pk]
+                    if by_variant.get(item.variant_id) is item:
+                        del by_variant[item.variant_id]
+            else:
+                for position, item_id in enumerate(target, start=1):
+                    resolve(('item', item_id), number).position = position
+
+        items_delta, amount_delta = 0, 0
+        updated = []
+        for item in loaded:
+            old_quantity, old_position = original[item.pk]
+            if item.pk in removed:
+                items_delta -= old_quantity
+                amount_delta -= old_quantity * item.unit_price
+            elif (item.quantity, item.position) != (old_quantity, old_position):
+                items_delta += item.quantity - old_quantity
+                amount_delta += (item.quantity - old_quantity) * item.unit_price
+                updated.append(item)
+        created = list(new_items.values())
+        for item in created:
+            items_delta += item.quantity
+            amount_delta += item.quantity * item.unit_price
+
+        if removed:
+            InternalOrderItem.objects.filter(pk__in=removed).delete()
+        if updated:
+            InternalOrderItem.objects.bulk_update(updated, ['quantity', 'position'])
+        if created:
+            _create_items(locked, created, list(original))
+        if removed or updated or created:
+            locked.apply_totals_delta(items_delta, amount_delta)
+
+    _sync_totals(order, locked)
+    return BatchResult(
+        created=[AddedItem(item=item, variant=variants[item.variant_id], is_new=True, added=item.quantity) for item in created],
+        updated=updated,
+        removed=sorted(removed),
+    )
+
+
+# --- Verificación ---
+
+def verify_order_totals(fix=False, chunk_size=500):
+    """
+    Recalcula los totales de todos los pedidos en consultas agregadas por bloques y
+    los compara con los guardados. Con fix=True corrige los desfasados.
+    Retorna {"checked": pedidos, "drifted": [(id, guardado, esperado), ...]}.
+    """
+    zero = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+    orders = InternalOrder.objects.order_by('pk').annotate(
+        expected_items=Coalesce(Sum('items__quantity'), Value(0), output_field=IntegerField()),
+        expected_price=Coalesce(
+            Sum(F('items__quantity') * F('items__unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            zero,
+        ),
+    ).values_list('pk', 'total_items', 'total_estimated', 'discount_amount', 'expected_items', 'expected_price')
+
+    checked, drifted = 0, []
+    last_pk = 0
+    while True:
+        rows = list(orders.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        for pk, total_items, total_estimated, discount, expected_items, expected_price in rows:
+            checked += 1
+            expected_estimated = (expected_price or 0) - (discount or 0)
+            if total_items != expected_items or total_estimated != expected_estimated:
+                drifted.append((pk, (total_items, total_estimated), (expected_items, expected_estimated)))
+                if fix:
+                    InternalOrder.objects.filter(pk=pk).update(
+                        total_items=expected_items, total_estimated=expected_estimated
+                    )
+    return {'checked': checked, 'drifted': drifted}
+
+
+# --- Cola de producción ---
+
+def _outstanding_items():
+    return InternalOrderItem.objects.filter(
+        order__status__in=InternalOrder.PRODUCTION_STATUSES,
+        completed_quantity__lt=F('quantity'),
+    )
+
+
+def production_queue(product_type=None):
+    """
+    Unidades pendientes (quantity - completed_quantity) de todos los pedidos en
+    producción, agrupadas por variante (= producto + tamaño + material + color): el
+    operario corta cada diseño una sola vez para todos los pedidos. Una consulta
+    GROUP BY; retorna dicts con variant_id, product_id, product_name, variant_details,
+    pending, orders e items, de mayor a menor pendiente.
+    """
+    items = _outstanding_items()
+    if product_type:
+        items = items.filter(variant__product__product_type=product_type)
+    return list(
+        items.values('variant_id', 'variant__product_id')
+        .annotate(
+            pending=Sum(F('quantity') - F('completed_quantity')),
+            orders=Count('order_id', distinct=True),
+            items=Count('id'),
+            product_name=Max('product_name'),
+            variant_details=Max('variant_details'),
+            oldest_order=Min('order__created_at'),
+        )
+        .order_by('-pending', 'oldest_order', 'variant_id')
+    )
+
+
+def complete_production(units_by_variant):
+    """
+    Reparte unidades terminadas ({variant_id: unidades}) entre los items pendientes
+    de esa variante, del pedido más antiguo al más nuevo, en una transacción (un
+    SELECT ... FOR UPDATE y un bulk_update). Las unidades que sobran porque no hay
+    más pendientes se reportan, no se pierden en silencio.
+    Retorna {"updated": [(item, unidades), ...], "leftover": {variant_id: unidades}}.
+    """
+    units_by_variant = {int(variant_id): int(units) for variant_id, units in units_by_variant.items() if int(units) > 0}
+    if not units_by_variant:
+        return {'updated': [], 'leftover': {}}
+
+    with transaction.atomic():
+        items = (
+            _outstanding_items().filter(variant_id__in=list(units_by_variant))
+            .select_for_update().order_by('order__created_at', 'order_id', 'position', 'id')
+        )
+        remaining = dict(units_by_variant)
+        updated = []
+        for item in items:
+            units = min(remaining[item.variant_id], item.quantity - item.completed_quantity)
+            if units <= 0:
+                continue
+            item.completed_quantity += units
+            remaining[item.variant_id] -= units
+            updated.append((item, units))
+        if updated:
+            InternalOrderItem.objects.bulk_update([item for item, _ in updated], ['completed_quantity'])
+
+    return {
+        'updated': updated,
+        'leftover': {variant_id: units for variant_id, units in remaining.items() if units},
+    }
@@ -1,9 +1,10 @@
 # products/management/commands/setup_attributes.py
 from django.core.management.base import BaseCommand
 from products.models import Size, Material, Color
+from products.pricing import seed_default_rules
 
 class Command(BaseCommand):
-    help = 'Carga los atributos base (Tamaños, Colores, Materiales)'
+    help = 'Carga los atributos base (Tamaños, Colores, Materiales) y sus reglas de precio base'
 
     def handle(self, *args, **kwargs):
         # 1. Crear Tamaños
@@ -25,4 +26,8 @@ class Command(BaseCommand):
         colors = ["Azul", "Blanco", "Dorado", "Negro", "Rojo", "Rosado", "Lila"]
         for c in colors:
             Color.objects.get_or_create(name=c)
-            self.stdout.write(f"Color creado: {c}")
\ No newline at end of file
+            self.stdout.write(f"Color creado: {c}")
+
+        # 4. Reglas de precio base (editables luego en PricingRule)
+        created = seed_default_rules()
+        self.stdout.write(f"Reglas de precio creadas: {created}")
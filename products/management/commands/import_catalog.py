@@ -0,0 +1,111 @@
+"""
+Importa diseños (PDF/PNG/JPG/WEBP) desde un directorio o ZIP local al catálogo.
+Reanudable: el checkpoint guarda qué archivos ya se procesaron.
+Uso:
+    python manage.py import_catalog /ruta/disenos --product-type vinilo_corte
+    python manage.py import_catalog disenos.zip --product-type impreso_globo --workers 8
+    python manage.py import_catalog disenos.zip --product-type cinta --retry-failed
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_import import ImportCheckpoint, open_source_entries, run_import
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa un directorio o ZIP de diseños como productos (offline, para revisión): "
+        "subidas en paralelo, escrituras por bloques y checkpoint reanudable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Directorio o archivo .zip con los diseños.")
+        parser.add_argument(
+            "--product-type",
+            required=True,
+            choices=[value for value, _ in Product.TYPE_CHOICES],
+            help="Tipo con el que se crean todos los productos.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "BULK_UPLOAD_WORKER_THREADS", 4),
+            help="Hilos leyendo/subiendo archivos en paralelo.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=50,
+            help="Archivos por bloque (un bulk_create y un checkpoint por bloque).",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Archivo de checkpoint. Por defecto: <source>.import.json",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignora el checkpoint existente y empieza de cero.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Reintenta los archivos que fallaron en una corrida anterior.",
+        )
+
+    def handle(self, *args, **options):
+        source = options["source"].rstrip("/\\")
+        checkpoint_path = options["checkpoint"] or f"{source}.import.json"
+        checkpoint = ImportCheckpoint(checkpoint_path, resume=not options["restart"])
+        if checkpoint.entries:
+            self.stdout.write(f"- Reanudando desde {checkpoint_path} ({len(checkpoint.entries)} ya procesados)")
+
+        try:
+            entries, close = open_source_entries(source)
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        start = time.monotonic()
+
+        def report(result, totals):
+            elapsed = max(time.monotonic() - start, 1e-6)
+            self.stdout.write(
+                f"  {totals['files']} archivos | +{len(result.created)} creados, "
+                f"{len(result.duplicates)} duplicados, {len(result.failed)} fallidos | "
+                f"{totals['files'] / elapsed:.1f} arch/s, {totals['bytes'] / elapsed / (1024 * 1024):.1f} MB/s"
+            )
+            for key, error in result.failed.items():
+                self.stdout.write(self.style.WARNING(f"  ! {key}: {error}"))
+
+        try:
+            totals = run_import(
+                entries,
+                options["product_type"],
+                checkpoint,
+                workers=options["workers"],
+                chunk_size=max(1, options["chunk_size"]),
+                retry_failed=options["retry_failed"],
+                on_chunk=report,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f"Interrumpido. Reanuda con el mismo comando ({checkpoint_path})."))
+            return
+        finally:
+            close()
+
+        elapsed = max(time.monotonic() - start, 1e-6)
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("Importación completada"))
+        self.stdout.write(f"- Productos creados: {totals['created']}")
+        self.stdout.write(f"- Duplicados omitidos: {totals['duplicates']}")
+        self.stdout.write(f"- Fallidos: {totals['failed']}")
+        self.stdout.write(f"- Ya procesados (checkpoint): {totals['skipped']}")
+        self.stdout.write(
+            f"- Rendimiento: {totals['files']} archivos, {totals['bytes'] / (1024 * 1024):.1f} MB en {elapsed:.1f}s "
+            f"({totals['files'] / elapsed:.1f} arch/s, {totals['bytes'] / elapsed / (1024 * 1024):.1f} MB/s)"
+        )
+        self.stdout.write("- Previews encoladas: ejecuta `python manage.py procesar_previews`")
@@ -0,0 +1,64 @@
+"""
+Worker de lotes de carga masiva (sin Celery).
+Uso:
+    python manage.py procesar_cargas_masivas                # procesa lotes pendientes y termina
+    python manage.py procesar_cargas_masivas --loop         # queda escuchando (tarea always-on)
+    python manage.py procesar_cargas_masivas --workers 8
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.bulk_ingest import process_pending_batches, requeue_stale_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los lotes de carga masiva pendientes (crear producto, variantes y "
+        "encolar preview) con un pool de hilos acotado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "BULK_UPLOAD_WORKER_THREADS", 4),
+            help="Cantidad máxima de archivos procesándose en paralelo.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="No termina al vaciar la cola: espera y vuelve a consultar.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Segundos de espera entre consultas en modo --loop.",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=60,
+            help="Re-encola los lotes 'processing' sin avance (heartbeat) en estos minutos.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_batches(options["stale_minutes"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"- Lotes colgados re-encolados: {requeued}"))
+
+            start = time.monotonic()
+            processed = process_pending_batches(workers=options["workers"])
+            elapsed = time.monotonic() - start
+
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Lotes procesados: {processed} en {elapsed:.1f}s"))
+
+            if not options["loop"]:
+                if not processed:
+                    self.stdout.write("No hay lotes pendientes.")
+                return
+            time.sleep(options["sleep"])
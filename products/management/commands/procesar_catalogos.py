@@ -0,0 +1,87 @@
+"""
+Worker de catálogos pendientes: PDF, PDF vectorial e historias WebP/JPEG (sin Celery).
+Uso:
+    python manage.py procesar_catalogos                # genera los pendientes y termina
+    python manage.py procesar_catalogos --loop         # queda escuchando (tarea always-on)
+
+Es el camino recomendado en producción (CATALOG_BUILD_IN_THREAD=False, ver
+TAREAS_EN_SEGUNDO_PLANO.md): dibuja las páginas con CATALOG_RENDER_WORKERS procesos.
+Con el hilo de fondo activo sirve además para retomar catálogos que quedaron a
+medias si el proceso web se reinició.
+
+Al iniciar, y cada hora en modo --loop, borra de storage los catálogos viejos o
+reemplazados (--keep-days, por defecto CATALOG_BUILD_KEEP_DAYS).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.catalog_builds import process_pending_builds, prune_old_builds, requeue_stale_builds
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = "Genera los catálogos encolados desde el editor y la selección de catálogos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-builds",
+            type=int,
+            default=None,
+            help="Termina después de generar esta cantidad de catálogos.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="No termina al vaciar la cola: espera y vuelve a consultar.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=3.0,
+            help="Segundos de espera entre consultas en modo --loop.",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=30,
+            help="Devuelve a pendiente los catálogos 'processing' más viejos que esto.",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=None,
+            help="Días que se guardan los catálogos generados (por defecto CATALOG_BUILD_KEEP_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        last_prune = None
+        while True:
+            if last_prune is None or time.monotonic() - last_prune >= PRUNE_INTERVAL_SECONDS:
+                pruned = prune_old_builds(options["keep_days"])
+                last_prune = time.monotonic()
+                if pruned:
+                    self.stdout.write(f"- Catálogos viejos borrados: {pruned}")
+
+            requeued = requeue_stale_builds(options["stale_minutes"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"- Catálogos colgados re-encolados: {requeued}"))
+
+            start = time.monotonic()
+            stats = process_pending_builds(max_builds=options["max_builds"])
+            elapsed = time.monotonic() - start
+
+            if stats["processed"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Catálogos: {stats['completed']} generados, {stats['failed']} fallidos "
+                        f"en {elapsed:.1f}s"
+                    )
+                )
+
+            if not options["loop"]:
+                if not stats["processed"]:
+                    self.stdout.write("No hay catálogos pendientes.")
+                return
+            time.sleep(options["sleep"])
@@ -0,0 +1,116 @@
+"""
+Worker de la cola de previsualizaciones (sin Celery).
+Uso:
+    python manage.py procesar_previews                # vacía la cola y termina
+    python manage.py procesar_previews --loop         # queda escuchando (tarea always-on)
+    python manage.py procesar_previews --enqueue-missing --workers 4
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.previews import (
+    enqueue_missing_previews,
+    render_cache_stats,
+    requeue_failed_jobs,
+    requeue_stale_jobs,
+    run_preview_worker,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa la cola de previsualizaciones WebP de productos (y sus derivados "
+        "thumb/card/story/full) con un pool de hilos acotado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "PREVIEW_WORKER_THREADS", 2),
+            help="Cantidad máxima de hilos renderizando en paralelo.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Trabajos tomados de la cola por iteración.",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Termina después de procesar esta cantidad de trabajos.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="No termina al vaciar la cola: espera y vuelve a consultar.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Segundos de espera entre consultas en modo --loop.",
+        )
+        parser.add_argument(
+            "--enqueue-missing",
+            action="store_true",
+            help="Encola primero los productos sin imagen o sin derivados responsive.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            type=int,
+            default=0,
+            metavar="MAX_ATTEMPTS",
+            help="Reintenta trabajos fallidos con menos de MAX_ATTEMPTS intentos.",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=30,
+            help="Devuelve a pendiente los trabajos 'processing' más viejos que esto.",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue_missing"]:
+            queued = enqueue_missing_previews()
+            self.stdout.write(f"- Productos encolados: {queued}")
+
+        while True:
+            requeued = requeue_stale_jobs(options["stale_minutes"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"- Trabajos colgados re-encolados: {requeued}"))
+            if options["retry_failed"]:
+                retried = requeue_failed_jobs(options["retry_failed"])
+                if retried:
+                    self.stdout.write(f"- Trabajos fallidos reintentados: {retried}")
+
+            start = time.monotonic()
+            stats = run_preview_worker(
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                max_jobs=options["max_jobs"],
+            )
+            elapsed = time.monotonic() - start
+
+            if stats["processed"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Previews: {stats['completed']} completadas, {stats['failed']} fallidas "
+                        f"en {elapsed:.1f}s"
+                    )
+                )
+
+            if not options["loop"]:
+                if not stats["processed"]:
+                    self.stdout.write("No hay previsualizaciones pendientes.")
+                cache = render_cache_stats()
+                self.stdout.write(
+                    f"- Caché de render: {cache['entries']} entradas, {cache['hits']} aciertos, "
+                    f"{cache['misses']} renders ({cache['hit_rate']}% aciertos)"
+                )
+                return
+            time.sleep(options["sleep"])
@@ -0,0 +1,40 @@
+"""
+Reconstruye el índice de búsqueda de texto de productos y clientes (products/search.py).
+Necesario tras migrar, al cambiar SEARCH_BACKEND o tras importar datos directo a la BD.
+Uso:
+    python manage.py reconstruir_indice_busqueda
+    python manage.py reconstruir_indice_busqueda --kind client
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.search import CLIENT, INDEX_CHUNK_SIZE, PRODUCT, get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de texto de productos y clientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=[PRODUCT, CLIENT],
+            action="append",
+            help="Solo este tipo (se puede repetir). Por defecto, todos.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=INDEX_CHUNK_SIZE,
+            help="Objetos por bloque.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        result = rebuild_search_index(options["kind"], chunk_size=max(1, options["chunk_size"]))
+        elapsed = time.monotonic() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido ({get_backend().name})"))
+        for kind, total in result.items():
+            self.stdout.write(f"- {kind}: {total} documentos")
+        self.stdout.write(f"- Tiempo: {elapsed:.2f}s")
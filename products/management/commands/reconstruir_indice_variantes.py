@@ -0,0 +1,35 @@
+"""
+Reconstruye el índice de búsqueda de variantes del editor de pedidos internos.
+Útil tras el primer despliegue, imports directos a la BD o para descartar desfases.
+Uso:
+    python manage.py reconstruir_indice_variantes
+    python manage.py reconstruir_indice_variantes --chunk-size 1000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.variant_search import INDEX_CHUNK_SIZE, rebuild_variant_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye VariantSearchIndex (una fila por variante vendible) desde "
+        "productos y variantes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=INDEX_CHUNK_SIZE,
+            help="Productos por bloque de inserción.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        total = rebuild_variant_search_index(chunk_size=max(1, options["chunk_size"]))
+        elapsed = time.monotonic() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Variantes indexadas: {total}"))
+        self.stdout.write(f"- Tiempo: {elapsed:.2f}s")
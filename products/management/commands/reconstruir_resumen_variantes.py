@@ -0,0 +1,50 @@
+"""
+Recalcula el resumen de variantes de cada producto (variant_count, min_price, max_price).
+Útil tras importar datos directo a la BD o para verificar que no haya desfases.
+Uso:
+    python manage.py reconstruir_resumen_variantes --dry-run
+    python manage.py reconstruir_resumen_variantes
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.catalog_cache import invalidate_catalog_cache
+from products.variant_search import reindex_products
+from products.variant_summary import REBUILD_CHUNK_SIZE, rebuild_variant_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el resumen de variantes guardado en cada producto con sus variantes "
+        "y corrige los desfasados"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informa cuántos productos están desfasados.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help="Productos por UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        result = rebuild_variant_summary(dry_run=options["dry_run"], chunk_size=max(1, options["chunk_size"]))
+        if result["stale"] and not options["dry_run"]:
+            # variant_count decide qué productos entran al índice de búsqueda
+            reindex_products(result["stale_ids"])
+            invalidate_catalog_cache()
+        elapsed = time.monotonic() - start
+
+        label = "desfasados" if options["dry_run"] else "corregidos"
+        self.stdout.write(self.style.SUCCESS(f"Productos {label}: {result['stale']}"))
+        self.stdout.write(f"- Productos revisados: {result['checked']}")
+        if result["ids"]:
+            self.stdout.write(f"- Ejemplos (ids): {', '.join(str(i) for i in result['ids'])}")
+        self.stdout.write(f"- Tiempo: {elapsed:.2f}s")
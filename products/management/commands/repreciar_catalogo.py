@@ -0,0 +1,55 @@
+"""
+Actualiza el precio de las variantes existentes según las reglas de precio.
+Uso:
+    python manage.py repreciar_catalogo --dry-run
+    python manage.py repreciar_catalogo --product-type cinta
+    python manage.py repreciar_catalogo --include-defaults   # también aplica los precios base
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import Product
+from products.pricing import reprice_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el precio de todas las variantes afectadas por las reglas de precio "
+        "(un UPDATE por precio destino)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product-type",
+            action="append",
+            choices=[key for key, _ in Product.TYPE_CHOICES],
+            help="Limita a un tipo de producto. Puede repetirse.",
+        )
+        parser.add_argument(
+            "--include-defaults",
+            action="store_true",
+            help="Aplica también los precios base por tamaño donde no hay regla (sobrescribe precios manuales).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informa cuántas variantes cambiarían.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        with transaction.atomic():
+            result = reprice_catalog(
+                product_types=options["product_type"],
+                include_defaults=options["include_defaults"],
+                dry_run=options["dry_run"],
+            )
+        elapsed = time.monotonic() - start
+
+        label = "cambiarían" if options["dry_run"] else "actualizadas"
+        self.stdout.write(self.style.SUCCESS(f"Variantes {label}: {result['updated']}"))
+        self.stdout.write(f"- Combinaciones evaluadas: {result['combinations']}")
+        self.stdout.write(f"- Sentencias UPDATE: {result['statements']}")
+        self.stdout.write(f"- Tiempo: {elapsed:.2f}s")
@@ -2,8 +2,10 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Count, Max
 
+from products.catalog_cache import invalidate_catalog_cache
 from products.models import Color, Product, ProductVariant
 from products.services import sincronizar_color_en_productos, sincronizar_variantes_producto
+from products.variant_search import rebuild_variant_search_index
 
 
 class Command(BaseCommand):
@@ -126,6 +128,9 @@ class Command(BaseCommand):
                     deleted_variant_rows += to_delete.count()
                     to_delete.delete()
 
+            invalidate_catalog_cache()
+            indexed_variants = rebuild_variant_search_index()
+
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS("Saneamiento completado."))
         self.stdout.write(f"- Productos desactivados por duplicado: {deactivated_products}")
@@ -133,3 +138,4 @@ class Command(BaseCommand):
         self.stdout.write(f"- Variantes nuevas por tipo de producto: {created_variants}")
         self.stdout.write(f"- Variantes nuevas por sincronizacion de colores: {created_color_variants}")
         self.stdout.write(f"- Filas de variantes duplicadas eliminadas: {deleted_variant_rows}")
+        self.stdout.write(f"- Variantes en el indice de busqueda: {indexed_variants}")
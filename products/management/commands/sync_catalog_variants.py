@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 
 from products.models import Color, Product
-from products.services import sincronizar_color_en_productos, sincronizar_variantes_producto
+from products.color_sync import process_pending_color_syncs
+from products.services import propagar_color, sincronizar_variantes_producto
 
 
 class Command(BaseCommand):
@@ -42,8 +43,23 @@ class Command(BaseCommand):
             action="store_true",
             help="Incluye productos inactivos en la sincronizacion.",
         )
+        parser.add_argument(
+            "--pending-color-jobs",
+            action="store_true",
+            help="Procesa solo las propagaciones de color pendientes (COLOR_SYNC_IN_BACKGROUND) y termina.",
+        )
 
     def handle(self, *args, **options):
+        if options["pending_color_jobs"]:
+            jobs = process_pending_color_syncs()
+            for job in jobs:
+                self.stdout.write(
+                    f"- {job.color.name}: {job.variants_created} variantes nuevas en {job.duration_ms} ms "
+                    f"({job.get_status_display()})"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Propagaciones procesadas: {len(jobs)}"))
+            return
+
         only_active = not options["include_inactive"]
         selected_types = list(dict.fromkeys(options["product_type"]))
         if options["all_product_types"]:
@@ -84,9 +100,9 @@ class Command(BaseCommand):
         self.stdout.write(self.style.MIGRATE_HEADING("Sincronizando colores en productos"))
         color_variants_created = 0
         for color in colors:
-            created = sincronizar_color_en_productos(color, only_active=only_active) or 0
-            color_variants_created += created
-            self.stdout.write(f"- {color.name}: {created} variantes nuevas")
+            report = propagar_color(color, only_active=only_active)
+            color_variants_created += report["created"]
+            self.stdout.write(f"- {color.name}: {report['created']} variantes nuevas en {report['elapsed_ms']} ms")
 
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS("Sincronizacion completada"))
@@ -0,0 +1,47 @@
+"""
+Recalcula desde cero los totales de los pedidos internos (total_items, total_estimated)
+y reporta los que se desfasaron de sus items. Los totales se mantienen por deltas en
+cada cambio; esto detecta ediciones que no pasaron por products/internal_orders.py
+(admin, imports directos a la BD). Pensado para correr periódicamente (cron).
+Uso:
+    python manage.py verificar_totales_pedidos
+    python manage.py verificar_totales_pedidos --fix
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.internal_orders import verify_order_totals
+
+
+class Command(BaseCommand):
+    help = "Verifica (y opcionalmente corrige) los totales guardados de los pedidos internos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Corrige los pedidos desfasados.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Pedidos por consulta.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        result = verify_order_totals(fix=options["fix"], chunk_size=max(1, options["chunk_size"]))
+        elapsed = time.monotonic() - start
+
+        drifted = result["drifted"]
+        label = "corregidos" if options["fix"] else "desfasados"
+        style = self.style.SUCCESS if not drifted or options["fix"] else self.style.WARNING
+        self.stdout.write(style(f"Pedidos {label}: {len(drifted)}"))
+        self.stdout.write(f"- Pedidos revisados: {result['checked']}")
+        for pk, (items, estimated), (expected_items, expected_estimated) in drifted[:20]:
+            self.stdout.write(
+                f"  #{pk}: items {items} -> {expected_items}, total {estimated} -> {expected_estimated}"
+            )
+        self.stdout.write(f"- Tiempo: {elapsed:.2f}s")
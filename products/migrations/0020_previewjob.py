@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_add_discount_percentage_and_expense_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreviewJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duración (ms)')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preview_jobs', to='products.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Previsualización',
+                'verbose_name_plural': 'Trabajos de Previsualización',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='preview_job_status_idx')],
+            },
+        ),
+    ]
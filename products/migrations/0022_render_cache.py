@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='source_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Hash del archivo fuente'),
+        ),
+        migrations.CreateModel(
+            name='RenderCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='SHA-256 del archivo fuente')),
+                ('render_key', models.CharField(max_length=200, verbose_name='Parámetros de render')),
+                ('image_name', models.CharField(max_length=255, verbose_name='Imagen en storage')),
+                ('derivatives', models.JSONField(blank=True, default=dict, verbose_name='Derivados en storage')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Aciertos')),
+                ('misses', models.PositiveIntegerField(default=1, verbose_name='Fallos (renders)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True, verbose_name='Último acierto')),
+            ],
+            options={
+                'verbose_name': 'Caché de Render',
+                'verbose_name_plural': 'Caché de Render',
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'render_key'), name='unique_render_cache_key')],
+            },
+        ),
+    ]
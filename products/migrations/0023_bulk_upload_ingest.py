@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_render_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkuploadbatch',
+            name='product_type',
+            field=models.CharField(blank=True, choices=[('vinilo_corte', 'Vinilo de Corte'), ('impreso_globo', 'Impreso para Globos'), ('cinta', 'Cinta Ramos'), ('logo', 'Stickers Logo'), ('interno', 'Manejo Interno / Otros')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='bulkuploaditem',
+            name='source_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:57
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_variants(apps, schema_editor):
+    """
+    Antes de la restricción única: por cada combinación repetida conserva la
+    variante más antigua y re-apunta a ella los items de carrito y de pedidos internos.
+    """
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    CartItem = apps.get_model('products', 'CartItem')
+    InternalOrderItem = apps.get_model('products', 'InternalOrderItem')
+
+    duplicates = (
+        ProductVariant.objects.filter(color__isnull=False)
+        .values('product_id', 'size_id', 'material_id', 'color_id')
+        .annotate(total=Count('id'), keep_id=Min('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        extra_ids = list(
+            ProductVariant.objects.filter(
+                product_id=group['product_id'],
+                size_id=group['size_id'],
+                material_id=group['material_id'],
+                color_id=group['color_id'],
+            ).exclude(id=group['keep_id']).values_list('id', flat=True)
+        )
+        CartItem.objects.filter(variant_id__in=extra_ids).update(variant_id=group['keep_id'])
+        InternalOrderItem.objects.filter(variant_id__in=extra_ids).update(variant_id=group['keep_id'])
+        ProductVariant.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_bulk_upload_ingest'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_variants, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(fields=('product', 'size', 'material', 'color'), name='unique_product_variant_combination'),
+        ),
+    ]
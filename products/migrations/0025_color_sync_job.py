@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_variant_unique_combination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColorSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('only_active', models.BooleanField(default=True, verbose_name='Solo productos activos')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('variants_created', models.PositiveIntegerField(default=0, verbose_name='Variantes creadas')),
+                ('products_scanned', models.PositiveIntegerField(default=0, verbose_name='Productos evaluados')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duración (ms)')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='products.color', verbose_name='Color')),
+            ],
+            options={
+                'verbose_name': 'Sincronización de Color',
+                'verbose_name_plural': 'Sincronizaciones de Color',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import django.db.models.deletion
+import products.models_pricing
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_color_sync_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=products.models_pricing._product_type_choices, max_length=20, verbose_name='Tipo de producto')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio')),
+                ('priority', models.IntegerField(default=0, verbose_name='Prioridad')),
+                ('valid_from', models.DateTimeField(blank=True, null=True, verbose_name='Vigente desde')),
+                ('valid_until', models.DateTimeField(blank=True, null=True, verbose_name='Vigente hasta')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('description', models.CharField(blank=True, max_length=200, verbose_name='Descripción')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última modificación')),
+                ('color', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='products.color', verbose_name='Color')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='products.material', verbose_name='Material')),
+                ('size', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='products.size', verbose_name='Tamaño')),
+            ],
+            options={
+                'verbose_name': 'Regla de Precio',
+                'verbose_name_plural': 'Reglas de Precio',
+                'ordering': ['product_type', '-priority', 'id'],
+            },
+        ),
+    ]
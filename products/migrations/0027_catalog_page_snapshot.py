@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0026_pricing_rule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogPageSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(max_length=20, verbose_name='Tipo de producto')),
+                ('category_slug', models.CharField(blank=True, max_length=100, verbose_name='Categoría')),
+                ('page', models.PositiveIntegerField(verbose_name='Página')),
+                ('payload', models.TextField(verbose_name='Contenido (JSON)')),
+                ('etag', models.CharField(max_length=64, verbose_name='ETag')),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Construida')),
+                ('build_ms', models.PositiveIntegerField(default=0, verbose_name='Duración (ms)')),
+            ],
+            options={
+                'verbose_name': 'Página de Catálogo en Caché',
+                'verbose_name_plural': 'Páginas de Catálogo en Caché',
+                'constraints': [models.UniqueConstraint(fields=('product_type', 'category_slug', 'page'), name='unique_catalog_page_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+def clear_snapshots(apps, schema_editor):
+    # Las páginas en caché estaban indexadas por número de página: se reconstruyen solas
+    apps.get_model('products', 'CatalogPageSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0027_catalog_page_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_snapshots, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='catalogpagesnapshot',
+            name='unique_catalog_page_snapshot',
+        ),
+        migrations.RemoveField(
+            model_name='catalogpagesnapshot',
+            name='page',
+        ),
+        migrations.AddField(
+            model_name='catalogpagesnapshot',
+            name='cursor',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_type', 'is_active', 'is_online', 'created_at', 'id'], name='product_catalog_seek_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='catalogpagesnapshot',
+            constraint=models.UniqueConstraint(fields=('product_type', 'category_slug', 'cursor'), name='unique_catalog_page_snapshot'),
+        ),
+    ]
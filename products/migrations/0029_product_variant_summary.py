@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_variant_summary(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    Product.objects.update(
+        variant_count=Coalesce(
+            Subquery(variants.annotate(total=Count('id')).values('total')[:1]),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+        min_price=Subquery(variants.annotate(value=Min('price')).values('value')[:1]),
+        max_price=Subquery(variants.annotate(value=Max('price')).values('value')[:1]),
+        last_variant_change=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0028_catalog_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_variant_change',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último cambio de variantes'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio hasta'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio desde'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='variant_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Cantidad de variantes'),
+        ),
+        migrations.RunPython(backfill_variant_summary, migrations.RunPython.noop),
+    ]
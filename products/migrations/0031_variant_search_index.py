@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+CHUNK_SIZE = 500
+
+
+def _thumb_name(product):
+    """Product.get_image_name('thumb') con el modelo histórico."""
+    if not product.image:
+        return ''
+    derivatives = product.image_derivatives or {}
+    if derivatives.get('source') == product.image.name:
+        thumb = derivatives.get('sizes', {}).get('thumb')
+        if thumb:
+            return thumb['name']
+    return product.image.name
+
+
+def backfill_variant_search_index(apps, schema_editor):
+    """
+    Indexa las variantes existentes, igual que products/variant_search.py: solo el
+    producto activo con variantes más reciente de cada (nombre, tipo).
+    """
+    Product = apps.get_model('products', 'Product')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    VariantSearchIndex = apps.get_model('products', 'VariantSearchIndex')
+    sizes = apps.get_model('products', 'Size').objects.in_bulk()
+    materials = apps.get_model('products', 'Material').objects.in_bulk()
+    colors = apps.get_model('products', 'Color').objects.in_bulk()
+
+    latest_ids = sorted(
+        Product.objects.filter(is_active=True, variant_count__gt=0).order_by()
+        .values('name', 'product_type').annotate(latest_id=Max('id'))
+        .values_list('latest_id', flat=True)
+    )
+    for offset in range(0, len(latest_ids), CHUNK_SIZE):
+        chunk = latest_ids[offset:offset + CHUNK_SIZE]
+        products = Product.objects.filter(pk__in=chunk).only(
+            'id', 'name', 'description', 'product_type', 'image', 'image_derivatives'
+        ).in_bulk()
+        categories = {}
+        for product_id, category_id in Product.categories.through.objects.filter(
+            product_id__in=chunk
+        ).values_list('product_id', 'category_id'):
+            categories.setdefault(product_id, []).append(category_id)
+
+        entries = []
+        for variant_id, product_id, size_id, material_id, color_id, price in ProductVariant.objects.filter(
+            product_id__in=chunk
+        ).values_list('id', 'product_id', 'size_id', 'material_id', 'color_id', 'price'):
+            product = products[product_id]
+            size, material, color = sizes.get(size_id), materials.get(material_id), colors.get(color_id)
+            category_ids = sorted(categories.get(product_id, ()))
+            entries.append(VariantSearchIndex(
+                variant_id=variant_id,
+                product_id=product_id,
+                product_name=product.name,
+                product_type=product.product_type,
+                search_text=f"{product.name} {product.description or ''}".lower(),
+                category_ids=f",{','.join(map(str, category_ids))}," if category_ids else '',
+                size_id=size_id,
+                size_name=size.name if size else '',
+                size_dimensions=size.dimensions if size else '',
+                material_id=material_id,
+                material_name=material.name if material else '',
+                color_id=color_id,
+                color_name=color.name if color else '',
+                color_hex=color.hex_code if color else '',
+                price=price or 0,
+                image_name=_thumb_name(product),
+            ))
+        VariantSearchIndex.objects.bulk_create(entries, batch_size=CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0030_reference_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantSearchIndex',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='products.productvariant', verbose_name='Variante')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Producto')),
+                ('product_type', models.CharField(max_length=20, verbose_name='Tipo de producto')),
+                ('search_text', models.TextField(blank=True, verbose_name='Texto de búsqueda')),
+                ('category_ids', models.CharField(blank=True, max_length=500, verbose_name='Categorías')),
+                ('size_id', models.IntegerField(verbose_name='Tamaño')),
+                ('size_name', models.CharField(max_length=50, verbose_name='Nombre tamaño')),
+                ('size_dimensions', models.CharField(blank=True, max_length=50, verbose_name='Dimensiones')),
+                ('material_id', models.IntegerField(verbose_name='Material')),
+                ('material_name', models.CharField(max_length=50, verbose_name='Nombre material')),
+                ('color_id', models.IntegerField(blank=True, null=True, verbose_name='Color')),
+                ('color_name', models.CharField(blank=True, max_length=50, verbose_name='Nombre color')),
+                ('color_hex', models.CharField(blank=True, max_length=7, verbose_name='Color hex')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio')),
+                ('image_name', models.CharField(blank=True, max_length=255, verbose_name='Miniatura')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='Indexada')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='products.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Índice de Búsqueda de Variante',
+                'verbose_name_plural': 'Índice de Búsqueda de Variantes',
+                'indexes': [models.Index(fields=['product_type', 'product_name', 'size_name'], name='variant_search_type_name_idx'), models.Index(fields=['product_name', 'size_name'], name='variant_search_name_idx'), models.Index(fields=['product_type', 'price'], name='variant_search_type_price_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_variant_search_index, migrations.RunPython.noop),
+    ]
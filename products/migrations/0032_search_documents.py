@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:17
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'products_search_fts'
+
+
+def create_fulltext_structures(apps, schema_editor):
+    """Tabla FTS5 en SQLite o índice FULLTEXT en MySQL (ver products/search.py)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            pass  # SQLite sin FTS5: SEARCH_BACKEND='auto' usa la tabla de tokens
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            "ALTER TABLE products_searchdocument ADD FULLTEXT INDEX search_document_fulltext (title, body)"
+        )
+
+
+def backfill_search_documents(apps, schema_editor):
+    """
+    Indexa los productos y clientes existentes en el backend activo (después los
+    mantienen los signals). Usa los modelos históricos y solo las funciones puras
+    de products/search.py para armar el texto.
+    """
+    from products.search import (
+        CLIENT, INDEX_CHUNK_SIZE, PRODUCT, SQLiteFTS5Backend, TokenBackend,
+        _client_document, _product_document, get_backend,
+    )
+
+    SearchDocument = apps.get_model('products', 'SearchDocument')
+    SearchToken = apps.get_model('products', 'SearchToken')
+    sources = {
+        PRODUCT: (
+            apps.get_model('products', 'Product').objects.only('id', 'name', 'description'),
+            _product_document,
+        ),
+        CLIENT: (
+            apps.get_model('users', 'User').objects.only(
+                'id', 'first_name', 'last_name', 'username', 'cedula', 'phone_number'
+            ),
+            _client_document,
+        ),
+    }
+    backend = get_backend().name
+    for kind, (queryset, build) in sources.items():
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for offset in range(0, len(ids), INDEX_CHUNK_SIZE):
+            chunk = ids[offset:offset + INDEX_CHUNK_SIZE]
+            SearchDocument.objects.bulk_create(
+                SearchDocument(kind=kind, object_id=obj.pk, title=title[:500], body=body)
+                for obj, (title, body) in ((obj, build(obj)) for obj in queryset.filter(pk__in=chunk))
+            )
+            documents = list(SearchDocument.objects.filter(kind=kind, object_id__in=chunk))
+            if backend == TokenBackend.name:
+                SearchToken.objects.bulk_create(
+                    (
+                        SearchToken(kind=kind, object_id=document.object_id, token=token, weight=weight)
+                        for document in documents
+                        for token, weight in TokenBackend.document_tokens(document.title, document.body).items()
+                    ),
+                    batch_size=2000,
+                )
+            elif backend == SQLiteFTS5Backend.name:
+                with schema_editor.connection.cursor() as cursor:
+                    cursor.executemany(
+                        f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                        [(document.pk, document.title, document.body) for document in documents],
+                    )
+            # MySQL: el índice FULLTEXT se llena solo
+
+
+def drop_fulltext_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'mysql':
+        schema_editor.execute("ALTER TABLE products_searchdocument DROP INDEX search_document_fulltext")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0031_variant_search_index'),
+        ('users', '0003_user_cedula'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='variantsearchindex',
+            name='search_text',
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Objeto')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='Título')),
+                ('body', models.TextField(blank=True, verbose_name='Cuerpo')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+            ],
+            options={
+                'verbose_name': 'Documento de Búsqueda',
+                'verbose_name_plural': 'Documentos de Búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Objeto')),
+                ('token', models.CharField(max_length=20, verbose_name='Token')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso')),
+            ],
+            options={
+                'verbose_name': 'Token de Búsqueda',
+                'verbose_name_plural': 'Tokens de Búsqueda',
+                'indexes': [models.Index(fields=['kind', 'token'], name='search_token_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id', 'token'), name='unique_search_token')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_structures, drop_fulltext_structures),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
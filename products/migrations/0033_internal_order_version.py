@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0032_search_documents'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='internalorderitem',
+            options={'ordering': ['position', 'created_at'], 'verbose_name': 'Item de Pedido Interno', 'verbose_name_plural': 'Items de Pedido Interno'},
+        ),
+        migrations.AddField(
+            model_name='internalorder',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+        ),
+        migrations.AddField(
+            model_name='internalorderitem',
+            name='position',
+            field=models.PositiveIntegerField(default=0, verbose_name='Posición'),
+        ),
+        migrations.AddIndex(
+            model_name='internalorderitem',
+            index=models.Index(fields=['order', 'position'], name='internal_item_position_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0033_internal_order_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='internalorder',
+            index=models.Index(fields=['status', 'created_at'], name='internal_order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='internalorderitem',
+            index=models.Index(fields=['order', 'variant', 'quantity', 'completed_quantity'], name='internal_item_queue_idx'),
+        ),
+    ]
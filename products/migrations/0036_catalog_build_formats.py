@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+def copy_pdf_to_artifacts(apps, schema_editor):
+    """Los catálogos ya generados conservan su PDF como artefacto 'pdf'"""
+    CatalogBuild = apps.get_model('products', 'CatalogBuild')
+    for build in CatalogBuild.objects.exclude(pdf=''):
+        build.artifacts = {'pdf': build.pdf.name}
+        build.save(update_fields=['artifacts'])
+
+
+def copy_artifacts_to_pdf(apps, schema_editor):
+    CatalogBuild = apps.get_model('products', 'CatalogBuild')
+    for build in CatalogBuild.objects.all():
+        if build.artifacts.get('pdf'):
+            build.pdf = build.artifacts['pdf']
+            build.save(update_fields=['pdf'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0035_catalog_builds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogbuild',
+            name='artifacts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Archivos generados'),
+        ),
+        migrations.RunPython(copy_pdf_to_artifacts, copy_artifacts_to_pdf),
+        migrations.RemoveField(
+            model_name='catalogbuild',
+            name='pdf',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0036_catalog_build_formats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkuploadbatch',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,5 @@
 from django.db import models
 from django.utils.text import slugify
-from django.core.files.base import ContentFile
-# import fitz (moved inside save for robustness)
-from PIL import Image  
-import io
-import os
 from django.conf import settings
 # ... (Tus modelos anteriores Product, Variant, etc) ...
 
@@ -78,10 +73,16 @@ class Product(models.Model):
 
     # Archivo original (Alta Calidad / Vector) -> Se va a AWS S3
     source_file = models.FileField("Archivo Fuente (PDF/PNG)", upload_to='source_files/', blank=True, null=True)
+    # SHA-256 del archivo fuente: detecta duplicados y permite reutilizar renders (RenderCacheEntry)
+    source_hash = models.CharField("Hash del archivo fuente", max_length=64, blank=True, db_index=True)
 
     # Imagen ligera para la web -> Se va a AWS S3
     image = models.ImageField("Imagen Catálogo", upload_to='products_img/', blank=True, null=True)
 
+    # Manifiesto de derivados por ancho (thumb, card, full, story) generados desde `image`.
+    # Formato: {"source": "<image.name>", "sizes": {"thumb": {"name": ..., "width": ..., "height": ...}}}
+    image_derivatives = models.JSONField("Derivados de imagen", default=dict, blank=True)
+
     # Control de visibilidad en catálogo público
     is_online = models.BooleanField("Visible en Catálogo Público", default=True)
     
@@ -90,87 +91,91 @@ class Product(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Resumen de variantes desnormalizado (products/variant_summary.py): permite filtrar
+    # "tiene variantes" y mostrar/ordenar por precio sin JOIN ni agregación por request
+    variant_count = models.PositiveIntegerField("Cantidad de variantes", default=0)
+    min_price = models.DecimalField("Precio desde", max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField("Precio hasta", max_digits=10, decimal_places=2, null=True, blank=True)
+    last_variant_change = models.DateTimeField("Último cambio de variantes", null=True, blank=True)
+
+    # Solo las escribe products/variant_summary.py (UPDATE directos)
+    VARIANT_SUMMARY_FIELDS = ('variant_count', 'min_price', 'max_price', 'last_variant_change')
+
+    class Meta:
+        indexes = [
+            # Paginación por cursor del catálogo público: WHERE tipo/activo/online
+            # y seek (created_at, id) < cursor, ordenado por el mismo índice
+            models.Index(
+                fields=['product_type', 'is_active', 'is_online', 'created_at', 'id'],
+                name='product_catalog_seek_idx',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
-        # Primero guardamos para asegurar que tenemos un ID si es nuevo (opcional, pero útil para nombres únicos)
-        is_new = self._state.adding
+        # Archivo recién subido (aún local): calculamos el hash aquí sin costo de red.
+        # Los archivos ya almacenados los hashea el worker de previews.
+        if self.source_file and not self.source_file._committed:
+            from products.previews import compute_source_hash
+            self.source_hash = compute_source_hash(self.source_file)
+        elif not self.source_file:
+            self.source_hash = ''
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Un save() normal no escribe el resumen de variantes: una instancia cargada
+            # antes de que cambiaran sus variantes lo pisaría con valores viejos (0 / NULL).
+            # Solo se guarda si se pide explícitamente en update_fields.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.VARIANT_SUMMARY_FIELDS
+                and field.attname not in deferred
+            ]
         super().save(*args, **kwargs)
 
-        # SOLO actuamos si hay un archivo fuente y NO hay imagen de catálogo
+        # SOLO actuamos si hay un archivo fuente y NO hay imagen de catálogo.
+        # La conversión a WebP ya no bloquea el request: se encola y la procesa
+        # `manage.py procesar_previews` (ver products/previews.py)
         if self.source_file and not self.image:
-            ext = os.path.splitext(self.source_file.name)[1].lower()
-            # Usar ID del producto para evitar colisiones de nombres
-            file_base = f"prod_{self.id}"
-
-            try:
-                print(f"[PREVIEW] Procesando Producto #{self.id}: {self.source_file.name}")
-                
-                # 1. Abrir archivo fuente
-                if hasattr(self.source_file, 'open'):
-                    self.source_file.open('rb')
-                self.source_file.seek(0)
-                file_content = self.source_file.read()
-
-                thumb_io = io.BytesIO()
-                processed = False
-
-                # 2. Convertir a WebP
-                if ext == '.pdf':
-                    print(f"[PREVIEW] Identificado como PDF. Intentando conversión...")
-                    try:
-                        try:
-                            import fitz
-                            print(f"[PREVIEW] fitz importado correctamente.")
-                        except ImportError as ie:
-                            print(f"[PREVIEW ERROR] No se pudo importar fitz: {ie}")
-                            # Si fitz falla, tal vez el usuario prefiere intentar con PIL directamente si es una imagen disfrazada de PDF (raro pero posible)
-                            raise ie
-
-                        doc = fitz.open(stream=file_content, filetype="pdf")
-                        print(f"[PREVIEW] PDF abierto. Páginas: {doc.page_count}")
-                        
-                        if doc.page_count > 0:
-                            page = doc.load_page(0)
-                            print(f"[PREVIEW] Primera página cargada.")
-                            
-                            # Matrix(2, 2) aumenta la resolución x2 para mejor calidad (approx 144 DPI)
-                            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                            print(f"[PREVIEW] Pixmap generado: {pix.width}x{pix.height}")
-                            
-                            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                            img.save(thumb_io, format='WEBP', quality=85)
-                            processed = True
-                            print(f"[PREVIEW] Imagen WebP generada en memoria.")
-                        else:
-                            print(f"[PREVIEW ERROR] El PDF no tiene páginas.")
-                        doc.close()
-                    except Exception as e:
-                        print(f"[PREVIEW ERROR] Falló la conversión de PDF: {str(e)}")
-                        # OPCIÓN FUERA DE LA CAJA: Si el PDF falla, intentamos tratarlo como imagen 
-                        # o simplemente no hacemos nada pero dejamos el log claro.
-                        import traceback
-                        traceback.print_exc()
-                
-                elif ext in ['.png', '.jpg', '.jpeg', '.webp']:
-                    img = Image.open(io.BytesIO(file_content))
-                    if img.mode in ('RGBA', 'LA'):
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])
-                        img = background
-                    else:
-                        img = img.convert('RGB')
-                    img.save(thumb_io, format='WEBP', quality=85)
-                    processed = True
-
-                # 3. Guardar la previsualización WebP
-                if processed:
-                    filename = f"{file_base}_preview.webp"
-                    self.image.save(filename, ContentFile(thumb_io.getvalue()), save=False)
-                    # Guardamos de nuevo SOLO el campo imagen para actualizar la DB
-                    Product.objects.filter(id=self.id).update(image=self.image.name)
-                    print(f"[PREVIEW] Éxito: {filename}")
-
-            except Exception as e:
-                print(f"[PREVIEW ERROR] Falló para Producto #{self.id}: {str(e)}")
+            from products.previews import enqueue_preview
+            enqueue_preview(self)
+
+    def _derivative(self, kind):
+        """Retorna la entrada del manifiesto si sigue vigente para la imagen actual"""
+        if not self.image or not self.image_derivatives:
+            return None
+        if self.image_derivatives.get('source') != self.image.name:
+            return None
+        return self.image_derivatives.get('sizes', {}).get(kind)
+
+    def get_image_name(self, kind='full'):
+        """Nombre en storage del derivado pedido (o de la imagen original si no existe)"""
+        derivative = self._derivative(kind)
+        if derivative:
+            return derivative['name']
+        return self.image.name if self.image else None
+
+    def get_image_url(self, kind='full'):
+        name = self.get_image_name(kind)
+        if not name:
+            return None
+        return self.image.storage.url(name)
+
+    def get_image_srcset(self):
+        """srcset listo para <img>: 'url 200w, url 480w, ...' (vacío si no hay derivados)"""
+        if not self._derivative('full'):
+            return ''
+        entries = {}
+        for data in self.image_derivatives.get('sizes', {}).values():
+            entries[data['width']] = self.image.storage.url(data['name'])
+        return ', '.join(f"{url} {width}w" for width, url in sorted(entries.items()))
+
+    @property
+    def thumb_url(self):
+        return self.get_image_url('thumb')
+
+    @property
+    def card_url(self):
+        return self.get_image_url('card')
 
     def __str__(self): return self.name
 
@@ -193,6 +198,16 @@ class ProductVariant(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.size.name} - ${self.price}"
 
+    class Meta:
+        constraints = [
+            # Una sola variante por combinación: permite bulk_create(ignore_conflicts=True)
+            # concurrente en services.py sin duplicar filas
+            models.UniqueConstraint(
+                fields=['product', 'size', 'material', 'color'],
+                name='unique_product_variant_combination',
+            ),
+        ]
+
 # ... (Tus modelos anteriores Cart, etc.) ...
 
 class ShippingAddress(models.Model):
@@ -258,11 +273,15 @@ class BulkUploadBatch(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    product_type = models.CharField(max_length=20, choices=Product.TYPE_CHOICES, blank=True)
     total_files = models.IntegerField(default=0)
     processed_files = models.IntegerField(default=0)
     successful_uploads = models.IntegerField(default=0)
     failed_uploads = models.IntegerField(default=0)
     error_log = models.TextField(blank=True)
+    # Último avance del worker (al tomar el lote y en cada item); si se vence, el
+    # lote se considera abandonado y se re-encola
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
 
     def get_progress_percentage(self):
         if self.total_files == 0:
@@ -291,6 +310,7 @@ class BulkUploadItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     original_filename = models.CharField(max_length=255)
     source_file = models.FileField(upload_to='bulk_upload_temp/')
+    source_hash = models.CharField(max_length=64, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True)
     ai_extracted_description = models.TextField(blank=True)
@@ -310,4 +330,18 @@ class BulkUploadItem(models.Model):
 from products.models_internal_orders import InternalOrder, InternalOrderItem, InternalOrderGroup
 
 # --- MODELOS DE COSTOS DE PRODUCCIÓN ---
-from products.models_costs import CostType, ProductTypeCostConfig, OrderCostBreakdown
\ No newline at end of file
+from products.models_costs import CostType, ProductTypeCostConfig, OrderCostBreakdown
+
+# --- COLA DE PREVISUALIZACIONES ---
+from products.models_previews import PreviewJob, RenderCacheEntry
+# --- SINCRONIZACIÓN DE VARIANTES EN SEGUNDO PLANO ---
+from products.models_sync import ColorSyncJob
+
+# --- REGLAS DE PRECIO ---
+from products.models_pricing import PricingRule
+
+# --- CACHÉ DEL CATÁLOGO PÚBLICO ---
+from products.models_catalog import CatalogBuild, CatalogPageSnapshot, ReferenceDataVersion
+
+# --- ÍNDICE DE BÚSQUEDA DE VARIANTES (EDITOR DE PEDIDOS INTERNOS) ---
+from products.models_search import SearchDocument, SearchToken, VariantSearchIndex
@@ -0,0 +1,114 @@
+"""
+Modelos de caché del catálogo público y de los catálogos PDF generados
+"""
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .catalog_render import OUTPUT_FORMATS
+
+
+class CatalogPageSnapshot(models.Model):
+    """
+    Página del catálogo público ya construida (productos + variantes en JSON).
+    Se descarta cuando cambian productos, variantes, categorías o colores
+    (ver products/catalog_cache.py).
+    """
+    product_type = models.CharField("Tipo de producto", max_length=20)
+    category_slug = models.CharField("Categoría", max_length=100, blank=True)
+    cursor = models.CharField("Cursor", max_length=100, blank=True)
+    payload = models.TextField("Contenido (JSON)")
+    etag = models.CharField("ETag", max_length=64)
+    built_at = models.DateTimeField("Construida", default=timezone.now)
+    build_ms = models.PositiveIntegerField("Duración (ms)", default=0)
+
+    class Meta:
+        verbose_name = "Página de Catálogo en Caché"
+        verbose_name_plural = "Páginas de Catálogo en Caché"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_type', 'category_slug', 'cursor'],
+                name='unique_catalog_page_snapshot',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_type}/{self.category_slug or '-'} @{self.cursor or 'inicio'}"
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Contador único de versión de los datos de referencia (tamaños, materiales,
+    colores, categorías y estados de pedido). Se incrementa en cada escritura y
+    cada proceso lo consulta para saber si su caché quedó vieja
+    (ver products/reference_data.py).
+    """
+    version = models.PositiveBigIntegerField("Versión", default=0)
+    updated_at = models.DateTimeField("Actualizado", auto_now=True)
+
+    class Meta:
+        verbose_name = "Versión de Datos de Referencia"
+        verbose_name_plural = "Versión de Datos de Referencia"
+
+    def __str__(self):
+        return f"v{self.version}"
+
+
+class CatalogBuild(models.Model):
+    """
+    Catálogo (formato historia) generado en segundo plano y guardado en storage, en
+    uno o varios formatos (PDF, PDF vectorial, ZIP de historias WebP/JPEG).
+    `fingerprint` resume todo lo que se dibuja (parámetros, formatos, productos,
+    categorías e imágenes): una solicitud idéntica reutiliza los archivos ya
+    generados (ver products/catalog_builds.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    fingerprint = models.CharField("Huella de contenido", max_length=64)
+    params = models.JSONField("Parámetros", default=dict)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default='pending')
+    # {formato: nombre del archivo en storage}, formatos de catalog_render.OUTPUT_FORMATS
+    artifacts = models.JSONField("Archivos generados", default=dict, blank=True)
+    page_count = models.PositiveIntegerField("Páginas", default=0)
+    product_count = models.PositiveIntegerField("Productos", default=0)
+    hits = models.PositiveIntegerField("Reutilizaciones", default=0)
+    error_message = models.TextField("Error", blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='catalog_builds',
+        verbose_name="Solicitado por",
+    )
+
+    created_at = models.DateTimeField("Fecha de creación", auto_now_add=True)
+    started_at = models.DateTimeField("Inicio", null=True, blank=True)
+    finished_at = models.DateTimeField("Fin", null=True, blank=True)
+    duration_ms = models.PositiveIntegerField("Duración (ms)", null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Catálogo PDF Generado"
+        verbose_name_plural = "Catálogos PDF Generados"
+        indexes = [
+            models.Index(fields=['fingerprint', 'status'], name='catalog_build_fp_idx'),
+            models.Index(fields=['status', 'created_at'], name='catalog_build_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Catálogo #{self.id} - {self.params.get('catalog_name', '')} ({self.get_status_display()})"
+
+    @property
+    def formats(self):
+        return self.params.get('formats') or ['pdf']
+
+    def artifact_filename(self, output_format):
+        suffix = {'pdf_vector': '_liviano', 'webp': '_historias_webp', 'jpeg': '_historias_jpg'}.get(output_format, '')
+        name = self.params.get('catalog_name', 'Catalogo').replace(' ', '_')
+        return f"Catalogo_{name}{suffix}.{OUTPUT_FORMATS[output_format][1]}"
@@ -58,8 +58,18 @@ class InternalOrder(models.Model):
         help_text="Porcentaje de descuento sobre el total (0-100)"
     )
 
+    # Sube con cada cambio de items: el editor la envía en sus lotes de operaciones
+    # para detectar ediciones concurrentes (concurrencia optimista)
+    version = models.PositiveIntegerField("Versión", default=0)
+
+    # Estados cuyos items pendientes entran a la cola de producción
+    PRODUCTION_STATUSES = ('confirmed', 'material_purchased', 'in_production')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='internal_order_status_idx'),
+        ]
         verbose_name = "Pedido Interno"
         verbose_name_plural = "Pedidos Internos"
 
@@ -108,7 +118,11 @@ class InternalOrder(models.Model):
         )['total'] or 0
 
     def recalculate_totals(self):
-        """Recalcula los totales del pedido"""
+        """
+        Recalcula los totales desde cero sumando todos los items. Las operaciones sobre
+        items usan apply_totals_delta; esto queda para cambios de descuento y para
+        `manage.py verificar_totales_pedidos`.
+        """
         from django.db.models import Sum, F
 
         aggregates = self.items.aggregate(
@@ -116,15 +130,27 @@ class InternalOrder(models.Model):
             total_price=Sum(F('quantity') * F('unit_price'))
         )
 
-        # Sumar también los gastos manuales cargados al pedido
-        expenses_total = self.cost_breakdowns.aggregate(total=Sum('total'))['total'] or 0
-
         self.total_items = aggregates['total_qty'] or 0
         total_price = aggregates['total_price'] or 0
-        
+
         self.total_estimated = total_price - (self.discount_amount or 0)
         self.save(update_fields=['total_items', 'total_estimated'])
 
+    def apply_totals_delta(self, items_delta, amount_delta):
+        """
+        Registra un cambio en los items: suma su efecto a los totales guardados (UPDATE
+        con F(), sin recorrer los items), sube la versión y relee esos campos. Llamar
+        dentro de la misma transacción que modifica los items.
+        """
+        from django.db.models import F
+
+        type(self).objects.filter(pk=self.pk).update(
+            total_items=F('total_items') + items_delta,
+            total_estimated=F('total_estimated') + amount_delta,
+            version=F('version') + 1,
+        )
+        self.refresh_from_db(fields=['total_items', 'total_estimated', 'version'])
+
 
 class InternalOrderItem(models.Model):
     """Item individual de un pedido interno"""
@@ -140,6 +166,7 @@ class InternalOrderItem(models.Model):
         verbose_name="Variante"
     )
     quantity = models.PositiveIntegerField("Cantidad", default=1)
+    position = models.PositiveIntegerField("Posición", default=0)
     completed_quantity = models.PositiveIntegerField("Cantidad completada", default=0)
 
     # Snapshot para histórico (se guarda al momento de agregar)
@@ -150,7 +177,15 @@ class InternalOrderItem(models.Model):
     created_at = models.DateTimeField("Fecha de agregado", auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['position', 'created_at']
+        indexes = [
+            models.Index(fields=['order', 'position'], name='internal_item_position_idx'),
+            # Cubre la agregación de la cola de producción (sin leer la tabla)
+            models.Index(
+                fields=['order', 'variant', 'quantity', 'completed_quantity'],
+                name='internal_item_queue_idx',
+            ),
+        ]
         verbose_name = "Item de Pedido Interno"
         verbose_name_plural = "Items de Pedido Interno"
 
@@ -177,7 +212,8 @@ class InternalOrderItem(models.Model):
             self.variant_details = " - ".join(parts) if parts else "Sin variante"
 
         if not self.unit_price and self.variant:
-            self.unit_price = self.variant.price or 0
+            from products.pricing import price_for_variant
+            self.unit_price = price_for_variant(self.variant)
 
         super().save(*args, **kwargs)
 
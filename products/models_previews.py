@@ -0,0 +1,66 @@
+"""
+Modelos para la cola de previsualizaciones (WebP) de productos
+"""
+from django.db import models
+
+
+class PreviewJob(models.Model):
+    """Trabajo pendiente de generar la imagen de catálogo de un producto"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='preview_jobs',
+        verbose_name="Producto"
+    )
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField("Intentos", default=0)
+    error_message = models.TextField("Error", blank=True)
+
+    created_at = models.DateTimeField("Fecha de creación", auto_now_add=True)
+    started_at = models.DateTimeField("Inicio", null=True, blank=True)
+    finished_at = models.DateTimeField("Fin", null=True, blank=True)
+    duration_ms = models.PositiveIntegerField("Duración (ms)", null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Trabajo de Previsualización"
+        verbose_name_plural = "Trabajos de Previsualización"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='preview_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Preview #{self.id} - Producto #{self.product_id} ({self.get_status_display()})"
+
+
+class RenderCacheEntry(models.Model):
+    """
+    Caché direccionada por contenido: SHA-256 del archivo fuente + parámetros de
+    render -> imagen WebP (y derivados) ya almacenados. Evita re-rasterizar
+    archivos idénticos (cargas masivas repetidas, duplicados, re-subidas).
+    """
+    content_hash = models.CharField("SHA-256 del archivo fuente", max_length=64)
+    render_key = models.CharField("Parámetros de render", max_length=200)
+    image_name = models.CharField("Imagen en storage", max_length=255)
+    derivatives = models.JSONField("Derivados en storage", default=dict, blank=True)
+    hits = models.PositiveIntegerField("Aciertos", default=0)
+    misses = models.PositiveIntegerField("Fallos (renders)", default=1)
+    created_at = models.DateTimeField("Fecha de creación", auto_now_add=True)
+    last_hit_at = models.DateTimeField("Último acierto", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Caché de Render"
+        verbose_name_plural = "Caché de Render"
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'render_key'], name='unique_render_cache_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.hits} aciertos)"
@@ -0,0 +1,51 @@
+"""
+Modelo de reglas de precio declarativas (ver products/pricing.py)
+"""
+from django.db import models
+
+
+def _product_type_choices():
+    from products.models import Product
+    return Product.TYPE_CHOICES
+
+
+class PricingRule(models.Model):
+    """
+    Precio de venta por tipo de producto + tamaño/material/color.
+    Los campos vacíos actúan como comodín; ante varias reglas aplicables gana la
+    de mayor prioridad y, a igual prioridad, la más específica.
+    """
+    product_type = models.CharField("Tipo de producto", max_length=20, choices=_product_type_choices)
+    size = models.ForeignKey(
+        'products.Size', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='pricing_rules', verbose_name="Tamaño"
+    )
+    material = models.ForeignKey(
+        'products.Material', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='pricing_rules', verbose_name="Material"
+    )
+    color = models.ForeignKey(
+        'products.Color', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='pricing_rules', verbose_name="Color"
+    )
+    price = models.DecimalField("Precio", max_digits=10, decimal_places=2)
+    priority = models.IntegerField("Prioridad", default=0)
+    valid_from = models.DateTimeField("Vigente desde", null=True, blank=True)
+    valid_until = models.DateTimeField("Vigente hasta", null=True, blank=True)
+    is_active = models.BooleanField("Activa", default=True)
+    description = models.CharField("Descripción", max_length=200, blank=True)
+
+    created_at = models.DateTimeField("Fecha de creación", auto_now_add=True)
+    updated_at = models.DateTimeField("Última modificación", auto_now=True)
+
+    class Meta:
+        ordering = ['product_type', '-priority', 'id']
+        verbose_name = "Regla de Precio"
+        verbose_name_plural = "Reglas de Precio"
+
+    def __str__(self):
+        parts = [self.get_product_type_display()]
+        for value in (self.size, self.material, self.color):
+            if value is not None:
+                parts.append(getattr(value, 'name', str(value)))
+        return f"{' / '.join(parts)}: ${self.price}"
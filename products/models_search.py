@@ -0,0 +1,102 @@
+"""
+Índices de búsqueda: variantes del editor de pedidos internos y texto de productos/clientes
+"""
+from django.db import models
+
+
+class VariantSearchIndex(models.Model):
+    """
+    Una fila por variante vendible (producto activo, el más reciente por nombre + tipo)
+    con todo lo que muestran y filtran api_filter_variants y la selección automática,
+    para consultar una sola tabla sin JOINs. Lo mantiene products/variant_search.py.
+    """
+    variant = models.OneToOneField(
+        'products.ProductVariant',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_entry',
+        verbose_name="Variante"
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='search_entries',
+        verbose_name="Producto"
+    )
+    product_name = models.CharField("Producto", max_length=200)
+    product_type = models.CharField("Tipo de producto", max_length=20)
+    # Ids de categorías como ",1,5," (filtro con contains=",5,")
+    category_ids = models.CharField("Categorías", max_length=500, blank=True)
+
+    size_id = models.IntegerField("Tamaño")
+    size_name = models.CharField("Nombre tamaño", max_length=50)
+    size_dimensions = models.CharField("Dimensiones", max_length=50, blank=True)
+    material_id = models.IntegerField("Material")
+    material_name = models.CharField("Nombre material", max_length=50)
+    color_id = models.IntegerField("Color", null=True, blank=True)
+    color_name = models.CharField("Nombre color", max_length=50, blank=True)
+    color_hex = models.CharField("Color hex", max_length=7, blank=True)
+
+    price = models.DecimalField("Precio", max_digits=10, decimal_places=2)
+    # Nombre en storage de la miniatura (la URL se arma al responder)
+    image_name = models.CharField("Miniatura", max_length=255, blank=True)
+    indexed_at = models.DateTimeField("Indexada", auto_now=True)
+
+    class Meta:
+        verbose_name = "Índice de Búsqueda de Variante"
+        verbose_name_plural = "Índice de Búsqueda de Variantes"
+        indexes = [
+            models.Index(fields=['product_type', 'product_name', 'size_name'], name='variant_search_type_name_idx'),
+            models.Index(fields=['product_name', 'size_name'], name='variant_search_name_idx'),
+            models.Index(fields=['product_type', 'price'], name='variant_search_type_price_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} - {self.size_name} - {self.material_name}"
+
+
+class SearchDocument(models.Model):
+    """
+    Texto normalizado (minúsculas, sin tildes) de un objeto buscable: productos y
+    clientes. Es la fuente de los backends de products/search.py (FTS5 en SQLite,
+    FULLTEXT en MySQL o la tabla de tokens SearchToken).
+    """
+    kind = models.CharField("Tipo", max_length=20)
+    object_id = models.PositiveIntegerField("Objeto")
+    title = models.CharField("Título", max_length=500, blank=True)
+    body = models.TextField("Cuerpo", blank=True)
+    updated_at = models.DateTimeField("Actualizado", auto_now=True)
+
+    class Meta:
+        verbose_name = "Documento de Búsqueda"
+        verbose_name_plural = "Documentos de Búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id}"
+
+
+class SearchToken(models.Model):
+    """
+    Prefijos de cada palabra de un SearchDocument con su peso (backend 'tokens'):
+    buscar "cora" es una igualdad indexada sobre token, no un LIKE '%cora%'.
+    """
+    kind = models.CharField("Tipo", max_length=20)
+    object_id = models.PositiveIntegerField("Objeto")
+    token = models.CharField("Token", max_length=20)
+    weight = models.PositiveSmallIntegerField("Peso", default=1)
+
+    class Meta:
+        verbose_name = "Token de Búsqueda"
+        verbose_name_plural = "Tokens de Búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'token'], name='unique_search_token'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'token'], name='search_token_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id}: {self.token}"
@@ -0,0 +1,38 @@
+"""
+Modelos para la sincronización de variantes en segundo plano
+"""
+from django.db import models
+
+
+class ColorSyncJob(models.Model):
+    """Propagación de un color nuevo a las variantes del catálogo (ver products/color_sync.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    color = models.ForeignKey(
+        'products.Color',
+        on_delete=models.CASCADE,
+        related_name='sync_jobs',
+        verbose_name="Color"
+    )
+    only_active = models.BooleanField("Solo productos activos", default=True)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default='pending')
+    variants_created = models.PositiveIntegerField("Variantes creadas", default=0)
+    products_scanned = models.PositiveIntegerField("Productos evaluados", default=0)
+    duration_ms = models.PositiveIntegerField("Duración (ms)", null=True, blank=True)
+    error_message = models.TextField("Error", blank=True)
+
+    created_at = models.DateTimeField("Fecha de creación", auto_now_add=True)
+    finished_at = models.DateTimeField("Fin", null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Sincronización de Color"
+        verbose_name_plural = "Sincronizaciones de Color"
+
+    def __str__(self):
+        return f"Color #{self.color_id} ({self.get_status_display()})"
@@ -0,0 +1,447 @@
+"""
+Generación de previsualizaciones (WebP) de productos mediante una cola en BD.
+SIN Celery - compatible con PythonAnywhere: Product.save() solo encola y el
+comando `manage.py procesar_previews` procesa los trabajos con un pool acotado.
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from PIL import Image
+
+from .catalog_cache import invalidate_catalog_cache
+from .variant_search import schedule_reindex
+from .models import PreviewJob, Product, RenderCacheEntry
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_WEBP_QUALITY = 85
+# Matrix(2, 2) aumenta la resolución x2 para mejor calidad (approx 144 DPI)
+PREVIEW_PDF_SCALE = 2
+PREVIEW_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# Anchos de los derivados responsive. 'story' cabe en la tarjeta de 1080x1920
+# del generador de catálogos sin tener que reescalar en cada página.
+IMAGE_DERIVATIVE_WIDTHS = {
+    'thumb': 200,
+    'card': 480,
+    'story': 960,
+    'full': 1200,
+}
+ACTIVE_JOB_STATUSES = ('pending', 'processing')
+
+
+def _max_pixels():
+    """Presupuesto de píxeles del render (PREVIEW_MAX_MEGAPIXELS)."""
+    return int(float(getattr(settings, 'PREVIEW_MAX_MEGAPIXELS', 4.0)) * 1_000_000)
+
+
+def _spool_threshold():
+    """Tamaño a partir del cual el fuente se vuelca a disco (PREVIEW_SPOOL_THRESHOLD_MB)."""
+    return int(float(getattr(settings, 'PREVIEW_SPOOL_THRESHOLD_MB', 8)) * 1024 * 1024)
+
+
+def render_cache_key():
+    """Parámetros que cambian el resultado del render; forman parte de la llave de caché."""
+    widths = ",".join(f"{kind}:{width}" for kind, width in sorted(IMAGE_DERIVATIVE_WIDTHS.items()))
+    return f"scale={PREVIEW_PDF_SCALE};mp={_max_pixels()};q={PREVIEW_WEBP_QUALITY};w={widths}"
+
+
+def compute_source_hash(file_obj):
+    """SHA-256 del archivo leído por bloques (no carga el archivo completo en memoria)."""
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+@contextmanager
+def open_source(product):
+    """
+    Abre source_file para renderizar y calcula su SHA-256 en la misma pasada.
+    Entrega (source, content_hash): `source` son bytes si el archivo es pequeño,
+    o la ruta de un archivo temporal (volcado por bloques) si supera el umbral;
+    así fitz/PIL leen desde disco en lugar de mantener varias copias en RAM.
+    """
+    source_file = product.source_file
+    ext = os.path.splitext(source_file.name)[1].lower()
+    digest = hashlib.sha256()
+
+    source_file.open('rb')
+    try:
+        if source_file.size <= _spool_threshold():
+            data = source_file.read()
+            digest.update(data)
+            yield data, digest.hexdigest()
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=ext) as tmp:
+            for chunk in source_file.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            yield tmp.name, digest.hexdigest()
+    finally:
+        source_file.close()
+
+
+def _flatten_to_rgb(img):
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert('RGB')
+
+
+def render_preview_image(source, ext):
+    """
+    Rasteriza el archivo fuente (solo la primera página si es PDF) a una imagen RGB
+    de como máximo PREVIEW_MAX_MEGAPIXELS. `source` son bytes o una ruta en disco.
+    Retorna None si el formato no es soportado o el PDF no tiene páginas.
+    """
+    max_pixels = _max_pixels()
+
+    if ext == '.pdf':
+        import fitz
+
+        if isinstance(source, (bytes, bytearray)):
+            doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            doc = fitz.open(source, filetype="pdf")
+        try:
+            if doc.page_count == 0:
+                return None
+            page = doc.load_page(0)
+
+            # Escala x2 (approx 144 DPI) salvo que el pliego exceda el presupuesto de píxeles
+            page_area = max(page.rect.width * page.rect.height, 1)
+            scale = min(PREVIEW_PDF_SCALE, math.sqrt(max_pixels / page_area))
+            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            try:
+                # samples_mv evita la copia intermedia a bytes de pix.samples
+                return Image.frombytes("RGB", (pix.width, pix.height), pix.samples_mv)
+            finally:
+                pix = None
+        finally:
+            doc.close()
+
+    if ext in PREVIEW_IMAGE_EXTENSIONS:
+        with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as img:
+            if img.width * img.height > max_pixels:
+                ratio = math.sqrt(max_pixels / (img.width * img.height))
+                # thumbnail() usa draft() en JPEG: decodifica directamente a menor escala
+                img.thumbnail((int(img.width * ratio), int(img.height * ratio)), Image.LANCZOS)
+            return _flatten_to_rgb(img)
+
+    return None
+
+
+def generate_product_preview(product, source=None):
+    """
+    Genera y guarda la imagen WebP de catálogo a partir de source_file.
+    `source` permite reutilizar un fuente ya abierto con open_source().
+    Retorna la imagen renderizada (para reutilizarla en los derivados) o None.
+    """
+    if not product.source_file:
+        return None
+
+    ext = os.path.splitext(product.source_file.name)[1].lower()
+    if source is None:
+        with open_source(product) as (opened, _):
+            img = render_preview_image(opened, ext)
+    else:
+        img = render_preview_image(source, ext)
+    if img is None:
+        return None
+
+    thumb_io = io.BytesIO()
+    img.save(thumb_io, format='WEBP', quality=PREVIEW_WEBP_QUALITY)
+
+    # Usar ID del producto para evitar colisiones de nombres
+    filename = f"prod_{product.id}_preview.webp"
+    product.image.save(filename, ContentFile(thumb_io.getvalue()), save=False)
+    thumb_io.close()
+    # Guardamos SOLO el campo imagen para no disparar de nuevo save()/signals
+    Product.objects.filter(id=product.id).update(image=product.image.name)
+    return img
+
+
+def generate_image_derivatives(product, img=None):
+    """
+    Genera los derivados por ancho (IMAGE_DERIVATIVE_WIDTHS) junto a la imagen
+    de catálogo y guarda el manifiesto en product.image_derivatives.
+    Si no se pasa `img`, se lee la imagen ya almacenada.
+    Retorna el manifiesto, o None si el producto no tiene imagen.
+    """
+    if not product.image:
+        return None
+
+    if img is None:
+        product.image.open('rb')
+        try:
+            img = Image.open(product.image)
+            img.load()
+        finally:
+            product.image.close()
+        img = img.convert('RGB')
+
+    storage = product.image.storage
+    sizes = {}
+
+    for kind, width in IMAGE_DERIVATIVE_WIDTHS.items():
+        # Nunca ampliamos: si la imagen es más angosta se conserva su ancho
+        target_w = min(width, img.width)
+        target_h = max(1, round(img.height * target_w / img.width))
+        resized = img if target_w == img.width else img.resize((target_w, target_h), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        resized.save(buffer, format='WEBP', quality=PREVIEW_WEBP_QUALITY)
+        name = storage.save(f"products_img/prod_{product.id}_{kind}.webp", ContentFile(buffer.getvalue()))
+        sizes[kind] = {'name': name, 'width': target_w, 'height': target_h}
+
+    manifest = {'source': product.image.name, 'sizes': sizes}
+    Product.objects.filter(id=product.id).update(image_derivatives=manifest)
+    product.image_derivatives = manifest
+
+    # Los derivados anteriores NO se borran: pueden estar compartidos con otros
+    # productos a través de RenderCacheEntry.
+    return manifest
+
+
+def _derivatives_are_current(product):
+    manifest = product.image_derivatives or {}
+    return bool(product.image) and manifest.get('source') == product.image.name and set(
+        manifest.get('sizes', {})
+    ) == set(IMAGE_DERIVATIVE_WIDTHS)
+
+
+def apply_cached_render(product, content_hash):
+    """
+    Si ya existe un render para este contenido, reutiliza la imagen y derivados
+    almacenados en lugar de re-rasterizar. Retorna True en caso de acierto.
+    """
+    entry = RenderCacheEntry.objects.filter(content_hash=content_hash, render_key=render_cache_key()).first()
+    if entry is None:
+        return False
+
+    storage = product.image.storage
+    if not storage.exists(entry.image_name):
+        # El artefacto fue borrado del storage: invalidamos y se re-renderiza
+        entry.delete()
+        return False
+
+    manifest = {'source': entry.image_name, 'sizes': entry.derivatives}
+    Product.objects.filter(id=product.id).update(image=entry.image_name, image_derivatives=manifest)
+    product.image.name = entry.image_name
+    product.image_derivatives = manifest
+
+    RenderCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_hit_at=timezone.now())
+    return True
+
+
+def store_render_in_cache(product, content_hash):
+    """Registra el render recién generado como artefacto reutilizable para este hash."""
+    key = render_cache_key()
+    sizes = (product.image_derivatives or {}).get('sizes', {})
+    try:
+        RenderCacheEntry.objects.create(
+            content_hash=content_hash,
+            render_key=key,
+            image_name=product.image.name,
+            derivatives=sizes,
+        )
+    except IntegrityError:
+        # Otro worker renderizó el mismo contenido en paralelo: contamos el fallo
+        RenderCacheEntry.objects.filter(content_hash=content_hash, render_key=key).update(
+            misses=F('misses') + 1
+        )
+
+
+def render_cache_stats():
+    """Totales de aciertos/fallos de la caché de render."""
+    totals = RenderCacheEntry.objects.aggregate(hits=Sum('hits'), misses=Sum('misses'))
+    hits = totals['hits'] or 0
+    misses = totals['misses'] or 0
+    lookups = hits + misses
+    return {
+        'entries': RenderCacheEntry.objects.count(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits * 100 / lookups, 1) if lookups else 0,
+    }
+
+
+def enqueue_preview(product):
+    """
+    Encola la previsualización de un producto (idempotente: no duplica
+    trabajos pendientes o en proceso para el mismo producto).
+    """
+    existing = PreviewJob.objects.filter(
+        product_id=product.id,
+        status__in=ACTIVE_JOB_STATUSES,
+    ).first()
+    if existing:
+        return existing
+    return PreviewJob.objects.create(product_id=product.id)
+
+
+def enqueue_missing_previews(queryset=None):
+    """
+    Encola los productos con archivo fuente y sin imagen, y los que tienen
+    imagen pero aún no tienen derivados. Retorna cuántos se encolaron.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    without_image = Q(image='') & ~Q(source_file='') & Q(source_file__isnull=False)
+    without_derivatives = ~Q(image='') & Q(image__isnull=False) & Q(image_derivatives={})
+    products = queryset.filter(without_image | without_derivatives).exclude(
+        preview_jobs__status__in=ACTIVE_JOB_STATUSES
+    )
+
+    jobs = [PreviewJob(product_id=pid) for pid in products.values_list('id', flat=True).distinct()]
+    PreviewJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def _claim_job(job_id):
+    """Marca el trabajo como 'processing' solo si sigue pendiente (evita doble proceso entre workers)."""
+    return PreviewJob.objects.filter(id=job_id, status='pending').update(
+        status='processing',
+        started_at=timezone.now(),
+    ) == 1
+
+
+def process_preview_job(job_id):
+    """Procesa un trabajo de la cola. Retorna el estado final o None si otro worker lo tomó."""
+    if not _claim_job(job_id):
+        return None
+
+    job = PreviewJob.objects.select_related('product').get(id=job_id)
+    start = time.monotonic()
+    status = 'completed'
+    error_message = ''
+
+    try:
+        product = job.product
+        img = None
+        if not product.image:
+            with open_source(product) as (source, content_hash):
+                if product.source_hash != content_hash:
+                    Product.objects.filter(id=product.id).update(source_hash=content_hash)
+                    product.source_hash = content_hash
+
+                if apply_cached_render(product, content_hash):
+                    logger.info("Preview #%d: acierto de caché para producto #%d", job.id, product.id)
+                else:
+                    img = generate_product_preview(product, source)
+                    if img is None:
+                        status = 'failed'
+                        error_message = f"Formato no soportado o archivo vacío: {product.source_file.name}"
+                    else:
+                        generate_image_derivatives(product, img)
+                        store_render_in_cache(product, content_hash)
+
+        if status == 'completed' and not _derivatives_are_current(product):
+            generate_image_derivatives(product, img)
+        if img is not None:
+            img.close()
+        if status == 'completed':
+            # La imagen nueva cambia las páginas del catálogo público de este tipo
+            # y la miniatura del índice de búsqueda de variantes
+            invalidate_catalog_cache(product.product_type)
+            schedule_reindex([product.id])
+    except Exception as e:
+        logger.exception("Preview #%d falló para producto #%d", job.id, job.product_id)
+        status = 'failed'
+        error_message = str(e)
+
+    PreviewJob.objects.filter(id=job.id).update(
+        status=status,
+        error_message=error_message,
+        attempts=job.attempts + 1,
+        finished_at=timezone.now(),
+        duration_ms=int((time.monotonic() - start) * 1000),
+    )
+    return status
+
+
+def _process_in_thread(job_id):
+    try:
+        return process_preview_job(job_id)
+    finally:
+        # Cada hilo abre su propia conexión; la cerramos al terminar
+        close_old_connections()
+
+
+def requeue_stale_jobs(max_age_minutes=30):
+    """Devuelve a 'pending' los trabajos que quedaron en 'processing' (worker caído)."""
+    cutoff = timezone.now() - timedelta(minutes=max_age_minutes)
+    return PreviewJob.objects.filter(status='processing', started_at__lt=cutoff).update(
+        status='pending',
+        started_at=None,
+    )
+
+
+def requeue_failed_jobs(max_attempts=3):
+    """Reintenta los trabajos fallidos que no han agotado sus intentos."""
+    return PreviewJob.objects.filter(status='failed', attempts__lt=max_attempts).update(
+        status='pending',
+        error_message='',
+    )
+
+
+def run_preview_worker(workers=None, batch_size=20, max_jobs=None):
+    """
+    Procesa la cola hasta vaciarla (o hasta max_jobs).
+    Con workers=1 todo corre en el hilo actual; con más usa un ThreadPoolExecutor acotado.
+    Retorna un dict con contadores del lote.
+    """
+    if workers is None:
+        workers = getattr(settings, 'PREVIEW_WORKER_THREADS', 2)
+    workers = max(1, int(workers))
+
+    stats = {'processed': 0, 'completed': 0, 'failed': 0, 'skipped': 0}
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        while max_jobs is None or stats['processed'] < max_jobs:
+            limit = batch_size
+            if max_jobs is not None:
+                limit = min(limit, max_jobs - stats['processed'])
+
+            job_ids = list(
+                PreviewJob.objects.filter(status='pending')
+                .order_by('created_at')
+                .values_list('id', flat=True)[:limit]
+            )
+            if not job_ids:
+                break
+
+            if executor:
+                results = list(executor.map(_process_in_thread, job_ids))
+            else:
+                results = [process_preview_job(job_id) for job_id in job_ids]
+
+            for result in results:
+                if result is None:
+                    stats['skipped'] += 1
+                    continue
+                stats['processed'] += 1
+                stats[result] += 1
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+
+    return stats
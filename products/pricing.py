@@ -0,0 +1,253 @@
+"""
+Resolución de precios de venta.
+Las reglas (PricingRule) se compilan una vez por proceso en un índice
+(product_type, size_id, material_id) -> candidatas, así cada consulta es una
+búsqueda en diccionario. Los precios base históricos (tablas por tamaño) quedan
+como valores por defecto cuando ninguna regla aplica.
+El índice se invalida al guardar/borrar reglas, tamaños o materiales (signals) y,
+para otros procesos, verificando cada PRICING_CACHE_SECONDS si cambiaron las reglas.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .catalog_cache import invalidate_catalog_cache
+from .models import Material, PricingRule, Product, ProductVariant, Size
+from .variant_search import refresh_indexed_prices
+from .variant_summary import refresh_variant_summary
+
+VINILO_BASE_PRICE_BY_SIZE = {
+    "grande": Decimal("1500.00"),
+    "mediano": Decimal("1300.00"),
+    "peque": Decimal("1150.00"),
+}
+VINILO_MAILAN_PRICE_BY_SIZE = {
+    "grande": Decimal("1900.00"),
+    "mediano": Decimal("1600.00"),
+    "peque": Decimal("1300.00"),
+}
+CINTA_PRICE_BY_SIZE = {
+    "grande": Decimal("1500.00"),
+    "mediano": Decimal("1300.00"),
+    "peque": Decimal("1150.00"),
+}
+IMPRESO_PRICE_BY_SIZE = {
+    "peque": Decimal("1300.00"),
+    "mediano": Decimal("1600.00"),
+}
+# Precio base por (tipo de producto, material): tabla por fragmento del nombre del tamaño
+DEFAULT_PRICE_TABLES = {
+    ("vinilo_corte", "Vinilo Tradicional"): VINILO_BASE_PRICE_BY_SIZE,
+    ("vinilo_corte", "Mailan Metalizado"): VINILO_MAILAN_PRICE_BY_SIZE,
+    ("cinta", "Vinilo Tradicional"): CINTA_PRICE_BY_SIZE,
+    ("impreso_globo", "Vinilo Impreso"): IMPRESO_PRICE_BY_SIZE,
+}
+
+REPRICE_CHUNK_SIZE = 200
+
+
+def _price_for_size(size_name, price_map, fallback=Decimal("0")):
+    normalized = (size_name or "").lower()
+    for token, price in price_map.items():
+        if token in normalized:
+            return price
+    return fallback
+
+
+def _pk(value):
+    return getattr(value, "pk", value)
+
+
+class CompiledPricing:
+    """Índice inmutable de reglas y precios por defecto (reglas, tamaños y materiales en una carga)."""
+
+    def __init__(self, rules, sizes, materials, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.rules = {}
+        for rule in rules:
+            specificity = (rule.size_id is not None) + (rule.material_id is not None) + (rule.color_id is not None)
+            candidate = (rule.priority, specificity, rule.id, rule)
+            self.rules.setdefault((rule.product_type, rule.size_id, rule.material_id), []).append(candidate)
+        for candidates in self.rules.values():
+            candidates.sort(key=lambda c: c[:3], reverse=True)
+
+        materials_by_name = {material.name: material.id for material in materials}
+        self.defaults = {}
+        for (product_type, material_name), price_map in DEFAULT_PRICE_TABLES.items():
+            material_id = materials_by_name.get(material_name)
+            if material_id is None:
+                continue
+            for size in sizes:
+                price = _price_for_size(size.name, price_map)
+                if price > 0:
+                    self.defaults[(product_type, size.id, material_id)] = price
+
+    def rule_for(self, product_type, size_id, material_id, color_id=None, at=None):
+        """Regla vigente que aplica (o None)."""
+        best = None
+        for key in (
+            (product_type, size_id, material_id),
+            (product_type, size_id, None),
+            (product_type, None, material_id),
+            (product_type, None, None),
+        ):
+            for candidate in self.rules.get(key, ()):
+                if best is not None and candidate[:3] <= best[:3]:
+                    break
+                rule = candidate[3]
+                if rule.color_id is not None and rule.color_id != color_id:
+                    continue
+                if rule.valid_from or rule.valid_until:
+                    now = at or timezone.now()
+                    if (rule.valid_from and rule.valid_from > now) or (rule.valid_until and rule.valid_until <= now):
+                        continue
+                best = candidate
+                break
+        return best[3] if best else None
+
+    def resolve(self, product_type, size_id, material_id, color_id=None, at=None, include_defaults=True):
+        rule = self.rule_for(product_type, size_id, material_id, color_id, at)
+        if rule is not None:
+            return rule.price
+        if include_defaults:
+            return self.defaults.get((product_type, size_id, material_id))
+        return None
+
+
+_lock = threading.Lock()
+_state = {"compiled": None, "checked_at": 0.0}
+
+
+def _fingerprint():
+    data = PricingRule.objects.aggregate(total=Count("id"), last=Max("updated_at"))
+    return (data["total"], data["last"], Size.objects.count(), Material.objects.count())
+
+
+def _compile():
+    fingerprint = _fingerprint()
+    rules = list(PricingRule.objects.filter(is_active=True))
+    return CompiledPricing(rules, list(Size.objects.all()), list(Material.objects.all()), fingerprint)
+
+
+def get_pricing():
+    """Resolver compilado del proceso (lo re-compila si se invalidó o cambiaron las reglas)."""
+    compiled = _state["compiled"]
+    ttl = getattr(settings, "PRICING_CACHE_SECONDS", 60)
+    if compiled is not None and time.monotonic() - _state["checked_at"] < ttl:
+        return compiled
+
+    with _lock:
+        compiled = _state["compiled"]
+        if compiled is not None and time.monotonic() - _state["checked_at"] < ttl:
+            return compiled
+        if compiled is None or compiled.fingerprint != _fingerprint():
+            compiled = _compile()
+        _state["compiled"] = compiled
+        _state["checked_at"] = time.monotonic()
+        return compiled
+
+
+def invalidate_pricing(**kwargs):
+    """Descarta el índice del proceso (se usa como receiver de signals)."""
+    with _lock:
+        _state["compiled"] = None
+
+
+def resolve_price(product_type, size, material, color=None, at=None, include_defaults=True):
+    """Precio para la combinación (acepta instancias o ids). None si no hay precio."""
+    return get_pricing().resolve(
+        product_type, _pk(size), _pk(material), _pk(color), at=at, include_defaults=include_defaults
+    )
+
+
+def price_for_variant(variant, at=None):
+    """
+    Precio a cobrar hoy por una variante: el de una regla vigente si existe
+    (p. ej. una promoción con ventana de vigencia), o el precio de la variante.
+    """
+    price = get_pricing().resolve(
+        variant.product.product_type, variant.size_id, variant.material_id, variant.color_id,
+        at=at, include_defaults=False,
+    )
+    if price is not None:
+        return price
+    return variant.price or 0
+
+
+def reprice_catalog(product_types=None, include_defaults=False, dry_run=False):
+    """
+    Lleva el precio de las variantes existentes al que indica el resolver.
+    Agrupa las combinaciones (tipo, tamaño, material, color) por precio destino y
+    emite un UPDATE por precio (y por bloque de REPRICE_CHUNK_SIZE combinaciones).
+    Sin include_defaults solo aplica combinaciones cubiertas por una regla.
+    Retorna {"updated": filas, "statements": UPDATEs, "combinations": combinaciones evaluadas}.
+    """
+    pricing = get_pricing()
+    variants = ProductVariant.objects.all()
+    if product_types:
+        variants = variants.filter(product__product_type__in=product_types)
+
+    combinations = variants.values_list(
+        "product__product_type", "size_id", "material_id", "color_id"
+    ).distinct()
+
+    by_price = {}
+    total = 0
+    for product_type, size_id, material_id, color_id in combinations:
+        total += 1
+        price = pricing.resolve(product_type, size_id, material_id, color_id, include_defaults=include_defaults)
+        if price is None:
+            continue
+        by_price.setdefault(price, []).append(
+            Q(product__product_type=product_type, size_id=size_id, material_id=material_id, color_id=color_id)
+        )
+
+    updated = 0
+    statements = 0
+    for price, conditions in by_price.items():
+        for offset in range(0, len(conditions), REPRICE_CHUNK_SIZE):
+            condition = Q()
+            for combo in conditions[offset:offset + REPRICE_CHUNK_SIZE]:
+                condition |= combo
+            targets = variants.filter(condition).exclude(price=price)
+            statements += 1
+            if dry_run:
+                updated += targets.count()
+            else:
+                updated += targets.update(price=price)
+
+    if updated and not dry_run:
+        products = Product.objects.filter(product_type__in=product_types) if product_types else None
+        refresh_variant_summary(products)
+        refresh_indexed_prices(product_types)
+        invalidate_catalog_cache()
+    return {"updated": updated, "statements": statements, "combinations": total}
+
+
+def seed_default_rules():
+    """
+    Crea una PricingRule por cada precio base por defecto que aún no tenga regla
+    exacta (tipo, tamaño, material, sin color). Retorna cuántas reglas creó.
+    """
+    pricing = get_pricing()
+    existing = set(
+        PricingRule.objects.filter(color__isnull=True).values_list("product_type", "size_id", "material_id")
+    )
+    rules = [
+        PricingRule(
+            product_type=product_type,
+            size_id=size_id,
+            material_id=material_id,
+            price=price,
+            description="Precio base",
+        )
+        for (product_type, size_id, material_id), price in pricing.defaults.items()
+        if (product_type, size_id, material_id) not in existing
+    ]
+    PricingRule.objects.bulk_create(rules)
+    invalidate_pricing()
+    return len(rules)
@@ -0,0 +1,182 @@
+"""
+Caché por proceso de los datos de referencia: tamaños, materiales, colores,
+categorías y estados de pedido. Son tablas chicas que casi no cambian pero se
+consultaban en casi cada request (JSON del catálogo, filtros y editor de pedidos
+internos, dashboard de tipos, listado de pedidos, textos de variantes).
+Las cinco tablas se cargan juntas en un ReferenceData inmutable con búsquedas
+id -> objeto/dict, así las vistas serializan variantes desde filas de
+`values_list` sin JOINs.
+Toda escritura sobre esas tablas (signals) incrementa un contador único
+(ReferenceDataVersion); cada proceso lo verifica cada REFERENCE_CACHE_SECONDS
+y recarga si cambió. Un id que no está en la instantánea (fila nueva de otro
+proceso, aún sin verificar la versión) se consulta solo en vez de dar None.
+reference_cache_stats() cuenta aciertos y consultas evitadas.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Category, Color, Material, OrderStatus, ReferenceDataVersion, Size
+
+REFERENCE_MODELS = (Size, Material, Color, Category, OrderStatus)
+# Consultas que cuesta recargar (una por tabla); es lo que ahorra cada acierto
+RELOAD_QUERIES = len(REFERENCE_MODELS)
+
+
+def _by_name(objects):
+    return sorted(objects, key=lambda obj: obj.name.lower())
+
+
+class ReferenceData:
+    """Instantánea inmutable de las cinco tablas de referencia."""
+
+    def __init__(self, version, sizes, materials, colors, categories, statuses):
+        self.version = version
+        self.sizes = {obj.id: obj for obj in sizes}
+        self.materials = {obj.id: obj for obj in materials}
+        self.colors = {obj.id: obj for obj in colors}
+        self.categories = {obj.id: obj for obj in categories}
+        self.statuses = {obj.id: obj for obj in statuses}
+        self._missing = set()
+
+        self.size_dicts = {s.id: {'id': s.id, 'name': s.name, 'dimensions': s.dimensions} for s in sizes}
+        self.material_dicts = {m.id: {'id': m.id, 'name': m.name} for m in materials}
+        self.color_dicts = {c.id: {'id': c.id, 'name': c.name, 'hex_code': c.hex_code} for c in colors}
+        self.category_dicts = {c.id: {'id': c.id, 'name': c.name} for c in categories}
+
+        self.sorted_sizes = _by_name(sizes)
+        self.sorted_materials = _by_name(materials)
+        self.sorted_colors = _by_name(colors)
+        self.sorted_categories = _by_name(categories)
+        self.sorted_statuses = sorted(statuses, key=lambda obj: obj.id)
+        self.default_status = next((s for s in self.sorted_statuses if s.is_default), None)
+
+    def _lookup(self, objects, model, obj_id):
+        _stats['lookups'] += 1
+        obj = objects.get(obj_id)
+        if obj is not None or obj_id is None or (model, obj_id) in self._missing:
+            return obj
+        # Fila creada (en otro proceso) después de la instantánea y antes de que se
+        # note el cambio de versión: se consulta sola y queda en la instantánea,
+        # igual que su ausencia (la próxima versión trae una instantánea nueva)
+        _stats['misses'] += 1
+        obj = model.objects.filter(pk=obj_id).first()
+        if obj is None:
+            self._missing.add((model, obj_id))
+        else:
+            objects[obj_id] = obj
+        return obj
+
+    def size(self, size_id):
+        return self._lookup(self.sizes, Size, size_id)
+
+    def material(self, material_id):
+        return self._lookup(self.materials, Material, material_id)
+
+    def color(self, color_id):
+        return self._lookup(self.colors, Color, color_id)
+
+    def category(self, category_id):
+        return self._lookup(self.categories, Category, category_id)
+
+    def status(self, status_id):
+        return self._lookup(self.statuses, OrderStatus, status_id)
+
+    def variant_text(self, size_id, material_id, color_id, default="Sin especificar"):
+        """'Tamaño - Material - Color' de una variante a partir de sus ids."""
+        parts = [
+            obj.name
+            for obj in (self.size(size_id), self.material(material_id), self.color(color_id))
+            if obj is not None
+        ]
+        return " - ".join(parts) if parts else default
+
+
+_lock = threading.Lock()
+_state = {'data': None, 'checked_at': 0.0}
+_stats = {'hits': 0, 'loads': 0, 'version_checks': 0, 'lookups': 0, 'misses': 0}
+
+
+def _current_version():
+    _stats['version_checks'] += 1
+    return ReferenceDataVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def _load(version):
+    _stats['loads'] += 1
+    return ReferenceData(
+        version,
+        list(Size.objects.all()),
+        list(Material.objects.all()),
+        list(Color.objects.all()),
+        list(Category.objects.all()),
+        list(OrderStatus.objects.all()),
+    )
+
+
+def get_reference_data():
+    """Instantánea del proceso (la recarga si se invalidó o cambió la versión global)."""
+    data = _state['data']
+    ttl = getattr(settings, 'REFERENCE_CACHE_SECONDS', 5)
+    if data is not None and time.monotonic() - _state['checked_at'] < ttl:
+        _stats['hits'] += 1
+        return data
+
+    with _lock:
+        data = _state['data']
+        if data is not None and time.monotonic() - _state['checked_at'] < ttl:
+            _stats['hits'] += 1
+            return data
+        version = _current_version()
+        if data is None or data.version != version:
+            data = _load(version)
+        else:
+            _stats['hits'] += 1
+        _state['data'] = data
+        _state['checked_at'] = time.monotonic()
+        return data
+
+
+def bump_reference_version(**kwargs):
+    """
+    Incrementa la versión global y descarta la instantánea del proceso
+    (receiver de post_save/post_delete de las tablas de referencia).
+    """
+    if kwargs.get('raw'):
+        return
+    updated = ReferenceDataVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        try:
+            # Savepoint: si otro proceso creó la fila primero, la transacción del
+            # llamador sigue usable para el UPDATE
+            with transaction.atomic():
+                ReferenceDataVersion.objects.create(pk=1, version=1)
+        except IntegrityError:
+            ReferenceDataVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    with _lock:
+        _state['data'] = None
+
+
+def reference_cache_stats():
+    """
+    Contadores del proceso: aciertos, recargas, verificaciones de versión,
+    búsquedas por id (cada una reemplaza un JOIN o una consulta por FK) y las que
+    no estaban en la instantánea y consultaron su fila.
+    queries_avoided estima las lecturas de tablas ahorradas: cada acierto evita
+    leer las cinco tablas, descontando las verificaciones de versión y las filas
+    consultadas por separado.
+    """
+    stats = dict(_stats)
+    stats['queries_avoided'] = max(
+        0, stats['hits'] * RELOAD_QUERIES - stats['version_checks'] - stats['misses']
+    )
+    return stats
+
+
+def reset_reference_cache_stats():
+    for key in _stats:
+        _stats[key] = 0
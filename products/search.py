@@ -0,0 +1,372 @@
+"""
+Motor de búsqueda de texto para productos y clientes, insensible a mayúsculas y
+tildes: "corazon" encuentra "Corazón" y "jose" encuentra "José".
+
+Cada objeto buscable tiene un SearchDocument con su texto normalizado (título y
+cuerpo). La consulta la resuelve uno de tres backends, según SEARCH_BACKEND:
+
+- 'sqlite_fts5': tabla virtual FTS5 (products_search_fts), ranking bm25.
+- 'mysql_fulltext': índice FULLTEXT sobre SearchDocument (title, body), modo booleano.
+  Ojo: MySQL ignora términos más cortos que innodb_ft_min_token_size (3 por defecto).
+- 'tokens': tabla SearchToken con los prefijos de cada palabra; funciona en cualquier
+  motor y es la referencia de los tests.
+- 'auto' (por defecto): FTS5 en SQLite si la tabla existe, FULLTEXT en MySQL, tokens
+  en otro caso.
+
+Todos los términos de la consulta deben coincidir como prefijo de alguna palabra
+("cora feliz" encuentra "Corazón Feliz"). Los resultados se ordenan por relevancia:
+coincidir en el título pesa más que en la descripción.
+
+Mantenimiento:
+- Los signals de Product y User reindexan el objeto guardado o lo quitan al borrarlo.
+- Las escrituras masivas (bulk_create, update) llaman a index_ids explícitamente.
+- Solo se mantiene el backend activo: al cambiar SEARCH_BACKEND hay que reconstruir.
+- La migración 0032 indexa los datos existentes; `manage.py reconstruir_indice_busqueda`
+  reconstruye todo (al cambiar SEARCH_BACKEND). La búsqueda nunca construye el índice.
+
+search_ids da los N más relevantes (endpoints con ranking); matching_ids da todas las
+coincidencias, para filtrar listados paginados.
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+
+from .models import Product, SearchDocument, SearchToken
+
+logger = logging.getLogger(__name__)
+
+PRODUCT = 'product'
+CLIENT = 'client'
+
+MAX_TERMS = 20
+MAX_TOKEN_LENGTH = 20
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+WORD_BONUS = 1  # el término es la palabra completa, no solo un prefijo
+DEFAULT_LIMIT = 1000
+INDEX_CHUNK_SIZE = 500
+
+FTS_TABLE = 'products_search_fts'
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """Minúsculas, sin tildes ni signos: "Corazón-Rosa" -> "corazon rosa"."""
+    folded = unicodedata.normalize('NFKD', str(text or ''))
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', folded.lower()).strip()
+
+
+def terms(query):
+    """Palabras distintas de la consulta, normalizadas y recortadas a MAX_TOKEN_LENGTH."""
+    result = []
+    for word in normalize(query).split():
+        word = word[:MAX_TOKEN_LENGTH]
+        if word not in result:
+            result.append(word)
+    return result[:MAX_TERMS]
+
+
+# --- Fuentes de documentos ---
+
+def _product_document(product):
+    return normalize(product.name), normalize(product.description)
+
+
+def _client_document(user):
+    parts = [user.first_name, user.last_name, user.username, user.cedula, user.phone_number]
+    # "300 123 4567" también como "3001234567", como suele escribirse al buscar
+    parts += [re.sub(r'\D', '', number or '') for number in (user.cedula, user.phone_number)]
+    return normalize(' '.join(part for part in parts if part)), ''
+
+
+def _sources():
+    """kind -> (queryset base, función que arma (título, cuerpo), campos que la afectan)."""
+    return {
+        PRODUCT: (Product.objects.only('id', 'name', 'description'), _product_document, {'name', 'description'}),
+        CLIENT: (
+            get_user_model().objects.only('id', 'first_name', 'last_name', 'username', 'cedula', 'phone_number'),
+            _client_document,
+            {'first_name', 'last_name', 'username', 'cedula', 'phone_number'},
+        ),
+    }
+
+
+def indexed_fields(kind):
+    return _sources()[kind][2]
+
+
+# --- Backends ---
+# index() agrega documentos ya quitados con remove(); search() recibe términos normalizados
+# y limit=None para todas las coincidencias.
+
+def _limit_sql(limit):
+    return ' LIMIT %s' if limit is not None else ''
+
+
+def _limit_params(limit):
+    return [limit] if limit is not None else []
+
+class TokenBackend:
+    """Prefijos por palabra en SearchToken; todos los términos deben aparecer."""
+    name = 'tokens'
+
+    @staticmethod
+    def document_tokens(title, body):
+        weights = {}
+        for text, weight in ((title, TITLE_WEIGHT), (body, BODY_WEIGHT)):
+            for word in text.split():
+                word = word[:MAX_TOKEN_LENGTH]
+                for length in range(1, len(word) + 1):
+                    prefix = word[:length]
+                    score = weight + (WORD_BONUS if length == len(word) else 0)
+                    if weights.get(prefix, 0) < score:
+                        weights[prefix] = score
+        return weights
+
+    def index(self, kind, documents):
+        SearchToken.objects.bulk_create(
+            (
+                SearchToken(kind=kind, object_id=document.object_id, token=token, weight=weight)
+                for document in documents
+                for token, weight in self.document_tokens(document.title, document.body).items()
+            ),
+            batch_size=2000,
+        )
+
+    def remove(self, kind, object_ids):
+        SearchToken.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+    def clear(self, kind):
+        SearchToken.objects.filter(kind=kind).delete()
+
+    def search(self, kind, query_terms, limit):
+        rows = (
+            SearchToken.objects.filter(kind=kind, token__in=query_terms)
+            .values('object_id')
+            .annotate(matched=Count('token'), score=Sum('weight'))
+            .filter(matched=len(query_terms))
+            .order_by('-score', 'object_id')
+        )
+        return [row['object_id'] for row in rows[:limit]]
+
+
+class SQLiteFTS5Backend:
+    """Tabla virtual FTS5 cuyo rowid es el id del SearchDocument."""
+    name = 'sqlite_fts5'
+
+    def index(self, kind, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                [(document.pk, document.title, document.body) for document in documents],
+            )
+
+    def remove(self, kind, object_ids, rowids=None):
+        if rowids is None:
+            rowids = list(SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).values_list('pk', flat=True))
+        if not rowids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})", rowids
+            )
+
+    def clear(self, kind):
+        rowids = list(SearchDocument.objects.filter(kind=kind).values_list('pk', flat=True))
+        for offset in range(0, len(rowids), INDEX_CHUNK_SIZE):
+            self.remove(kind, (), rowids=rowids[offset:offset + INDEX_CHUNK_SIZE])
+
+    def search(self, kind, query_terms, limit):
+        # Los términos ya vienen normalizados a [0-9a-z], no hace falta escapar comillas
+        match = ' AND '.join(f'"{term}"*' for term in query_terms)
+        documents = SearchDocument._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.object_id FROM {FTS_TABLE} "
+                f"JOIN {documents} d ON d.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.kind = %s "
+                f"ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}.0, {BODY_WEIGHT}.0), d.object_id{_limit_sql(limit)}",
+                [match, kind] + _limit_params(limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFulltextBackend:
+    """MATCH ... AGAINST sobre SearchDocument; el índice FULLTEXT lo mantiene MySQL."""
+    name = 'mysql_fulltext'
+
+    def index(self, kind, documents):
+        pass
+
+    def remove(self, kind, object_ids):
+        pass
+
+    def clear(self, kind):
+        pass
+
+    def search(self, kind, query_terms, limit):
+        against = ' '.join(f'+{term}*' for term in query_terms)
+        documents = SearchDocument._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT object_id FROM {documents} "
+                f"WHERE kind = %s AND MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) "
+                f"ORDER BY MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) DESC, object_id{_limit_sql(limit)}",
+                [kind, against, against] + _limit_params(limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    backend.name: backend for backend in (TokenBackend, SQLiteFTS5Backend, MySQLFulltextBackend)
+}
+
+_fts5_available = {}
+
+
+def _has_fts5_table():
+    alias = connection.alias
+    if alias not in _fts5_available:
+        _fts5_available[alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts5_available[alias]
+
+
+def get_backend():
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        if connection.vendor == 'sqlite' and _has_fts5_table():
+            name = SQLiteFTS5Backend.name
+        elif connection.vendor == 'mysql':
+            name = MySQLFulltextBackend.name
+        else:
+            name = TokenBackend.name
+    return BACKENDS[name]()
+
+
+# --- Indexación ---
+
+def index_objects(kind, objects):
+    """Guarda el documento normalizado de cada objeto y lo indexa en los backends."""
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects:
+        return 0
+    build = _sources()[kind][1]
+    object_ids = [obj.pk for obj in objects]
+    backend = get_backend()
+    with transaction.atomic():
+        backend.remove(kind, object_ids)
+        SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        SearchDocument.objects.bulk_create(
+            SearchDocument(kind=kind, object_id=obj.pk, title=title[:500], body=body)
+            for obj, (title, body) in ((obj, build(obj)) for obj in objects)
+        )
+        # bulk_create no devuelve ids en todos los motores: se releen para FTS5
+        documents = list(SearchDocument.objects.filter(kind=kind, object_id__in=object_ids))
+        backend.index(kind, documents)
+    return len(documents)
+
+
+def remove_objects(kind, object_ids):
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        get_backend().remove(kind, object_ids)
+        SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def index_ids(kind, object_ids):
+    """Reindexa por id (tras un bulk_create o update); los ids que ya no existen se quitan."""
+    object_ids = sorted({int(object_id) for object_id in object_ids})
+    queryset = _sources()[kind][0]
+    total = 0
+    for offset in range(0, len(object_ids), INDEX_CHUNK_SIZE):
+        chunk = object_ids[offset:offset + INDEX_CHUNK_SIZE]
+        objects = list(queryset.filter(pk__in=chunk))
+        total += index_objects(kind, objects)
+        remove_objects(kind, set(chunk) - {obj.pk for obj in objects})
+    return total
+
+
+def rebuild_search_index(kinds=None, chunk_size=INDEX_CHUNK_SIZE):
+    """Reconstruye el índice de los tipos dados (todos por defecto). Retorna {kind: documentos}."""
+    result = {}
+    for kind in kinds or _sources():
+        queryset = _sources()[kind][0]
+        with transaction.atomic():
+            get_backend().clear(kind)
+            SearchDocument.objects.filter(kind=kind).delete()
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+            total = 0
+            for offset in range(0, len(ids), chunk_size):
+                total += index_objects(kind, queryset.filter(pk__in=ids[offset:offset + chunk_size]))
+        result[kind] = total
+    return result
+
+
+# --- Consultas ---
+
+_verified_kinds = set()
+
+
+def _warn_if_unindexed(kind):
+    """
+    Primera búsqueda del proceso: avisa si el índice está vacío pese a haber datos
+    (p. ej. tras cambiar SEARCH_BACKEND). No lo construye aquí: bloquearía el request.
+    """
+    if kind in _verified_kinds:
+        return
+    _verified_kinds.add(kind)
+    if not SearchDocument.objects.filter(kind=kind).exists() and _sources()[kind][0].exists():
+        logger.warning("Índice de búsqueda '%s' vacío: ejecutar `manage.py reconstruir_indice_busqueda`", kind)
+
+
+def search_ids(kind, query, limit=DEFAULT_LIMIT):
+    """
+    Ids de los objetos que coinciden con todos los términos, del más al menos
+    relevante (los `limit` primeros). Para filtrar un listado usar matching_ids.
+    """
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    _warn_if_unindexed(kind)
+    return get_backend().search(kind, query_terms, limit)
+
+
+def matching_ids(kind, query):
+    """Todos los ids que coinciden (sin tope): para filtros pk__in de listados paginados."""
+    return search_ids(kind, query, limit=None)
+
+
+def ranked(queryset, ids):
+    """Filtra el queryset a los ids dados conservando el orden de relevancia."""
+    if not ids:
+        return queryset.none()
+    order = Case(*(When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)), output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=order).order_by('search_rank')
+
+
+# --- Receivers de signals (ver products/signals.py) ---
+
+def _kind_for(sender):
+    return PRODUCT if sender is Product else CLIENT
+
+
+def object_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    kind = _kind_for(sender)
+    if update_fields is not None and not (set(update_fields) & indexed_fields(kind)):
+        return  # p. ej. last_login o variant_count: el texto no cambió
+    index_objects(kind, [instance])
+
+
+def object_deleted(sender, instance, **kwargs):
+    remove_objects(_kind_for(sender), [instance.pk])
@@ -1,35 +1,16 @@
-from decimal import Decimal
+import time
 
+from django.db.models import Max
+
+from .catalog_cache import invalidate_catalog_cache
 from .models import Color, Material, Product, ProductVariant, Size
+from .pricing import get_pricing
+from .variant_search import schedule_reindex
+from .variant_summary import refresh_variant_summary
 
 DEFAULT_STOCK = 100
-VINILO_BASE_PRICE_BY_SIZE = {
-    "grande": Decimal("1500.00"),
-    "mediano": Decimal("1300.00"),
-    "peque": Decimal("1150.00"),
-}
-VINILO_MAILAN_PRICE_BY_SIZE = {
-    "grande": Decimal("1900.00"),
-    "mediano": Decimal("1600.00"),
-    "peque": Decimal("1300.00"),
-}
-CINTA_PRICE_BY_SIZE = {
-    "grande": Decimal("1500.00"),
-    "mediano": Decimal("1300.00"),
-    "peque": Decimal("1150.00"),
-}
-IMPRESO_PRICE_BY_SIZE = {
-    "peque": Decimal("1300.00"),
-    "mediano": Decimal("1600.00"),
-}
-
-
-def _price_for_size(size_name, price_map, fallback=Decimal("0")):
-    normalized = (size_name or "").lower()
-    for token, price in price_map.items():
-        if token in normalized:
-            return price
-    return fallback
+# Filas por INSERT al propagar un color a todo el catálogo
+COLOR_SYNC_CHUNK_SIZE = 1000
 
 
 def _sale_colors(include_full_color=False):
@@ -39,15 +20,36 @@ def _sale_colors(include_full_color=False):
     return colors.exclude(name__iexact="Full Color")
 
 
-def _resolve_price_from_existing_variant(product, size, material, fallback):
-    existing = ProductVariant.objects.filter(
-        product=product,
-        size=size,
-        material=material,
-    ).exclude(price__isnull=True).order_by("-id").first()
-    if existing and existing.price and existing.price > 0:
-        return existing.price
-    return fallback
+def _crear_variantes_faltantes(product, wanted):
+    """
+    Sincronizador por conjuntos: carga en una consulta las combinaciones
+    (size, material, color) que ya tiene el producto, calcula en memoria las
+    faltantes y las inserta con un solo bulk_create.
+    `wanted` es {(size_id, material_id, color_id): (price, stock)} en orden de creación.
+    ignore_conflicts + la restricción única hacen seguro el alta concurrente.
+    Retorna cuantas variantes faltaban (las que se crearon).
+    """
+    existing = set(
+        ProductVariant.objects.filter(product=product).values_list("size_id", "material_id", "color_id")
+    )
+    missing = [
+        ProductVariant(
+            product=product,
+            size_id=size_id,
+            material_id=material_id,
+            color_id=color_id,
+            price=price,
+            stock=stock,
+        )
+        for (size_id, material_id, color_id), (price, stock) in wanted.items()
+        if (size_id, material_id, color_id) not in existing
+    ]
+    if missing:
+        ProductVariant.objects.bulk_create(missing, ignore_conflicts=True)
+        refresh_variant_summary([product.id])
+        schedule_reindex([product.id])
+        invalidate_catalog_cache(product.product_type)
+    return len(missing)
 
 
 def generar_variantes_vinilo(product):
@@ -56,41 +58,26 @@ def generar_variantes_vinilo(product):
     - Todos los colores en Vinilo Tradicional
     - Dorado en Mailan Metalizado
     """
-    sizes = Size.objects.all()
-    colors = _sale_colors()
+    sizes = list(Size.objects.all())
+    colors = list(_sale_colors())
     mat_vinilo, _ = Material.objects.get_or_create(name="Vinilo Tradicional", defaults={"is_special": False})
     mat_mailan, _ = Material.objects.get_or_create(name="Mailan Metalizado", defaults={"is_special": True})
 
-    variants_created = 0
+    pricing = get_pricing()
+    wanted = {}
     for size in sizes:
-        base_price = _price_for_size(size.name, VINILO_BASE_PRICE_BY_SIZE)
-        mailan_price = _price_for_size(size.name, VINILO_MAILAN_PRICE_BY_SIZE)
-        if base_price <= 0:
-            continue
-
         for color in colors:
-            _, created = ProductVariant.objects.get_or_create(
-                product=product,
-                size=size,
-                material=mat_vinilo,
-                color=color,
-                defaults={"price": base_price, "stock": DEFAULT_STOCK},
-            )
-            if created:
-                variants_created += 1
+            base_price = pricing.resolve("vinilo_corte", size.id, mat_vinilo.id, color.id)
+            if not base_price or base_price <= 0:
+                continue
+            wanted[(size.id, mat_vinilo.id, color.id)] = (base_price, DEFAULT_STOCK)
 
-            if color.name.strip().lower() == "dorado" and mailan_price > 0:
-                _, created_mailan = ProductVariant.objects.get_or_create(
-                    product=product,
-                    size=size,
-                    material=mat_mailan,
-                    color=color,
-                    defaults={"price": mailan_price, "stock": 50},
-                )
-                if created_mailan:
-                    variants_created += 1
+            if color.name.strip().lower() == "dorado":
+                mailan_price = pricing.resolve("vinilo_corte", size.id, mat_mailan.id, color.id)
+                if mailan_price and mailan_price > 0:
+                    wanted[(size.id, mat_mailan.id, color.id)] = (mailan_price, 50)
 
-    return variants_created
+    return _crear_variantes_faltantes(product, wanted)
 
 
 def generar_variantes_cinta(product):
@@ -100,26 +87,19 @@ def generar_variantes_cinta(product):
     - Todos los colores de venta (excepto Full Color)
     - Material base Vinilo Tradicional
     """
-    sizes = Size.objects.all()
-    colors = _sale_colors()
+    sizes = list(Size.objects.all())
+    colors = list(_sale_colors())
     mat_vinilo, _ = Material.objects.get_or_create(name="Vinilo Tradicional", defaults={"is_special": False})
 
-    created_count = 0
+    pricing = get_pricing()
+    wanted = {}
     for size in sizes:
-        base_price = _price_for_size(size.name, CINTA_PRICE_BY_SIZE)
-        if base_price <= 0:
-            continue
         for color in colors:
-            _, created = ProductVariant.objects.get_or_create(
-                product=product,
-                size=size,
-                material=mat_vinilo,
-                color=color,
-                defaults={"price": base_price, "stock": DEFAULT_STOCK},
-            )
-            if created:
-                created_count += 1
-    return created_count
+            base_price = pricing.resolve("cinta", size.id, mat_vinilo.id, color.id)
+            if not base_price or base_price <= 0:
+                continue
+            wanted[(size.id, mat_vinilo.id, color.id)] = (base_price, DEFAULT_STOCK)
+    return _crear_variantes_faltantes(product, wanted)
 
 
 def generar_variantes_impresos(product):
@@ -133,23 +113,15 @@ def generar_variantes_impresos(product):
     col_full, _ = Color.objects.get_or_create(name="Full Color", defaults={"hex_code": "#FFFFFF"})
     sizes = Size.objects.all()
 
-    created_count = 0
+    pricing = get_pricing()
+    wanted = {}
     for size in sizes:
-        price = _price_for_size(size.name, IMPRESO_PRICE_BY_SIZE)
-        if price <= 0:
+        price = pricing.resolve("impreso_globo", size.id, mat_impreso.id, col_full.id)
+        if not price or price <= 0:
             continue
+        wanted[(size.id, mat_impreso.id, col_full.id)] = (price, DEFAULT_STOCK)
 
-        _, created = ProductVariant.objects.get_or_create(
-            product=product,
-            size=size,
-            material=mat_impreso,
-            color=col_full,
-            defaults={"price": price, "stock": DEFAULT_STOCK},
-        )
-        if created:
-            created_count += 1
-
-    return created_count
+    return _crear_variantes_faltantes(product, wanted)
 
 
 def sincronizar_variantes_producto(product):
@@ -166,44 +138,96 @@ def sincronizar_variantes_producto(product):
     return 0
 
 
-def sincronizar_color_en_productos(color, only_active=True):
+def _precios_de_referencia(products, material):
     """
-    Agrega un color nuevo a productos antiguos de tipos que trabajan por color.
-    Regla:
-    - vinilo_corte: agrega color sobre Vinilo Tradicional
-    - cinta: agrega color sobre Vinilo Tradicional
+    Precio de la variante más reciente por (producto, tamaño) en `material`,
+    resuelto para todo el catálogo en una sola consulta agregada.
+    Retorna {(product_id, size_id): price}.
+    """
+    latest_ids = (
+        ProductVariant.objects.filter(product__in=products, material=material, price__isnull=False)
+        .values("product_id", "size_id")
+        .annotate(latest_id=Max("id"))
+        .values("latest_id")
+    )
+    return {
+        (product_id, size_id): price
+        for product_id, size_id, price in ProductVariant.objects.filter(id__in=latest_ids).values_list(
+            "product_id", "size_id", "price"
+        )
+    }
+
+
+def propagar_color(color, only_active=True, chunk_size=COLOR_SYNC_CHUNK_SIZE):
+    """
+    Agrega un color a todos los productos que trabajan por color, por conjuntos:
+    - vinilo_corte / cinta: el color sobre Vinilo Tradicional, en cada tamaño con precio
+    - precio: el de la variante más reciente del producto en ese tamaño (si es > 0)
+      o el del resolver de precios (products/pricing.py)
+    Consultas fijas (productos, precios de referencia, variantes existentes) y
+    bulk_create por bloques de `chunk_size`.
+    Retorna {"created": filas creadas, "products": productos evaluados, "elapsed_ms": duración}.
     """
+    start = time.monotonic()
     if not color:
-        return 0
+        return {"created": 0, "products": 0, "elapsed_ms": 0}
 
     products = Product.objects.filter(product_type__in=["vinilo_corte", "cinta"])
     if only_active:
         products = products.filter(is_active=True)
 
     mat_vinilo, _ = Material.objects.get_or_create(name="Vinilo Tradicional", defaults={"is_special": False})
-    sizes = Size.objects.all()
-    created_count = 0
+    sizes = list(Size.objects.all())
+    product_types = dict(products.values_list("id", "product_type"))
+
+    reference_prices = _precios_de_referencia(products, mat_vinilo)
+    existing = set(
+        ProductVariant.objects.filter(product__in=products, material=mat_vinilo, color=color).values_list(
+            "product_id", "size_id"
+        )
+    )
 
-    for product in products:
-        price_map = VINILO_BASE_PRICE_BY_SIZE if product.product_type == "vinilo_corte" else CINTA_PRICE_BY_SIZE
+    pricing = get_pricing()
+    missing = []
+    for product_id, product_type in product_types.items():
         for size in sizes:
-            fallback = _price_for_size(size.name, price_map, Decimal("0"))
-            if fallback <= 0:
+            fallback = pricing.resolve(product_type, size.id, mat_vinilo.id, color.id)
+            if not fallback or fallback <= 0 or (product_id, size.id) in existing:
                 continue
-            resolved_price = _resolve_price_from_existing_variant(
-                product=product,
-                size=size,
-                material=mat_vinilo,
-                fallback=fallback,
-            )
-            _, created = ProductVariant.objects.get_or_create(
-                product=product,
-                size=size,
-                material=mat_vinilo,
-                color=color,
-                defaults={"price": resolved_price, "stock": DEFAULT_STOCK},
+            price = reference_prices.get((product_id, size.id))
+            missing.append(
+                ProductVariant(
+                    product_id=product_id,
+                    size=size,
+                    material=mat_vinilo,
+                    color=color,
+                    price=price if price and price > 0 else fallback,
+                    stock=DEFAULT_STOCK,
+                )
             )
-            if created:
-                created_count += 1
 
-    return created_count
+    for offset in range(0, len(missing), chunk_size):
+        chunk = missing[offset:offset + chunk_size]
+        ProductVariant.objects.bulk_create(chunk, ignore_conflicts=True)
+        touched = {variant.product_id for variant in chunk}
+        refresh_variant_summary(touched)
+        schedule_reindex(touched)
+    if missing:
+        invalidate_catalog_cache()
+
+    return {
+        "created": len(missing),
+        "products": len(product_types),
+        "elapsed_ms": int((time.monotonic() - start) * 1000),
+    }
+
+
+def sincronizar_color_en_productos(color, only_active=True):
+    """
+    Agrega un color nuevo a productos antiguos de tipos que trabajan por color.
+    Regla:
+    - vinilo_corte: agrega color sobre Vinilo Tradicional
+    - cinta: agrega color sobre Vinilo Tradicional
+    Retorna cuantas variantes se crearon (ver propagar_color).
+    """
+    return propagar_color(color, only_active=only_active)["created"]
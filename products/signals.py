@@ -1,11 +1,24 @@
 """
 Signals de productos para mantener variantes sincronizadas.
 """
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from products.models import Color, Product
-from products.services import sincronizar_color_en_productos, sincronizar_variantes_producto
+from products.catalog_cache import catalog_cache_receiver
+from products.models import Category, Color, Material, PricingRule, Product, ProductVariant, Size
+from products.pricing import invalidate_pricing
+from products.reference_data import REFERENCE_MODELS, bump_reference_version
+from products.search import object_deleted, object_saved
+from products.services import sincronizar_variantes_producto
+from products.variant_search import (
+    attribute_renamed,
+    product_categories_changed,
+    product_deleted,
+    product_saved,
+    variant_changed,
+)
+from products.variant_summary import variant_summary_receiver
 
 
 SUPPORTED_PRODUCT_TYPES = {"vinilo_corte", "cinta", "impreso_globo"}
@@ -29,11 +42,49 @@ def sync_variants_for_product(sender, instance, created, raw=False, **kwargs):
 @receiver(post_save, sender=Color)
 def sync_color_for_existing_products(sender, instance, created, raw=False, **kwargs):
     """
-    Cuando se crea un color nuevo de venta, lo propaga a productos activos.
+    Cuando se crea un color nuevo de venta, lo propaga a productos activos
+    (en segundo plano si COLOR_SYNC_IN_BACKGROUND=True, ver products/color_sync.py).
     """
     if raw or not created:
         return
     if (instance.name or "").strip().lower() == "full color":
         return
 
-    sincronizar_color_en_productos(instance, only_active=True)
+    from products.color_sync import sync_color
+    sync_color(instance, only_active=True)
+
+
+# El resolver de precios compila reglas, tamaños y materiales: se descarta al cambiarlos
+for _model in (PricingRule, Size, Material):
+    post_save.connect(invalidate_pricing, sender=_model, dispatch_uid=f"invalidate_pricing_save_{_model.__name__}")
+    post_delete.connect(invalidate_pricing, sender=_model, dispatch_uid=f"invalidate_pricing_delete_{_model.__name__}")
+
+# Datos de referencia en caché por proceso (products/reference_data.py)
+for _model in REFERENCE_MODELS:
+    post_save.connect(bump_reference_version, sender=_model, dispatch_uid=f"reference_data_save_{_model.__name__}")
+    post_delete.connect(bump_reference_version, sender=_model, dispatch_uid=f"reference_data_delete_{_model.__name__}")
+
+# Resumen de variantes en Product (products/variant_summary.py)
+post_save.connect(variant_summary_receiver, sender=ProductVariant, dispatch_uid="variant_summary_save")
+post_delete.connect(variant_summary_receiver, sender=ProductVariant, dispatch_uid="variant_summary_delete")
+
+# Índice de búsqueda del editor de pedidos internos (products/variant_search.py).
+# Se conecta después del resumen de variantes: el índice usa variant_count.
+post_save.connect(product_saved, sender=Product, dispatch_uid="variant_search_product_save")
+post_delete.connect(product_deleted, sender=Product, dispatch_uid="variant_search_product_delete")
+post_save.connect(variant_changed, sender=ProductVariant, dispatch_uid="variant_search_variant_save")
+post_delete.connect(variant_changed, sender=ProductVariant, dispatch_uid="variant_search_variant_delete")
+m2m_changed.connect(product_categories_changed, sender=Product.categories.through, dispatch_uid="variant_search_categories")
+for _model in (Size, Material, Color):
+    post_save.connect(attribute_renamed, sender=_model, dispatch_uid=f"variant_search_rename_{_model.__name__}")
+
+# Páginas del catálogo público en caché (products/catalog_cache.py)
+for _model in (Product, ProductVariant, Category, Color, Size, Material):
+    post_save.connect(catalog_cache_receiver, sender=_model, dispatch_uid=f"catalog_cache_save_{_model.__name__}")
+    post_delete.connect(catalog_cache_receiver, sender=_model, dispatch_uid=f"catalog_cache_delete_{_model.__name__}")
+m2m_changed.connect(catalog_cache_receiver, sender=Product.categories.through, dispatch_uid="catalog_cache_categories")
+
+# Búsqueda de texto de productos y clientes (products/search.py)
+for _model in (Product, get_user_model()):
+    post_save.connect(object_saved, sender=_model, dispatch_uid=f"search_save_{_model.__name__}")
+    post_delete.connect(object_deleted, sender=_model, dispatch_uid=f"search_delete_{_model.__name__}")
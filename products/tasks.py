@@ -14,7 +14,22 @@ from .services import sincronizar_variantes_producto
 logger = logging.getLogger(__name__)
 
 
-def process_single_upload_item(item, product_type):
+def build_upload_product(filename, product_type, source_hash=''):
+    """
+    Producto (sin guardar) para un archivo de carga masiva: nombre limpio desde el
+    nombre de archivo, tipo elegido por el usuario y offline para revisión.
+    Lo comparten la carga web y `manage.py import_catalog` (que lo guarda con bulk_create).
+    """
+    return Product(
+        name=extract_product_name_from_file(filename),
+        product_type=product_type,  # Usar el tipo seleccionado por el usuario
+        description="",
+        source_hash=source_hash,
+        is_online=False  # Offline por defecto para revisión
+    )
+
+
+def process_single_upload_item(item, product_type, source_hash=''):
     """
     Procesa un archivo individual del lote.
     COPIADO DE LA LÓGICA DE CARGA INDIVIDUAL QUE SÍ FUNCIONA.
@@ -22,6 +37,7 @@ def process_single_upload_item(item, product_type):
     Args:
         item: BulkUploadItem a procesar
         product_type: Tipo de producto seleccionado por el usuario
+        source_hash: SHA-256 del archivo (ya calculado al detectar duplicados)
     """
     # 1. Extraer nombre del producto desde nombre de archivo
     product_name = extract_product_name_from_file(item.original_filename)
@@ -35,17 +51,15 @@ def process_single_upload_item(item, product_type):
     item.save()
 
     # 3. Crear producto EXACTAMENTE como en la carga individual
-    # Django maneja automáticamente source_file y genera la imagen en Product.save()
+    # Django maneja automáticamente source_file y Product.save() encola la
+    # previsualización en la misma cola que procesa `manage.py procesar_previews`
     # Aseguramos que el puntero esté al inicio antes de pasar el archivo
     item.source_file.seek(0)
     
-    product = Product.objects.create(
-        name=product_name,
-        product_type=product_type,  # Usar el tipo seleccionado por el usuario
-        description=ai_description,
-        source_file=item.source_file,  # Django lo copia automáticamente
-        is_online=False  # Offline por defecto para revisión
-    )
+    product = build_upload_product(item.original_filename, product_type, source_hash=source_hash)
+    product.description = ai_description
+    product.source_file = item.source_file  # Django lo copia automáticamente
+    product.save()
     
     # Ahora sí podemos cerrar el archivo fuente del item masivo
     try:
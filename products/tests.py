@@ -1,14 +1,65 @@
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
 from decimal import Decimal
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from PyPDF2 import PdfReader
 
 from contabilidad.models import Account, Transaction, TransactionCategory
 from contabilidad.models_job_costing import FinancialStatus
-from products.models import Color, Product, ProductVariant, Size
+from products import catalog_builds, catalog_render, search
+from products.bulk_ingest import process_batch, process_pending_batches, requeue_stale_batches
+from products.catalog_builds import process_pending_builds
+from products.catalog_cache import encode_cursor
+from products.catalog_images import ImageCache
+from products.catalog_render import render_catalog, render_catalog_pdf
+from products.color_sync import process_pending_color_syncs
+from products.models import (
+    BulkUploadBatch,
+    BulkUploadItem,
+    CatalogBuild,
+    CatalogPageSnapshot,
+    Category,
+    Color,
+    ColorSyncJob,
+    Material,
+    PreviewJob,
+    PricingRule,
+    Product,
+    ProductVariant,
+    ReferenceDataVersion,
+    RenderCacheEntry,
+    SearchDocument,
+    SearchToken,
+    Size,
+    VariantSearchIndex,
+)
 from products.models_costs import CostType, OrderCostBreakdown
-from products.models_internal_orders import InternalOrder
+from products.internal_orders import add_variants_to_order, complete_production, production_queue
+from products.models_internal_orders import InternalOrder, InternalOrderItem
+from products.pricing import get_pricing, price_for_variant, reprice_catalog, resolve_price
+from products.reference_data import get_reference_data, reference_cache_stats, reset_reference_cache_stats
+from products.search import (
+    CLIENT, PRODUCT, TokenBackend, matching_ids, normalize, rebuild_search_index, search_ids,
+)
+from products.services import sincronizar_variantes_producto
+from products.previews import open_source, run_preview_worker
 
 
 class ManualOrderCostsApiTests(TestCase):
@@ -165,3 +216,1098 @@ class ProductSignalsTests(TestCase):
         self.assertTrue(
             ProductVariant.objects.filter(product=product, color=new_color).exists()
         )
+
+    def test_variant_sync_is_set_based_and_idempotent(self):
+        for name in ("Grande", "Mediano", "Pequeño"):
+            Size.objects.create(name=name, dimensions="10x10cm")
+        for name in ("Azul", "Rojo", "Dorado"):
+            Color.objects.create(name=name, hex_code="#000000")
+        Material.objects.get_or_create(name="Vinilo Tradicional")
+        Material.objects.get_or_create(name="Mailan Metalizado", defaults={"is_special": True})
+        product = Product.objects.create(name="Vinilo QA", product_type="interno")
+        product.product_type = "vinilo_corte"
+        get_pricing()
+
+        with CaptureQueriesContext(connection) as queries:
+            created = sincronizar_variantes_producto(product)
+
+        # 3 tamaños x 3 colores en Vinilo Tradicional + Dorado en Mailan por tamaño
+        self.assertEqual(created, 12)
+        self.assertEqual(ProductVariant.objects.filter(product=product).count(), 12)
+        self.assertLess(len(queries), 12)
+        self.assertEqual(sincronizar_variantes_producto(product), 0)
+
+    def test_color_propagation_reuses_reference_price_and_records_job(self):
+        grande = Size.objects.create(name="Grande", dimensions="19x25cm")
+        Size.objects.create(name="Mediano", dimensions="19x15cm")
+        Color.objects.create(name="Azul", hex_code="#0000FF")
+        product = Product.objects.create(name="Cinta precio", product_type="cinta", is_active=True)
+        ProductVariant.objects.filter(product=product, size=grande).update(price=Decimal("2000.00"))
+
+        new_color = Color.objects.create(name="Verde", hex_code="#00FF00")
+
+        job = ColorSyncJob.objects.get(color=new_color)
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.variants_created, 2)
+        self.assertIsNotNone(job.duration_ms)
+        prices = dict(
+            ProductVariant.objects.filter(product=product, color=new_color).values_list("size__name", "price")
+        )
+        self.assertEqual(prices, {"Grande": Decimal("2000.00"), "Mediano": Decimal("1300.00")})
+
+    @override_settings(COLOR_SYNC_IN_BACKGROUND=True)
+    def test_color_propagation_can_be_deferred(self):
+        Size.objects.create(name="Mediano", dimensions="19x15cm")
+        product = Product.objects.create(name="Cinta diferida", product_type="cinta", is_active=True)
+
+        new_color = Color.objects.create(name="Lila", hex_code="#AA88FF")
+
+        self.assertFalse(ProductVariant.objects.filter(product=product, color=new_color).exists())
+        [job] = process_pending_color_syncs()
+        self.assertEqual(job.variants_created, 1)
+        self.assertTrue(ProductVariant.objects.filter(product=product, color=new_color).exists())
+
+    def test_variant_writes_keep_product_summary_in_sync(self):
+        grande = Size.objects.create(name="Grande", dimensions="19x25cm")
+        Size.objects.create(name="Mediano", dimensions="19x15cm")
+        Color.objects.create(name="Azul", hex_code="#0000FF")
+        product = Product.objects.create(name="Cinta resumen", product_type="cinta", is_active=True)
+
+        product.refresh_from_db()
+        self.assertEqual(product.variant_count, 2)
+        self.assertEqual((product.min_price, product.max_price), (Decimal("1300.00"), Decimal("1500.00")))
+
+        ProductVariant.objects.get(product=product, size=grande).delete()
+        product.refresh_from_db()
+        self.assertEqual(product.variant_count, 1)
+        self.assertEqual(product.max_price, Decimal("1300.00"))
+
+        # Escritura que no dispara signals: la corrige el comando de reconstrucción
+        Product.objects.filter(pk=product.pk).update(variant_count=0, min_price=None)
+        out = io.StringIO()
+        call_command("reconstruir_resumen_variantes", stdout=out)
+        self.assertIn("Productos corregidos: 1", out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual((product.variant_count, product.min_price), (1, Decimal("1300.00")))
+
+    def test_saving_a_stale_instance_keeps_the_variant_summary(self):
+        Size.objects.create(name="Grande", dimensions="19x25cm")
+        product = Product.objects.create(name="Cinta vieja", product_type="cinta", is_active=True)
+        stale = Product.objects.get(pk=product.pk)
+        Color.objects.create(name="Azul", hex_code="#0000FF")  # genera la variante de product
+        summary = Product.objects.values_list("variant_count", "min_price").get(pk=product.pk)
+        self.assertEqual(summary, (1, Decimal("1500.00")))
+
+        stale.variant_count, stale.min_price = 0, None
+        stale.name = "Cinta renombrada"
+        stale.save()
+        product.refresh_from_db()
+        self.assertEqual(product.name, "Cinta renombrada")
+        self.assertEqual((product.variant_count, product.min_price), summary)
+
+
+class PricingRuleTests(TestCase):
+    def setUp(self):
+        self.grande = Size.objects.create(name="Grande", dimensions="19x25cm")
+        self.mediano = Size.objects.create(name="Mediano", dimensions="19x15cm")
+        self.vinilo, _ = Material.objects.get_or_create(name="Vinilo Tradicional")
+        self.azul = Color.objects.create(name="Azul", hex_code="#0000FF")
+        self.rojo = Color.objects.create(name="Rojo", hex_code="#FF0000")
+
+    def test_resolver_prefers_priority_then_specificity_and_falls_back_to_defaults(self):
+        self.assertEqual(resolve_price("cinta", self.grande, self.vinilo, self.azul), Decimal("1500.00"))
+
+        PricingRule.objects.create(product_type="cinta", price=Decimal("1000.00"))
+        PricingRule.objects.create(product_type="cinta", size=self.grande, price=Decimal("1700.00"))
+        PricingRule.objects.create(product_type="cinta", color=self.rojo, price=Decimal("1800.00"), priority=5)
+
+        self.assertEqual(resolve_price("cinta", self.grande, self.vinilo, self.azul), Decimal("1700.00"))
+        self.assertEqual(resolve_price("cinta", self.mediano, self.vinilo, self.azul), Decimal("1000.00"))
+        self.assertEqual(resolve_price("cinta", self.grande, self.vinilo, self.rojo), Decimal("1800.00"))
+        self.assertIsNone(resolve_price("logo", self.grande, self.vinilo))
+
+    def test_reprice_catalog_updates_variants_with_one_statement_per_price(self):
+        product = Product.objects.create(name="Cinta repricing", product_type="cinta", is_active=True)
+        self.assertEqual(ProductVariant.objects.filter(product=product).count(), 4)
+
+        PricingRule.objects.create(product_type="cinta", size=self.grande, price=Decimal("2100.00"))
+        result = reprice_catalog()
+
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(result["statements"], 1)
+        self.assertEqual(
+            set(ProductVariant.objects.filter(product=product, size=self.grande).values_list("price", flat=True)),
+            {Decimal("2100.00")},
+        )
+        self.assertEqual(
+            set(ProductVariant.objects.filter(product=product, size=self.mediano).values_list("price", flat=True)),
+            {Decimal("1300.00")},
+        )
+
+    def test_internal_order_uses_rule_inside_validity_window(self):
+        product = Product.objects.create(name="Cinta promo", product_type="cinta", is_active=True)
+        variant = ProductVariant.objects.get(product=product, size=self.grande, color=self.azul)
+        now = timezone.now()
+        PricingRule.objects.create(
+            product_type="cinta", size=self.grande, price=Decimal("999.00"), priority=10,
+            valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1),
+        )
+        PricingRule.objects.create(
+            product_type="cinta", size=self.mediano, price=Decimal("1.00"), priority=10,
+            valid_until=now - timedelta(days=1),
+        )
+
+        order = InternalOrder.objects.create(name="Pedido promo")
+        item = InternalOrderItem.objects.create(order=order, variant=variant, quantity=1, unit_price=0)
+        self.assertEqual(item.unit_price, Decimal("999.00"))
+
+        expired = ProductVariant.objects.get(product=product, size=self.mediano, color=self.azul)
+        self.assertEqual(price_for_variant(expired), Decimal("1300.00"))
+
+
+class ReferenceDataCacheTests(TestCase):
+    def test_lookups_are_served_from_memory_until_version_changes(self):
+        size = Size.objects.create(name="Grande", dimensions="19x25cm")
+        reset_reference_cache_stats()
+        get_reference_data()
+
+        with CaptureQueriesContext(connection) as queries:
+            data = get_reference_data()
+            self.assertEqual(data.size(size.id).name, "Grande")
+            self.assertEqual(data.variant_text(size.id, None, None), "Grande")
+        self.assertEqual(len(queries), 0)
+        self.assertGreaterEqual(reference_cache_stats()["hits"], 1)
+
+        # Escritura local: el signal incrementa la versión y descarta la instantánea
+        color = Color.objects.create(name="Azul", hex_code="#0000FF")
+        self.assertEqual(get_reference_data().color(color.id).name, "Azul")
+
+    def test_row_created_elsewhere_is_found_before_the_version_check(self):
+        data = get_reference_data()
+        # Otro proceso creó el color (bulk_create no envía signals en este proceso)
+        (color,) = Color.objects.bulk_create([Color(name="Verde", hex_code="#00FF00")])
+        self.assertEqual(data.color(color.id).name, "Verde")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(data.variant_text(None, None, color.id), "Verde")
+            self.assertIsNone(data.size(999))
+            self.assertIsNone(data.size(999))
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(REFERENCE_CACHE_SECONDS=0)
+    def test_other_process_write_is_detected_by_version(self):
+        size = Size.objects.create(name="Grande", dimensions="19x25cm")
+        version = get_reference_data().version
+
+        # Otro proceso renombró el tamaño (sin signals en este proceso)
+        Size.objects.filter(pk=size.pk).update(name="XL")
+        self.assertEqual(get_reference_data().size(size.id).name, "Grande")
+        ReferenceDataVersion.objects.filter(pk=1).update(version=F("version") + 1)
+
+        data = get_reference_data()
+        self.assertEqual(data.version, version + 1)
+        self.assertEqual(data.size(size.id).name, "XL")
+
+    def test_concurrent_first_bump_keeps_the_transaction_usable(self):
+        ReferenceDataVersion.objects.update_or_create(pk=1, defaults={"version": 5})
+        filter_versions = ReferenceDataVersion.objects.filter
+        calls = []
+
+        def filter_after_other_process(*args, **kwargs):
+            # El primer UPDATE no ve la fila: otro proceso la crea antes del INSERT
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return ReferenceDataVersion.objects.none()
+            return filter_versions(*args, **kwargs)
+
+        with mock.patch.object(ReferenceDataVersion.objects, "filter", side_effect=filter_after_other_process):
+            Size.objects.create(name="Grande", dimensions="19x25cm")
+        self.assertEqual(ReferenceDataVersion.objects.get(pk=1).version, 6)
+
+
+class VariantSearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(self.user)
+        Size.objects.create(name="Grande", dimensions="19x25cm")
+        Size.objects.create(name="Mediano", dimensions="19x15cm")
+        Color.objects.create(name="Azul", hex_code="#0000FF")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old = Product.objects.create(name="Rosa", product_type="cinta", is_active=True)
+            self.rosa = Product.objects.create(name="Rosa", product_type="cinta", is_active=True)
+            self.girasol = Product.objects.create(
+                name="Girasol", product_type="cinta", is_active=True, description="Flor amarilla"
+            )
+
+    def _post(self, name, payload):
+        return self.client.post(reverse(name), data=json.dumps(payload), content_type="application/json").json()
+
+    def test_filter_reads_only_the_index(self):
+        self.assertEqual(VariantSearchIndex.objects.count(), 4)
+        self.assertFalse(VariantSearchIndex.objects.filter(product=self.old).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self._post("api_filter_variants", {"product_type": "cinta", "search": "AMARILLA"})
+        self.assertEqual(data["count"], 2)
+        self.assertEqual({item["product_id"] for item in data["items"]}, {self.girasol.id})
+        self.assertEqual(data["items"][0]["variant_text"], "Grande - Vinilo Tradicional - Azul")
+        self.assertFalse(any("products_productvariant" in q["sql"] for q in queries.captured_queries))
+
+    def test_rename_and_variant_changes_reindex_the_group(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rosa.name = "Rosa Roja"
+            self.rosa.save()
+        # El duplicado antiguo queda como el más reciente de su grupo
+        self.assertEqual(
+            set(VariantSearchIndex.objects.values_list("product_id", flat=True)),
+            {self.old.id, self.rosa.id, self.girasol.id},
+        )
+
+        variant = self.girasol.variants.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.delete()
+        self.assertFalse(VariantSearchIndex.objects.filter(variant_id=variant.id).exists())
+
+    def test_auto_select_uses_index_candidates(self):
+        order = InternalOrder.objects.create(name="Pedido QA", created_by=self.user)
+        data = self._post(
+            "api_auto_select", {"order_id": order.id, "product_type": "cinta", "quantity": 10, "search": "rosa"}
+        )
+        self.assertEqual(data["added_count"], 2)
+        self.assertEqual(
+            set(order.items.values_list("variant__product_id", flat=True)), {self.rosa.id}
+        )
+
+    def test_auto_select_with_repeat_adds_in_bulk(self):
+        order = InternalOrder.objects.create(name="Pedido QA", created_by=self.user)
+        variant = self.rosa.variants.first()
+        add_variants_to_order(order, [variant.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self._post(
+                "api_auto_select",
+                {"order_id": order.id, "product_type": "cinta", "quantity": 50, "allow_repeat": True},
+            )
+        self.assertLess(len(queries), 20)
+        self.assertEqual(data["added_count"], 50)
+        self.assertEqual(data["order_totals"]["total_items"], 51)
+        self.assertEqual(order.items.count(), 4)
+        existing = next(item for item in data["added_items"] if item["id"] == order.items.get(variant=variant).id)
+        self.assertFalse(existing["is_new"])
+        order.refresh_from_db()
+        self.assertEqual(order.total_items, 51)
+
+    def test_item_changes_keep_totals_by_delta(self):
+        order = InternalOrder.objects.create(name="Pedido QA", created_by=self.user)
+        rosa, girasol = self.rosa.variants.first(), self.girasol.variants.first()
+        ProductVariant.objects.filter(pk__in=[rosa.pk, girasol.pk]).update(price=Decimal("1500"))
+        add_variants_to_order(order, {rosa.id: 2, girasol.id: 1})
+        item = order.items.get(variant=rosa)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self._post("api_update_qty", {"item_id": item.id, "quantity": 5})
+        self.assertFalse(any("SUM(" in q["sql"] for q in queries.captured_queries))
+        self.assertEqual(data["order_totals"], {"total_items": 6, "total_estimated": 9000.0})
+
+        data = self._post("api_remove_item", {"item_id": item.id})
+        self.assertEqual(data["order_totals"], {"total_items": 1, "total_estimated": 1500.0})
+
+        InternalOrder.objects.filter(pk=order.pk).update(total_items=99)
+        out = io.StringIO()
+        call_command("verificar_totales_pedidos", "--fix", stdout=out)
+        self.assertIn("Pedidos corregidos: 1", out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual((order.total_items, order.total_estimated), (1, Decimal("1500")))
+
+    def test_add_item_rejects_invalid_quantities(self):
+        order = InternalOrder.objects.create(name="Pedido QA", created_by=self.user)
+        variant = self.rosa.variants.first()
+        for quantity in (0, -3, "dos", None):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(
+                    reverse("api_add_item"),
+                    data=json.dumps({"order_id": order.id, "variant_id": variant.id, "quantity": quantity}),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(order.items.exists())
+
+        data = self._post("api_add_item", {"order_id": order.id, "variant_id": variant.id, "quantity": 2})
+        self.assertEqual((data["is_new"], data["item"]["quantity"]), (True, 2))
+
+    def test_batch_operations_apply_atomically_with_version_check(self):
+        order = InternalOrder.objects.create(name="Pedido QA", created_by=self.user)
+        rosa, rosa_2 = self.rosa.variants.all()[:2]
+        girasol = self.girasol.variants.first()
+        ProductVariant.objects.update(price=Decimal("1000"))
+        add_variants_to_order(order, {rosa.id: 1, rosa_2.id: 1})
+        first, second = order.items.order_by("id")
+        version = order.version
+
+        data = self._post("api_internal_order_batch", {
+            "order_id": order.id,
+            "version": version,
+            "operations": [
+                {"op": "add", "variant_id": girasol.id},
+                {"op": "update", "variant_id": girasol.id, "quantity": 3},
+                {"op": "update", "item_id": first.id, "quantity": 4},
+                {"op": "remove", "item_id": second.id},
+                {"op": "reorder", "item_ids": [first.id]},
+            ],
+        })
+        self.assertEqual(data["version"], version + 1)
+        self.assertEqual([item["quantity"] for item in data["created"]], [3])
+        self.assertEqual([item["id"] for item in data["updated"]], [first.id])
+        self.assertEqual(data["removed"], [second.id])
+        self.assertEqual(data["order_totals"], {"total_items": 7, "total_estimated": 7000.0})
+        self.assertEqual(list(order.items.values_list("variant_id", flat=True)), [rosa.id, girasol.id])
+
+        stale = self.client.post(
+            reverse("api_internal_order_batch"), content_type="application/json",
+            data=json.dumps({"order_id": order.id, "version": version, "operations": [{"op": "remove", "item_id": first.id}]}),
+        )
+        self.assertEqual(stale.status_code, 409)
+        invalid = self.client.post(
+            reverse("api_internal_order_batch"), content_type="application/json",
+            data=json.dumps({"order_id": order.id, "operations": [
+                {"op": "remove", "item_id": first.id}, {"op": "update", "item_id": 0, "quantity": 1},
+            ]}),
+        )
+        self.assertEqual(invalid.status_code, 400)
+        self.assertTrue(order.items.filter(pk=first.pk).exists())
+
+        for operation in ({"op": "add", "variant_id": rosa_2.id, "quantity": 0},
+                          {"op": "update", "item_id": first.id, "quantity": -2}):
+            with self.subTest(operation=operation):
+                response = self.client.post(
+                    reverse("api_internal_order_batch"), content_type="application/json",
+                    data=json.dumps({"order_id": order.id, "operations": [operation]}),
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(order.items.values_list("quantity", flat=True)), [4, 3])
+
+    def test_rebuild_command_restores_index(self):
+        VariantSearchIndex.objects.all().delete()
+        # Un request nunca reconstruye el índice
+        self.assertEqual(self._post("api_filter_variants", {"product_type": "cinta"})["count"], 0)
+        self.assertFalse(VariantSearchIndex.objects.exists())
+
+        out = io.StringIO()
+        call_command("reconstruir_indice_variantes", stdout=out)
+        self.assertIn("Variantes indexadas: 4", out.getvalue())
+
+
+class TextSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(self.user)
+        self.corazon = Product.objects.create(name="Corazón Feliz", product_type="cinta", description="Rojo")
+        self.cora = Product.objects.create(name="Mariposa", product_type="cinta", description="Corazones al fondo")
+        Product.objects.create(name="Girasol", product_type="cinta")
+
+    def test_normalize_folds_accents_and_punctuation(self):
+        self.assertEqual(normalize("  Corazón-ROSA ñandú! "), "corazon rosa nandu")
+
+    def test_search_is_accent_insensitive_and_ranks_title_first(self):
+        for backend in ("auto", "tokens"):
+            with self.subTest(backend=backend), override_settings(SEARCH_BACKEND=backend):
+                rebuild_search_index([PRODUCT])
+                self.assertEqual(search_ids(PRODUCT, "CORAZON"), [self.corazon.id, self.cora.id])
+                self.assertEqual(search_ids(PRODUCT, "cora feliz"), [self.corazon.id])
+                self.assertEqual(search_ids(PRODUCT, "corazón azul"), [])
+                self.assertEqual(search_ids(PRODUCT, "cora", limit=1), [self.corazon.id])
+                self.assertEqual(set(matching_ids(PRODUCT, "cora")), {self.corazon.id, self.cora.id})
+
+    def test_search_never_rebuilds_an_empty_index(self):
+        SearchDocument.objects.all().delete()
+        SearchToken.objects.all().delete()
+        search._verified_kinds.discard(PRODUCT)
+        with override_settings(SEARCH_BACKEND="tokens"), self.assertLogs("products.search", "WARNING"):
+            self.assertEqual(search_ids(PRODUCT, "corazon"), [])
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_signals_keep_documents_in_sync(self):
+        self.assertEqual(TokenBackend.document_tokens("ab", "")["ab"], 4)
+        self.corazon.name = "Estrella"
+        self.corazon.save()
+        self.assertEqual(search_ids(PRODUCT, "corazon"), [self.cora.id])
+        self.cora.delete()
+        self.assertEqual(search_ids(PRODUCT, "corazon"), [])
+
+    def test_endpoints_use_the_search_engine(self):
+        response = self.client.get(reverse("panel_product_list"), {"q": "corazon"})
+        self.assertEqual({p.id for p in response.context["page_obj"]}, {self.corazon.id, self.cora.id})
+
+        data = self.client.post(
+            reverse("api_catalog_filter_products"), data=json.dumps({"search": "corazon"}),
+            content_type="application/json",
+        ).json()
+        self.assertEqual([p["id"] for p in data["products"]], [self.corazon.id, self.cora.id])
+
+        client = get_user_model().objects.create_user(
+            username="cliente1", first_name="José", last_name="Núñez", phone_number="300 123 4567"
+        )
+        url = reverse("api_search_clients")
+        self.assertEqual([c["id"] for c in self.client.get(url, {"q": "jose nunez"}).json()["clients"]], [client.id])
+        self.assertEqual([c["id"] for c in self.client.get(url, {"q": "3001234"}).json()["clients"]], [client.id])
+        self.assertEqual([c["id"] for c in self.client.get(url, {"q": "4567"}).json()["clients"]], [client.id])
+        self.assertEqual(search_ids(CLIENT, "nuñez"), [client.id])
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(self.user)
+        Size.objects.create(name="Grande", dimensions="19x25cm")
+        for name in ("Azul", "Rojo"):
+            Color.objects.create(name=name, hex_code="#000000")
+        product = Product.objects.create(name="Corazón", product_type="cinta", is_active=True)
+        variants = list(product.variants.values_list("id", flat=True))
+        self.orders = []
+        for name in ("Pedido A", "Pedido B"):
+            order = InternalOrder.objects.create(name=name, created_by=self.user)
+            add_variants_to_order(order, {variant_id: 2 for variant_id in variants})
+            self.orders.append(order)
+
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_single_order_csv_keeps_legacy_columns(self):
+        response = self.client.get(reverse("internal_order_export_csv", args=[self.orders[0].id]))
+        lines = self._content(response).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], "Referencia,Cantidad,Tamaño,Color,Material,Detalles Completos")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("Corazón,2,Grande,"))
+
+    def test_multi_order_xlsx_is_a_valid_workbook(self):
+        ids = ",".join(str(order.id) for order in self.orders)
+        today = timezone.localdate().isoformat()
+        response = self.client.get(
+            reverse("export_dataset", args=["pedidos-internos"]),
+            {"formato": "xlsx", "pedidos": ids, "desde": today, "hasta": today},
+        )
+        archive = zipfile.ZipFile(io.BytesIO(self._content(response)))
+        self.assertIn("xl/workbook.xml", archive.namelist())
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertEqual(sheet.count("<row "), 5)
+        self.assertIn("Corazón", sheet)
+
+        response = self.client.get(reverse("export_dataset", args=["transacciones"]), {"desde": "2999-01-01"})
+        self.assertEqual(len(self._content(response).decode("utf-8-sig").splitlines()), 1)
+
+
+class ProductionQueueTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="staff", password="x", is_staff=True)
+        Size.objects.create(name="Grande", dimensions="19x25cm")
+        Color.objects.create(name="Azul", hex_code="#000000")
+        product = Product.objects.create(name="Corazón", product_type="cinta", is_active=True)
+        self.variant = product.variants.get()
+        self.orders = []
+        for name, status, qty in (("Viejo", "in_production", 3), ("Nuevo", "confirmed", 5), ("Borrador", "draft", 7)):
+            order = InternalOrder.objects.create(name=name, created_by=self.user, status=status)
+            add_variants_to_order(order, {self.variant.id: qty})
+            self.orders.append(order)
+
+    def test_queue_aggregates_pending_across_orders_in_one_query(self):
+        InternalOrderItem.objects.filter(order=self.orders[1]).update(completed_quantity=1)
+        with CaptureQueriesContext(connection) as queries:
+            queue = production_queue()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue[0]["variant_id"], self.variant.id)
+        self.assertEqual(queue[0]["pending"], 3 + 4)
+        self.assertEqual(queue[0]["orders"], 2)
+        self.assertEqual(production_queue(product_type="vinilo_corte"), [])
+
+    def test_completion_fills_oldest_order_first(self):
+        result = complete_production({self.variant.id: 10})
+        completed = dict(InternalOrderItem.objects.values_list("order_id", "completed_quantity"))
+        self.assertEqual(completed[self.orders[0].id], 3)
+        self.assertEqual(completed[self.orders[1].id], 5)
+        self.assertEqual(completed[self.orders[2].id], 0)
+        self.assertEqual(result["leftover"], {self.variant.id: 2})
+        self.assertEqual(production_queue(), [])
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("api_production_complete"),
+            data=json.dumps({"lines": [{"variant_id": self.variant.id, "units": 1}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["leftover"], {str(self.variant.id): 1})
+        self.assertEqual(self.client.get(reverse("production_queue")).status_code, 200)
+
+
+class CatalogPdfRenderTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(self.user)
+        category = Category.objects.create(name="Flores", slug="flores")
+        for name in ("Rosa", "Girasol", "Tulipán"):
+            Product.objects.create(name=name, product_type="cinta", is_active=True).categories.add(category)
+
+    def test_build_is_queued_rendered_stored_and_reused(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+            MEDIA_ROOT=os.path.join(directory, "media"),
+            CATALOG_BUILD_IN_THREAD=False,
+            CATALOG_RENDER_WORKERS=1,
+            CATALOG_LAYER_CACHE_DIR=os.path.join(directory, "layers"),
+            CATALOG_IMAGE_CACHE_DIR=os.path.join(directory, "images"),
+        ):
+            form = {"catalog_name": "Cintas", "product_type": "cinta", "formats": ["pdf", "webp"]}
+            ajax = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+            queued = self.client.post(reverse("generate_catalog_pdf"), form, **ajax).json()
+            self.assertEqual(queued["status"], "pending")
+            self.assertEqual(queued["product_count"], 3)
+
+            self.assertEqual(process_pending_builds()["completed"], 1)
+            ready = self.client.get(queued["status_url"], **ajax).json()
+            self.assertEqual(ready["status"], "completed")
+            self.assertEqual([d["format"] for d in ready["downloads"]], ["pdf", "webp"])
+            response = self.client.get(ready["download_url"])
+            content = b"".join(response.streaming_content)
+            self.assertEqual(response["Content-Type"], "application/pdf")
+            self.assertEqual(len(PdfReader(io.BytesIO(content)).pages), 1 + 2 + 1)
+            frames = self.client.get(ready["downloads"][1]["url"])
+            self.assertEqual(frames["Content-Type"], "application/zip")
+            self.assertEqual(len(zipfile.ZipFile(io.BytesIO(b"".join(frames.streaming_content))).namelist()), 4)
+            missing = reverse("catalog_build_download", args=[queued["id"], "pdf_vector"])
+            self.assertEqual(self.client.get(missing).status_code, 404)
+
+            # Misma solicitud: el PDF guardado, sin volver a encolar
+            again = self.client.post(reverse("generate_catalog_pdf"), form)
+            self.assertRedirects(again, reverse("catalog_build_status", args=[queued["id"]]))
+            self.assertEqual(CatalogBuild.objects.get().hits, 1)
+
+            # Cambia lo que se dibuja: nuevo build
+            Product.objects.filter(name="Rosa").update(name="Rosa roja")
+            changed = self.client.post(reverse("generate_catalog_pdf"), form, **ajax).json()
+            self.assertNotEqual(changed["id"], queued["id"])
+            self.assertEqual(changed["status"], "pending")
+
+    def test_builds_run_in_a_thread_by_default_and_the_thread_never_forks(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            build = catalog_builds.request_catalog_build(catalog_builds.normalize_params(product_type="cinta"))
+        self.assertEqual((build.status, len(callbacks)), ("pending", 1))
+
+        with override_settings(CATALOG_BUILD_IN_THREAD=False), self.captureOnCommitCallbacks(execute=False) as callbacks:
+            catalog_builds.request_catalog_build(catalog_builds.normalize_params(product_type="logo"))
+        self.assertEqual(callbacks, [])
+
+        with mock.patch.object(catalog_builds, "process_catalog_build") as process, \
+                mock.patch.object(catalog_builds, "prune_old_builds") as prune:
+            catalog_builds._run_in_thread(build.id).join()
+        process.assert_called_once_with(build.id, workers=1)
+        prune.assert_called_once_with()
+
+    def test_old_and_superseded_builds_are_pruned_from_storage(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+            MEDIA_ROOT=directory,
+        ):
+            now = timezone.now()
+            params = catalog_builds.normalize_params(product_type="cinta")
+
+            def finished(name, age, status="completed", build_params=params):
+                path = os.path.join(directory, name)
+                with open(path, "wb") as output:
+                    output.write(b"%PDF")
+                return CatalogBuild.objects.create(
+                    fingerprint=name, params=build_params, status=status, artifacts={"pdf": name},
+                    finished_at=now - age,
+                )
+
+            expired = finished("viejo.pdf", timedelta(days=10), build_params=catalog_builds.normalize_params())
+            superseded = finished("reemplazado.pdf", timedelta(hours=3))
+            recent_superseded = finished("reciente.pdf", timedelta(minutes=5))
+            latest = finished("actual.pdf", timedelta(minutes=1))
+            active = CatalogBuild.objects.create(fingerprint="x", params=params, status="processing")
+
+            call_command("procesar_catalogos", keep_days=7, stdout=io.StringIO())
+
+            self.assertEqual(
+                set(CatalogBuild.objects.values_list("id", flat=True)),
+                {recent_superseded.id, latest.id, active.id},
+            )
+            self.assertEqual(sorted(os.listdir(directory)), ["actual.pdf", "reciente.pdf"])
+            self.assertFalse(CatalogBuild.objects.filter(id__in=[expired.id, superseded.id]).exists())
+
+    def test_layers_are_drawn_once_and_reused_from_disk(self):
+        card = {"name": "Rosa", "categories": ["Flores"], "image": None}
+        specs = [("products", (card, card, 1, 2)), ("products", (card, None, 2, 2)), ("back", ("321",))]
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_render._layers.clear()
+            first = io.BytesIO()
+            render_catalog_pdf(specs, first, layer_dir=directory)
+            self.assertEqual(len(os.listdir(directory)), 3)
+
+            catalog_render._layers.clear()
+            second = io.BytesIO()
+            render_catalog_pdf(specs, second, layer_dir=directory)
+        self.assertEqual(first.getvalue(), second.getvalue())
+
+    def test_all_formats_come_from_one_layout_pass(self):
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, "rosa.png")
+            Image.new("RGBA", (600, 800), (200, 40, 90, 255)).save(image_path)
+            card = {"name": "Rosa", "categories": ["Flores"], "image": image_path}
+            specs = [
+                ("cover", ("Cintas", "Cintas", "321", 3)),
+                ("products", (card, card, 1, 2)),
+                ("products", (card, None, 2, 2)),
+                ("back", ("321",)),
+            ]
+            outputs = {fmt: io.BytesIO() for fmt in ("pdf", "pdf_vector", "webp", "jpeg")}
+            layouts = []
+            real_layout = catalog_render.layout_page
+
+            def counting_layout(spec):
+                layouts.append(spec)
+                return real_layout(spec)
+
+            with mock.patch.object(catalog_render, "layout_page", counting_layout):
+                self.assertEqual(render_catalog(specs, outputs), 4)
+        self.assertEqual(len(layouts), 4)
+
+        vector = outputs["pdf_vector"].getvalue()
+        reader = PdfReader(io.BytesIO(vector))
+        self.assertEqual(len(reader.pages), 4)
+        self.assertIn("ROSA", reader.pages[1].extract_text())
+        # 3 fondos + la imagen del producto (una vez, aunque sale 3 veces)
+        self.assertEqual(vector.count(b"/Subtype /Image"), 4)
+
+        for fmt, pil_format in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            with zipfile.ZipFile(outputs[fmt]) as archive:
+                self.assertEqual(len(archive.namelist()), 4)
+                with Image.open(archive.open(archive.namelist()[0])) as frame:
+                    self.assertEqual((frame.format, frame.size), (pil_format, (1080, 1920)))
+
+    def test_vector_pdf_embeds_the_cached_original_jpeg(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "rosa.jpg")
+            Image.radial_gradient("L").convert("RGB").resize((600, 800)).save(source, quality=90)
+            cache = ImageCache(os.path.join(directory, "cache"), max_bytes=10 * 1024 * 1024)
+            local = cache.fetch_all([("rosa.jpg", source)])["rosa.jpg"]
+            card = {"name": "Rosa", "categories": ["Flores"], "image": local, "original": cache.original_path(local)}
+            output = io.BytesIO()
+            render_catalog([("products", (card, None, 1, 1))], {"pdf_vector": output})
+            with open(source, "rb") as f:
+                self.assertIn(f.read(), output.getvalue())
+        # Fondo e imagen de producto en JPEG, ninguna en FlateDecode RGB
+        self.assertEqual(output.getvalue().count(b"/Filter /DCTDecode"), 2)
+
+    def test_process_pool_writes_the_same_pdf(self):
+        specs = [("cover", ("Cintas", "Cintas", "321", 0)), ("back", ("321",))]
+        outputs = []
+        for workers in (1, 2):
+            buffer = io.BytesIO()
+            self.assertEqual(render_catalog_pdf(specs, buffer, workers=workers, max_in_flight=1), 2)
+            outputs.append(buffer.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class _EtagHandler(http.server.BaseHTTPRequestHandler):
+    body = b""
+    requests_seen = []
+
+    def do_GET(self):
+        type(self).requests_seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CatalogImageCacheTests(TestCase):
+    def _png(self, path, size=(1600, 1600)):
+        Image.new("RGBA", size, (200, 10, 10, 255)).save(path)
+        return path
+
+    def test_local_images_are_downsized_reused_and_evicted_by_lru(self):
+        with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as cache_dir:
+            sources = [(f"img-{i}.png", self._png(os.path.join(source_dir, f"img-{i}.png"))) for i in range(3)]
+            cache = ImageCache(cache_dir, max_bytes=10 * 1024 * 1024, workers=2)
+            paths = cache.fetch_all(sources)
+            self.assertEqual(len(paths), 3)
+            self.assertEqual(Image.open(paths["img-0.png"]).size, (960, 960))
+            # Los bytes originales quedan al lado, para el PDF vectorial
+            with open(cache.original_path(paths["img-0.png"]), "rb") as cached, open(sources[0][1], "rb") as source:
+                self.assertEqual(cached.read(), source.read())
+
+            cache.fetch_all(sources[:1])
+            self.assertEqual(cache.stats["misses"], 3)
+            self.assertEqual(cache.stats["hits"], 1)
+
+            entry_size = os.path.getsize(paths["img-0.png"]) + os.path.getsize(cache.original_path(paths["img-0.png"]))
+            cache.max_bytes = entry_size
+            kept = cache.fetch_all(sources[:1])
+            self.assertEqual(cache.stats["evicted"], 2)
+            self.assertEqual(sorted(os.listdir(cache_dir)), sorted(
+                os.path.basename(kept["img-0.png"])[:-4] + ext for ext in (".png", ".src", ".etag")
+            ))
+
+    def test_remote_images_revalidate_with_etag(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (100, 80), (0, 0, 255, 255)).save(buffer, format="PNG")
+        _EtagHandler.body = buffer.getvalue()
+        _EtagHandler.requests_seen = []
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/story.png"
+        try:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ImageCache(cache_dir, max_bytes=10 * 1024 * 1024)
+                first = cache.fetch_all([("products_img/story.png", url)])
+                second = cache.fetch_all([("products_img/story.png", url)])
+                self.assertEqual(first, second)
+                self.assertEqual(Image.open(first["products_img/story.png"]).size, (100, 80))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(_EtagHandler.requests_seen, [None, '"v1"'])
+        self.assertEqual((cache.stats["misses"], cache.stats["hits"]), (1, 1))
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        Size.objects.create(name="Grande", dimensions="19x25cm")
+        Color.objects.create(name="Azul", hex_code="#0000FF")
+        for i in range(3):
+            Product.objects.create(name=f"Cinta {i}", product_type="cinta", is_active=True)
+        self.url = reverse("catalogo", kwargs={"type_slug": "cintas-ramos"})
+
+    def _get(self, params=None, **headers):
+        return self.client.get(self.url, params, HTTP_X_REQUESTED_WITH="XMLHttpRequest", **headers)
+
+    def test_ajax_page_is_cached_and_revalidated_with_etag(self):
+        first = self._get()
+        self.assertEqual(len(first.json()["products"]), 3)
+        self.assertEqual(CatalogPageSnapshot.objects.count(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self._get()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(second.content, first.content)
+
+        not_modified = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_cursor_pages_through_ties_without_count(self):
+        Product.objects.update(created_at=timezone.now())
+        for i in range(3, 15):
+            Product.objects.create(name=f"Cinta {i}", product_type="cinta", is_active=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self._get().json()
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in queries.captured_queries))
+        self.assertTrue(first["has_next"])
+
+        second = self._get({"cursor": first["next_cursor"]}).json()
+        self.assertFalse(second["has_next"])
+        self.assertIsNone(second["next_cursor"])
+        ids = [p["id"] for p in first["products"] + second["products"]]
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(len(set(ids)), 15)
+
+        invalid = self._get({"cursor": "no-es-un-cursor"}).json()
+        self.assertEqual(invalid["products"], first["products"])
+
+    def test_only_existing_pages_are_stored_and_expired_rows_are_pruned(self):
+        self._get()
+        past_the_end = encode_cursor(Product.objects.order_by("created_at", "id").first())
+        self.assertEqual(self._get({"cursor": past_the_end}).json()["products"], [])
+        self.assertEqual(list(CatalogPageSnapshot.objects.values_list("cursor", flat=True)), [""])
+
+        CatalogPageSnapshot.objects.update(built_at=timezone.now() - timedelta(hours=1))
+        CatalogPageSnapshot.objects.create(
+            product_type="logo", payload="{}", etag="x", built_at=timezone.now() - timedelta(hours=1)
+        )
+        self._get()
+        self.assertEqual(list(CatalogPageSnapshot.objects.values_list("product_type", "cursor")), [("cinta", "")])
+
+    def test_only_cursors_of_real_products_are_stored(self):
+        oldest, *_ = Product.objects.order_by("created_at", "id")
+        # Mismo (created_at, id) con otra codificación: no es un cursor emitido
+        self._get({"cursor": encode_cursor(oldest) + "=="})
+        oldest.id += 1000
+        self._get({"cursor": encode_cursor(oldest)})
+        self.assertEqual(list(CatalogPageSnapshot.objects.values_list("cursor", flat=True)), [""])
+
+        newest = Product.objects.order_by("-created_at", "-id").first()
+        self.assertEqual(len(self._get({"cursor": encode_cursor(newest)}).json()["products"]), 2)
+        self.assertEqual(
+            set(CatalogPageSnapshot.objects.values_list("cursor", flat=True)), {"", encode_cursor(newest)}
+        )
+
+    def test_product_change_invalidates_cached_pages(self):
+        first = self._get()
+        Product.objects.filter(name="Cinta 0").get().delete()
+
+        self.assertFalse(CatalogPageSnapshot.objects.exists())
+        second = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.json()["products"]), 2)
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class PreviewQueueTests(TestCase):
+    def _png_upload(self, name="diseno.png", size=(600, 300)):
+        buffer = io.BytesIO()
+        Image.new("RGBA", size, (255, 0, 0, 128)).save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_save_enqueues_instead_of_rendering(self):
+        product = Product.objects.create(name="Logo QA", product_type="logo", source_file=self._png_upload())
+
+        product.refresh_from_db()
+        self.assertFalse(product.image)
+        self.assertEqual(PreviewJob.objects.filter(product=product, status="pending").count(), 1)
+
+        # Guardar de nuevo no duplica el trabajo pendiente
+        product.save()
+        self.assertEqual(PreviewJob.objects.filter(product=product).count(), 1)
+
+    def test_worker_renders_pending_jobs(self):
+        product = Product.objects.create(name="Logo QA", product_type="logo", source_file=self._png_upload())
+
+        stats = run_preview_worker(workers=1)
+
+        product.refresh_from_db()
+        job = PreviewJob.objects.get(product=product)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.duration_ms)
+        self.assertRegex(product.image.name, rf"prod_{product.id}_preview.*\.webp$")
+
+        sizes = product.image_derivatives["sizes"]
+        self.assertEqual(set(sizes), {"thumb", "card", "story", "full"})
+        self.assertEqual(sizes["thumb"]["width"], 200)
+        self.assertEqual(sizes["card"]["width"], 480)
+        # No se amplía por encima del ancho original
+        self.assertEqual(sizes["full"]["width"], 600)
+        self.assertIn("200w", product.get_image_srcset())
+        self.assertTrue(product.thumb_url.endswith(".webp"))
+
+    def test_public_catalog_json_returns_srcset(self):
+        Size.objects.create(name="Pequeño", dimensions="14x14cm")
+        product = Product.objects.create(
+            name="Impreso QA", product_type="impreso_globo", source_file=self._png_upload()
+        )
+        run_preview_worker(workers=1)
+
+        response = self.client.get(
+            reverse("catalogo", kwargs={"type_slug": "impresos-para-globos"}),
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        payload = response.json()["products"][0]
+        self.assertEqual(payload["id"], product.id)
+        self.assertIn("480w", payload["image_srcset"])
+        self.assertTrue(payload["thumb_url"])
+
+    def test_unsupported_source_marks_job_failed(self):
+        upload = SimpleUploadedFile("diseno.ai", b"not an image")
+        product = Product.objects.create(name="Vector QA", product_type="logo", source_file=upload)
+
+        run_preview_worker(workers=1)
+
+        job = PreviewJob.objects.get(product=product)
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error_message)
+
+    def test_identical_source_reuses_cached_render(self):
+        first = Product.objects.create(name="Logo A", product_type="logo", source_file=self._png_upload("a.png"))
+        run_preview_worker(workers=1)
+        second = Product.objects.create(name="Logo B", product_type="logo", source_file=self._png_upload("b.png"))
+        run_preview_worker(workers=1)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.source_hash, second.source_hash)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_derivatives, second.image_derivatives)
+
+        entry = RenderCacheEntry.objects.get(content_hash=first.source_hash)
+        self.assertEqual(entry.hits, 1)
+        self.assertEqual(entry.misses, 1)
+
+    @override_settings(BULK_UPLOAD_PROCESS_IN_THREAD=False)
+    def test_bulk_upload_skips_duplicate_content(self):
+        staff = get_user_model().objects.create_user(username="bulk", password="x", is_staff=True)
+        self.client.force_login(staff)
+
+        self.client.post(
+            reverse("bulk_upload"),
+            data={
+                "product_type": "logo",
+                "files": [self._png_upload("uno.png"), self._png_upload("copia-de-uno.png")],
+            },
+        )
+        process_pending_batches(workers=1)
+
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(Product.objects.get().name, "Uno")
+
+    @override_settings(BULK_UPLOAD_PROCESS_IN_THREAD=False)
+    def test_bulk_upload_is_queued_and_reports_item_progress(self):
+        staff = get_user_model().objects.create_user(username="bulk", password="x", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.post(
+            reverse("bulk_upload"),
+            data={
+                "product_type": "logo",
+                "files": [
+                    self._png_upload("uno.png", size=(10, 10)),
+                    self._png_upload("dos.png", size=(20, 10)),
+                ],
+            },
+        )
+        batch = BulkUploadBatch.objects.get()
+        self.assertRedirects(response, reverse("bulk_upload_status", args=[batch.id]))
+        # El request no crea productos: solo deja el lote en cola
+        self.assertEqual(batch.status, "pending")
+        self.assertEqual(batch.total_files, 2)
+        self.assertFalse(Product.objects.exists())
+
+        self.assertTrue(process_batch(batch.id, workers=1))
+        self.assertFalse(process_batch(batch.id, workers=1))
+
+        payload = self.client.get(
+            reverse("bulk_upload_status", args=[batch.id]),
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+        self.assertEqual(payload["status"], "completed")
+        self.assertEqual(payload["progress"], 100)
+        self.assertEqual(payload["successful"], 2)
+        self.assertEqual({item["status"] for item in payload["items"]}, {"completed"})
+        self.assertTrue(all(item["product_id"] for item in payload["items"]))
+
+    @override_settings(BULK_UPLOAD_PROCESS_IN_THREAD=False)
+    def test_resumed_item_links_the_product_it_already_created(self):
+        staff = get_user_model().objects.create_user(username="bulk", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.client.post(reverse("bulk_upload"), data={"product_type": "logo", "files": [self._png_upload("uno.png")]})
+        process_pending_batches(workers=1)
+        product = Product.objects.get()
+
+        # El proceso se cayó después de crear el producto y antes de cerrar el item
+        old = timezone.now() - timedelta(hours=3)
+        BulkUploadItem.objects.update(status="processing", product=None, processed_at=None)
+        BulkUploadBatch.objects.update(status="processing", heartbeat_at=old, processed_files=0, successful_uploads=0)
+        self.assertEqual(requeue_stale_batches(60), 1)
+        process_pending_batches(workers=1)
+
+        item = BulkUploadItem.objects.get()
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual((item.status, item.product_id), ("completed", product.id))
+        self.assertEqual(BulkUploadBatch.objects.get().successful_uploads, 1)
+
+    def test_only_batches_without_a_recent_heartbeat_are_requeued(self):
+        staff = get_user_model().objects.create_user(username="bulk", password="x", is_staff=True)
+        old = timezone.now() - timedelta(hours=3)
+        alive = BulkUploadBatch.objects.create(created_by=staff, status="processing", heartbeat_at=timezone.now())
+        dead = BulkUploadBatch.objects.create(created_by=staff, status="processing", heartbeat_at=old)
+        BulkUploadBatch.objects.filter(id__in=[alive.id, dead.id]).update(created_at=old)
+
+        self.assertEqual(requeue_stale_batches(60), 1)
+        self.assertEqual(BulkUploadBatch.objects.get(id=alive.id).status, "processing")
+        self.assertEqual(BulkUploadBatch.objects.get(id=dead.id).status, "pending")
+
+    @override_settings(PREVIEW_SPOOL_THRESHOLD_MB=0, PREVIEW_MAX_MEGAPIXELS=0.05)
+    def test_large_sources_are_spooled_and_capped_to_pixel_budget(self):
+        product = Product.objects.create(
+            name="Pliego QA", product_type="logo", source_file=self._png_upload(size=(1000, 500))
+        )
+
+        with open_source(product) as (source, content_hash):
+            self.assertIsInstance(source, str)
+            self.assertEqual(content_hash, product.source_hash)
+
+        run_preview_worker(workers=1)
+
+        product.refresh_from_db()
+        with Image.open(product.image) as preview:
+            self.assertLessEqual(preview.width * preview.height, 50_000)
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class ImportCatalogCommandTests(TestCase):
+    def _png_bytes(self, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 20), color).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def test_imports_zip_in_chunks_and_resumes_from_checkpoint(self):
+        workdir = tempfile.mkdtemp()
+        archive_path = os.path.join(workdir, "disenos.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr("vinilos/sticker-rosa.png", self._png_bytes((255, 0, 128)))
+            archive.writestr("vinilos/azul.png", self._png_bytes((0, 0, 255)))
+            archive.writestr("copias/azul-copia.png", self._png_bytes((0, 0, 255)))
+            archive.writestr("notas.txt", b"ignorar")
+
+        out = io.StringIO()
+        call_command(
+            "import_catalog", archive_path, product_type="logo", workers=2, chunk_size=2, stdout=out
+        )
+
+        self.assertEqual(
+            set(Product.objects.values_list("name", flat=True)), {"Rosa", "Azul"}
+        )
+        self.assertFalse(Product.objects.filter(is_online=True).exists())
+        self.assertEqual(PreviewJob.objects.filter(status="pending").count(), 2)
+        self.assertIn("arch/s", out.getvalue())
+
+        with open(f"{archive_path}.import.json", encoding="utf-8") as f:
+            entries = json.load(f)["entries"]
+        self.assertEqual(entries["copias/azul-copia.png"]["status"], "duplicate")
+        self.assertEqual(len(entries), 3)
+
+        # Segunda corrida: todo está en el checkpoint, no toca la BD
+        call_command("import_catalog", archive_path, product_type="logo", stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_same_reference_twice_in_one_chunk_creates_one_product(self):
+        workdir = tempfile.mkdtemp()
+        archive_path = os.path.join(workdir, "disenos.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr("vinilos/rojo.png", self._png_bytes((255, 0, 0)))
+            archive.writestr("otros/rojo.png", self._png_bytes((200, 0, 0)))
+
+        call_command("import_catalog", archive_path, product_type="logo", workers=2, stdout=io.StringIO())
+
+        self.assertEqual(Product.objects.count(), 1)
+        with open(f"{archive_path}.import.json", encoding="utf-8") as f:
+            statuses = sorted(entry["status"] for entry in json.load(f)["entries"].values())
+        self.assertEqual(statuses, ["created", "duplicate"])
@@ -0,0 +1,291 @@
+"""
+Índice de búsqueda de variantes (VariantSearchIndex) para el editor de pedidos internos.
+api_filter_variants y la selección automática consultan solo esta tabla: una fila
+por variante vendible con nombre, tipo, categorías, tamaño/
+material/color (ids y nombres), precio y miniatura. Sin JOINs, sin DISTINCT y sin
+recalcular en cada tecla qué productos son "el más reciente por nombre + tipo".
+El texto libre se resuelve con el motor de products/search.py (sin tildes, por prefijo).
+
+Mantenimiento:
+- Los signals de Product/ProductVariant/categorías llaman a schedule_reindex, que
+  acumula los productos tocados y los reindexa una sola vez al confirmar la transacción.
+- Las escrituras masivas (bulk_create, update) llaman a schedule_reindex explícitamente.
+- Renombrar un tamaño/material/color actualiza sus nombres en el índice con un UPDATE.
+- La migración 0031 indexa las variantes existentes; `manage.py reconstruir_indice_variantes`
+  lo reconstruye completo. Los requests nunca lo reconstruyen.
+"""
+import threading
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+
+from .models import Product, ProductVariant, VariantSearchIndex
+from .reference_data import get_reference_data
+from .search import PRODUCT, matching_ids
+
+INDEX_CHUNK_SIZE = 500
+
+_pending = threading.local()
+
+
+def _group_filter(keys):
+    return reduce(or_, (Q(name=name, product_type=product_type) for name, product_type in keys))
+
+
+def _latest_product_ids(keys=None):
+    """
+    Ids del producto activo con variantes más reciente por (nombre, tipo):
+    los duplicados antiguos no aparecen en el editor.
+    """
+    products = Product.objects.filter(is_active=True, variant_count__gt=0)
+    if keys is not None:
+        products = products.filter(_group_filter(keys))
+    return list(
+        products.order_by().values('name', 'product_type').annotate(latest_id=Max('id'))
+        .values_list('latest_id', flat=True)
+    )
+
+
+def _build_entries(product_ids):
+    """Filas del índice para las variantes de los productos dados (tres consultas)."""
+    if not product_ids:
+        return []
+    reference = get_reference_data()
+    products = Product.objects.filter(pk__in=product_ids).only(
+        'id', 'name', 'product_type', 'image', 'image_derivatives'
+    ).in_bulk()
+
+    categories = {}
+    for product_id, category_id in Product.categories.through.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'category_id'):
+        categories.setdefault(product_id, []).append(category_id)
+
+    entries = []
+    for variant_id, product_id, size_id, material_id, color_id, price in ProductVariant.objects.filter(
+        product_id__in=product_ids
+    ).values_list('id', 'product_id', 'size_id', 'material_id', 'color_id', 'price'):
+        product = products[product_id]
+        size = reference.size(size_id)
+        material = reference.material(material_id)
+        color = reference.color(color_id)
+        category_ids = sorted(categories.get(product_id, ()))
+        entries.append(VariantSearchIndex(
+            variant_id=variant_id,
+            product_id=product_id,
+            product_name=product.name,
+            product_type=product.product_type,
+            category_ids=f",{','.join(map(str, category_ids))}," if category_ids else '',
+            size_id=size_id,
+            size_name=size.name if size else '',
+            size_dimensions=size.dimensions if size else '',
+            material_id=material_id,
+            material_name=material.name if material else '',
+            color_id=color_id,
+            color_name=color.name if color else '',
+            color_hex=color.hex_code if color else '',
+            price=price or 0,
+            image_name=product.get_image_name('thumb') or '',
+        ))
+    return entries
+
+
+def _reindex_chunk(product_ids, keys):
+    keys = set(keys)
+    keys.update(Product.objects.filter(pk__in=product_ids).values_list('name', 'product_type'))
+    # Nombre/tipo anteriores: un producto renombrado puede "liberar" a un hermano de su grupo viejo
+    keys.update(
+        VariantSearchIndex.objects.filter(product_id__in=product_ids)
+        .values_list('product_name', 'product_type').distinct()
+    )
+    if not keys:
+        return 0
+
+    group_ids = set(Product.objects.filter(_group_filter(keys)).values_list('id', flat=True))
+    entries = _build_entries(_latest_product_ids(keys))
+    with transaction.atomic():
+        VariantSearchIndex.objects.filter(product_id__in=group_ids | set(product_ids)).delete()
+        VariantSearchIndex.objects.bulk_create(entries, batch_size=INDEX_CHUNK_SIZE)
+    return len(entries)
+
+
+def reindex_products(product_ids=(), keys=()):
+    """
+    Reindexa los productos dados y los demás de sus grupos (nombre, tipo): solo el
+    más reciente de cada grupo queda en el índice. `keys` agrega grupos de productos
+    ya borrados. Retorna cuántas filas quedaron indexadas para esos grupos.
+    """
+    product_ids = sorted(set(product_ids))
+    keys = list(keys)
+    total = 0
+    for offset in range(0, max(len(product_ids), 1), INDEX_CHUNK_SIZE):
+        chunk = product_ids[offset:offset + INDEX_CHUNK_SIZE]
+        total += _reindex_chunk(chunk, keys if offset == 0 else ())
+    return total
+
+
+def _pending_state():
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+        _pending.keys = set()
+    return _pending
+
+
+def flush_pending_reindex():
+    """Reindexa lo acumulado por schedule_reindex en este hilo."""
+    state = _pending_state()
+    ids, keys = state.ids, state.keys
+    state.ids, state.keys = set(), set()
+    if ids or keys:
+        reindex_products(ids, keys)
+
+
+def schedule_reindex(product_ids=(), keys=()):
+    """
+    Agenda la reindexación para cuando se confirme la transacción actual (de inmediato
+    en autocommit). Varias llamadas en la misma transacción se agrupan en una.
+    """
+    state = _pending_state()
+    state.ids.update(int(product_id) for product_id in product_ids)
+    state.keys.update(keys)
+    transaction.on_commit(flush_pending_reindex, robust=True)
+
+
+def rebuild_variant_search_index(chunk_size=INDEX_CHUNK_SIZE):
+    """Reconstruye el índice completo por bloques. Retorna cuántas filas indexó."""
+    latest_ids = sorted(_latest_product_ids())
+    total = 0
+    with transaction.atomic():
+        VariantSearchIndex.objects.all().delete()
+        for offset in range(0, len(latest_ids), chunk_size):
+            entries = _build_entries(latest_ids[offset:offset + chunk_size])
+            VariantSearchIndex.objects.bulk_create(entries, batch_size=chunk_size)
+            total += len(entries)
+    return total
+
+
+def refresh_indexed_prices(product_types=None):
+    """Copia al índice el precio actual de las variantes (tras un UPDATE masivo de precios)."""
+    entries = VariantSearchIndex.objects.all()
+    if product_types:
+        entries = entries.filter(product_type__in=product_types)
+    return entries.update(
+        price=Subquery(ProductVariant.objects.filter(pk=OuterRef('variant_id')).values('price')[:1])
+    )
+
+
+# --- Receivers de signals (ver products/signals.py) ---
+
+def product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_reindex([instance.pk])
+
+
+def product_deleted(sender, instance, **kwargs):
+    schedule_reindex(keys=[(instance.name, instance.product_type)])
+
+
+def variant_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_reindex([instance.product_id])
+
+
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_reindex([instance.pk])
+    elif pk_set:
+        schedule_reindex(pk_set)
+    else:
+        # category.products.clear(): productos que tenían esa categoría en el índice
+        schedule_reindex(
+            VariantSearchIndex.objects.filter(category_ids__contains=f",{instance.pk},")
+            .values_list('product_id', flat=True).distinct()
+        )
+
+
+def attribute_renamed(sender, instance, raw=False, **kwargs):
+    """Tamaño/material/color guardado: actualiza sus nombres en las filas del índice."""
+    if raw:
+        return
+    model = sender.__name__
+    if model == 'Size':
+        VariantSearchIndex.objects.filter(size_id=instance.pk).update(
+            size_name=instance.name, size_dimensions=instance.dimensions
+        )
+    elif model == 'Material':
+        VariantSearchIndex.objects.filter(material_id=instance.pk).update(material_name=instance.name)
+    elif model == 'Color':
+        VariantSearchIndex.objects.filter(color_id=instance.pk).update(
+            color_name=instance.name, color_hex=instance.hex_code
+        )
+
+
+# --- Consultas ---
+
+def _decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def search_variants(filters):
+    """
+    Queryset de VariantSearchIndex con los filtros del editor: product_type, category_id,
+    material_id / material_ids, size_id, color_id, search, min_price y max_price.
+    """
+    entries = VariantSearchIndex.objects.all()
+
+    product_type = filters.get('product_type')
+    if product_type:
+        entries = entries.filter(product_type=product_type)
+
+    category_id = filters.get('category_id')
+    if category_id:
+        entries = entries.filter(category_ids__contains=f",{int(category_id)},")
+
+    material_id = filters.get('material_id')
+    material_ids = filters.get('material_ids') or []
+    if material_id:
+        entries = entries.filter(material_id=material_id)
+    elif material_ids:
+        entries = entries.filter(material_id__in=material_ids)
+
+    size_id = filters.get('size_id')
+    if size_id:
+        entries = entries.filter(size_id=size_id)
+
+    color_id = filters.get('color_id')
+    if color_id:
+        entries = entries.filter(color_id=color_id)
+
+    search = (filters.get('search') or '').strip()
+    if search:
+        entries = entries.filter(product_id__in=matching_ids(PRODUCT, search))
+
+    min_price = filters.get('min_price')
+    if min_price and _decimal(min_price) is not None:
+        entries = entries.filter(price__gte=_decimal(min_price))
+    max_price = filters.get('max_price')
+    if max_price and _decimal(max_price) is not None:
+        entries = entries.filter(price__lte=_decimal(max_price))
+
+    return entries
+
+
+def entry_image_url(entry):
+    if not entry.image_name:
+        return ''
+    return Product._meta.get_field('image').storage.url(entry.image_name)
+
+
+def entry_variant_text(entry):
+    text = f"{entry.size_name} - {entry.material_name}"
+    if entry.color_name:
+        text += f" - {entry.color_name}"
+    return text
@@ -0,0 +1,78 @@
+"""
+Resumen de variantes desnormalizado en Product (variant_count, min_price,
+max_price, last_variant_change).
+El catálogo público y los pedidos internos filtran por variant_count > 0 en una
+sola tabla, sin JOIN + DISTINCT contra ProductVariant, y el precio "desde"
+queda disponible sin agregar en cada request.
+Lo mantienen los signals de ProductVariant (save/delete) y, en las escrituras
+masivas que no disparan signals (bulk_create, update), una llamada explícita a
+refresh_variant_summary. `manage.py reconstruir_resumen_variantes` lo recalcula.
+"""
+from django.db.models import Count, IntegerField, Max, Min, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, ProductVariant
+
+SUMMARY_FIELDS = ('variant_count', 'min_price', 'max_price')
+REBUILD_CHUNK_SIZE = 500
+
+
+def _summary_subqueries():
+    variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    return {
+        'variant_count': Coalesce(
+            Subquery(variants.annotate(total=Count('id')).values('total')[:1]),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+        'min_price': Subquery(variants.annotate(value=Min('price')).values('value')[:1]),
+        'max_price': Subquery(variants.annotate(value=Max('price')).values('value')[:1]),
+    }
+
+
+def refresh_variant_summary(products=None):
+    """
+    Recalcula el resumen con un solo UPDATE (subconsultas correlacionadas).
+    `products` acepta un queryset de Product, una lista de ids o None (todos).
+    Retorna cuántos productos se actualizaron.
+    """
+    if products is None:
+        products = Product.objects.all()
+    elif not isinstance(products, QuerySet):
+        products = Product.objects.filter(pk__in=list(products))
+    return products.update(last_variant_change=timezone.now(), **_summary_subqueries())
+
+
+def variant_summary_receiver(sender, instance, raw=False, **kwargs):
+    """Receiver de post_save/post_delete de ProductVariant."""
+    if raw:
+        return
+    refresh_variant_summary([instance.product_id])
+
+
+def rebuild_variant_summary(dry_run=False, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Compara el resumen guardado con el calculado desde las variantes y corrige
+    solo los productos desfasados (por bloques de chunk_size).
+    Retorna {"checked": productos revisados, "stale": desfasados, "stale_ids": todos los ids
+    desfasados, "ids": los primeros (para mostrar)}.
+    """
+    aggregates = {
+        row['product_id']: (row['total'], row['low'], row['high'])
+        for row in ProductVariant.objects.order_by().values('product_id').annotate(
+            total=Count('id'), low=Min('price'), high=Max('price')
+        )
+    }
+
+    checked = 0
+    stale = []
+    for product_id, *stored in Product.objects.order_by('id').values_list('id', *SUMMARY_FIELDS).iterator():
+        checked += 1
+        if tuple(stored) != aggregates.get(product_id, (0, None, None)):
+            stale.append(product_id)
+
+    if not dry_run:
+        for offset in range(0, len(stale), chunk_size):
+            refresh_variant_summary(stale[offset:offset + chunk_size])
+    return {'checked': checked, 'stale': len(stale), 'stale_ids': stale, 'ids': stale[:20]}
@@ -1,14 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 # Importa TANTO Product COMO Category
 from .models import Product, Category, ProductVariant, Cart, CartItem, Size, Material, Color
 from .forms import ProductForm, CategoryForm
-from .services import sincronizar_color_en_productos, sincronizar_variantes_producto
-from django.db.models import Min, Q
+from .services import sincronizar_variantes_producto
+from .catalog_cache import get_catalog_page, invalidate_catalog_cache
+from .reference_data import get_reference_data
+from .search import PRODUCT, index_ids, matching_ids
+from .variant_search import schedule_reindex
+from .variant_summary import refresh_variant_summary
+from django.db.models import Min
 import json  # <--- AGREGAR ESTA LÍNEA
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.core.serializers import serialize
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.paginator import Paginator
@@ -37,7 +45,7 @@ def checkout_process_view(request):
         return redirect('address_create')
     
     # 3. Si tiene dirección, CREAR PEDIDO
-    default_status = OrderStatus.objects.filter(is_default=True).first() # Obtener estado por defecto
+    default_status = get_reference_data().default_status # Obtener estado por defecto
     
     order = Order.objects.create(
         user=request.user,
@@ -223,69 +231,38 @@ def catalogo_publico_view(request, type_slug, category_slug=None):
         # Si el slug no es válido, 404 o redirigir al default
         return redirect('catalogo_root')
 
-    # 1. Obtener productos base (solo del tipo actual, activos y online)
-    products_query = Product.objects.filter(
-        product_type=current_type_code,
-        variants__isnull=False,
-        is_active=True,
-        is_online=True
-    ).distinct().order_by('-created_at')
-
-    # 2. Filtrar por categoría si existe
+    # 1. Filtrar por categoría si existe
     current_category = None
     if category_slug:
         current_category = get_object_or_404(Category, slug=category_slug)
-        products_query = products_query.filter(categories=current_category)
 
-    # 3. Paginación
-    paginator = Paginator(products_query, 12)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # 2. Página ya construida (productos + variantes), compartida entre requests
+    # y procesos; se invalida por signals (ver products/catalog_cache.py)
+    # Paginación por cursor (created_at, id): ver catalog_cache.build_catalog_page
+    cursor = request.GET.get('cursor', '')
+    snapshot = get_catalog_page(current_type_code, current_category, cursor)
+
+    # 3. Respuesta AJAX (scroll infinito): JSON tal cual, con validación condicional
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        etag = quote_etag(snapshot.etag)
+        last_modified = int(snapshot.built_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(snapshot.payload, content_type='application/json')
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['X-Requested-With'])
+        return response
 
     # 4. Obtener categorías QUE TENGAN productos de este tipo
-    # Para optimizar, podríamos filtrar solo las categorías que tienen al menos un producto activo de este tipo
-    categories = []
-    if not request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        categories = Category.objects.filter(
-            products__product_type=current_type_code,
-            products__is_active=True,
-            products__is_online=True
-        ).distinct()
-
-    # 5. Construir JSON de variantes
-    variants_data = {}
-    products_list = []
-    for product in page_obj:
-        p_variants = product.variants.all()
-        variants_data[product.id] = []
-        for v in p_variants:
-            variants_data[product.id].append({
-                'id': v.id,
-                'size_id': v.size.id,
-                'size_name': v.size.name,
-                'material_id': v.material.id,
-                'color_name': v.color.name if v.color else "Estándar",
-                'material_name': v.material.name,
-                'color_id': v.color.id if v.color else None,
-                'price': float(v.price),
-                'stock': v.stock
-            })
-        
-        products_list.append({
-            'id': product.id,
-            'name': product.name,
-            'description': product.description or "",
-            'image_url': product.image.url if product.image else None,
-        })
+    categories = Category.objects.filter(
+        products__product_type=current_type_code,
+        products__is_active=True,
+        products__is_online=True
+    ).distinct()
 
-    # 6. Respuesta AJAX
-    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        return JsonResponse({
-            'products': products_list,
-            'variants': variants_data,
-            'has_next': page_obj.has_next(),
-            'next_page': page_obj.next_page_number() if page_obj.has_next() else None
-        })
+    page = json.loads(snapshot.payload)
 
     # Lista de tipos disponibles para el menú
     product_types_menu = [
@@ -296,14 +273,14 @@ def catalogo_publico_view(request, type_slug, category_slug=None):
     ]
 
     context = {
-        'products': page_obj,
+        'products': page['products'],
         'categories': categories,
         'current_category': current_category,
         'current_type_slug': type_slug,
         'product_types_menu': product_types_menu,
-        'variants_json': json.dumps(variants_data, cls=DjangoJSONEncoder),
-        'has_next': page_obj.has_next(),
-        'next_page': page_obj.next_page_number() if page_obj.has_next() else None
+        'variants_json': json.dumps(page['variants']),
+        'has_next': page['has_next'],
+        'next_cursor': page['next_cursor']
     }
     return render(request, 'catalogo_tiktok.html', context)
 
@@ -378,7 +355,7 @@ def panel_orders_list_view(request):
     if status_id:
         orders = orders.filter(status_id=status_id)
         
-    statuses = OrderStatus.objects.all()
+    statuses = get_reference_data().sorted_statuses
 
     from contabilidad.job_costing_services import ensure_financial_status
     for order in orders:
@@ -443,7 +420,7 @@ def api_panel_order_update_status_view(request):
 @user_passes_test(is_staff)
 def panel_order_detail_view(request, order_id):
     order = get_object_or_404(Order, id=order_id)
-    statuses = OrderStatus.objects.all()
+    statuses = get_reference_data().sorted_statuses
     
     if request.method == 'POST':
         new_status_id = request.POST.get('status_id')
@@ -585,12 +562,19 @@ def product_duplicate_view(request, product_id):
     # 2. Copy categories (M2M)
     new_product.categories.set(original_product.categories.all())
     
-    # 3. Duplicate variants
+    # 3. Duplicate variants: reemplazan las que el signal generó al guardar
+    # (misma combinación => restricción única), conservando precios y stock
+    new_product.variants.all().delete()
+    copies = []
     for variant in original_product.variants.all():
         variant.pk = None
         variant.id = None
         variant.product = new_product
-        variant.save()
+        copies.append(variant)
+    ProductVariant.objects.bulk_create(copies)
+    refresh_variant_summary([new_product.id])
+    schedule_reindex([new_product.id])
+    invalidate_catalog_cache(new_product.product_type)
         
     messages.success(request, f"Producto '{original_product.name}' duplicado correctamente.")
     return redirect('panel_product_list')
@@ -667,8 +651,13 @@ def api_remove_cart_item(request):
 def bulk_upload_view(request):
     """
     Vista para carga masiva de productos.
-    Procesamiento SÍNCRONO (sin Celery) para compatibilidad con PythonAnywhere.
+    El request solo guarda los archivos; el procesamiento corre en segundo plano
+    (pool de hilos, ver products/bulk_ingest.py) y el progreso se consulta por AJAX.
     """
+    from .bulk_ingest import enqueue_batch, start_batch_processing
+
+    max_files = getattr(settings, 'BULK_UPLOAD_MAX_FILES', 500)
+
     if request.method == 'POST':
         form = BulkUploadForm(request.POST)
         files = request.FILES.getlist('files')
@@ -677,8 +666,8 @@ def bulk_upload_view(request):
             messages.error(request, 'No se seleccionaron archivos.')
             return redirect('bulk_upload')
 
-        if len(files) > 50:
-            messages.error(request, f'Máximo 50 archivos. Seleccionaste {len(files)}.')
+        if len(files) > max_files:
+            messages.error(request, f'Máximo {max_files} archivos. Seleccionaste {len(files)}.')
             return redirect('bulk_upload')
 
         if not form.is_valid():
@@ -688,60 +677,18 @@ def bulk_upload_view(request):
         # Obtener el tipo de producto seleccionado
         product_type = form.cleaned_data['product_type']
 
-        # Crear batch
-        batch = BulkUploadBatch.objects.create(
-            created_by=request.user,
-            total_files=len(files),
-            status='processing'
-        )
-
-        # Procesar archivos SÍNCRONAMENTE
-        from .tasks import process_single_upload_item
-        from django.utils import timezone
-        import os
-        skipped_duplicates = []
-
-        for uploaded_file in files:
-            # Check for duplicate reference (filename without extension)
-            filename_no_ext = os.path.splitext(uploaded_file.name)[0]
-            if Product.objects.filter(name=filename_no_ext).exists():
-                skipped_duplicates.append(uploaded_file.name)
-                continue
-
-            item = BulkUploadItem.objects.create(
-                batch=batch,
-                original_filename=uploaded_file.name,
-                source_file=uploaded_file,
-                status='processing'
-            )
+        # Guardar lote e items pendientes (omitiendo duplicados) y lanzar el procesamiento
+        batch, skipped_duplicates = enqueue_batch(request.user, product_type, files)
+        if batch.total_files:
+            start_batch_processing(batch)
 
-            try:
-                # Procesar directamente pasando el tipo de producto
-                process_single_upload_item(item, product_type)
-                batch.processed_files += 1
-                batch.successful_uploads += 1
-                batch.save()
-            except Exception as e:
-                item.status = 'failed'
-                item.error_message = str(e)
-                item.save()
-                batch.processed_files += 1
-                batch.failed_uploads += 1
-                batch.error_log += f"\n{uploaded_file.name}: {str(e)}"
-                batch.save()
-
-        # Marcar batch como completado
-        batch.status = 'completed'
-        batch.total_files = batch.processed_files # Update total to reflect only processed
-        batch.save()
-
-        msg = f'Procesamiento completado: {batch.successful_uploads} exitosos, {batch.failed_uploads} fallidos.'
+        msg = f'Lote #{batch.id} en cola: {batch.total_files} archivos.'
         if skipped_duplicates:
             msg += f' Se omitieron {len(skipped_duplicates)} archivos duplicados ({", ".join(skipped_duplicates[:3])}{"..." if len(skipped_duplicates)>3 else ""}).'
             messages.warning(request, msg)
         else:
             messages.success(request, msg)
-            
+
         return redirect('bulk_upload_status', batch_id=batch.id)
 
     # GET: Mostrar formulario y lotes recientes
@@ -752,7 +699,8 @@ def bulk_upload_view(request):
 
     return render(request, 'dashboard/products/bulk_upload.html', {
         'form': form,
-        'recent_batches': recent_batches
+        'recent_batches': recent_batches,
+        'max_files': max_files,
     })
 
 
@@ -774,6 +722,16 @@ def bulk_upload_status_view(request, batch_id):
             'total': batch.total_files,
             'successful': batch.successful_uploads,
             'failed': batch.failed_uploads,
+            'items': [
+                {
+                    'id': item.id,
+                    'status': item.status,
+                    'status_display': item.get_status_display(),
+                    'product_id': item.product_id,
+                    'error': item.error_message,
+                }
+                for item in batch.items.all().order_by('-created_at')
+            ],
         })
 
     # Vista normal con template
@@ -795,7 +753,7 @@ def product_list_enhanced_view(request):
     """
     Lista mejorada de productos con:
     - Paginación (20 por página)
-    - Búsqueda por nombre/descripción
+    - Búsqueda por nombre/descripción (sin distinguir tildes)
     - Filtros por categoría, tipo, estado online/offline
     - Ordenamiento
     - Checkboxes para acciones masivas
@@ -805,10 +763,8 @@ def product_list_enhanced_view(request):
     # Búsqueda
     search_query = request.GET.get('q', '')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        # Motor de búsqueda (products/search.py): sin tildes y por prefijo de palabra
+        products = products.filter(pk__in=matching_ids(PRODUCT, search_query))
 
     # Filtro por categoría
     category_id = request.GET.get('category')
@@ -883,6 +839,7 @@ def mass_edit_products_view(request):
         # Acciones que NO requieren categorías
         if action == 'set_online':
             products.update(is_online=True)
+            invalidate_catalog_cache()
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'ok', 'message': f'✓ {count} producto(s) ahora están EN LÍNEA.'})
             messages.success(request, f'✓ {count} producto(s) ahora están EN LÍNEA.')
@@ -890,6 +847,7 @@ def mass_edit_products_view(request):
 
         elif action == 'set_offline':
             products.update(is_online=False)
+            invalidate_catalog_cache()
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'ok', 'message': f'✓ {count} producto(s) ahora están FUERA DE LÍNEA.'})
             messages.success(request, f'✓ {count} producto(s) ahora están FUERA DE LÍNEA.')
@@ -906,6 +864,8 @@ def mass_edit_products_view(request):
 
         elif action == 'set_active':
             products.update(is_active=True)
+            schedule_reindex(product_ids)
+            invalidate_catalog_cache()
             msg = f'✓ {count} producto(s) marcados como ACTIVOS.'
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'ok', 'message': msg})
@@ -914,6 +874,8 @@ def mass_edit_products_view(request):
 
         elif action == 'set_inactive':
             products.update(is_active=False)
+            schedule_reindex(product_ids)
+            invalidate_catalog_cache()
             msg = f'✓ {count} producto(s) marcados como INACTIVOS (Ocultos de todo lado).'
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'ok', 'message': msg})
@@ -957,6 +919,8 @@ def mass_edit_products_view(request):
 
                 elif action == 'change_type':
                     products.update(product_type=new_type)
+                    schedule_reindex(product_ids)
+                    invalidate_catalog_cache()
                     generated = 0
                     for product in products:
                         generated += sincronizar_variantes_producto(product)
@@ -967,6 +931,9 @@ def mass_edit_products_view(request):
 
                 elif action == 'change_description':
                     products.update(description=new_desc)
+                    schedule_reindex(product_ids)
+                    index_ids(PRODUCT, product_ids)
+                    invalidate_catalog_cache()
                     messages.success(request, f'✓ Descripción actualizada en {count} producto(s).')
 
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -1057,9 +1024,10 @@ def inline_edit_product_api(request):
 @user_passes_test(is_staff)
 def product_types_dashboard_view(request):
     """Dashboard con las 3 secciones: Tamaños, Materiales, Colores"""
-    sizes = Size.objects.all().order_by('name')
-    materials = Material.objects.all().order_by('name')
-    colors = Color.objects.all().order_by('name')
+    reference = get_reference_data()
+    sizes = reference.sorted_sizes
+    materials = reference.sorted_materials
+    colors = reference.sorted_colors
     return render(request, 'dashboard/products/types_dashboard.html', {
         'sizes': sizes,
         'materials': materials,
@@ -1167,9 +1135,19 @@ def color_create_update_view(request, color_id=None):
             instance.save()
             messages.success(request, 'Color actualizado.')
         else:
+            # El signal post_save propaga el color al catálogo (ver products/color_sync.py)
             new_color = Color.objects.create(name=name, hex_code=hex_code)
-            synced = sincronizar_color_en_productos(new_color, only_active=True)
-            messages.success(request, f'Color creado. Variantes antiguas actualizadas: {synced}.')
+            job = new_color.sync_jobs.order_by('-id').first()
+            if job and job.status == 'completed':
+                messages.success(
+                    request,
+                    f'Color creado. Variantes antiguas actualizadas: {job.variants_created} '
+                    f'en {job.duration_ms} ms.'
+                )
+            elif job:
+                messages.success(request, 'Color creado. Las variantes se están actualizando en segundo plano.')
+            else:
+                messages.success(request, 'Color creado.')
         return redirect('product_types_dashboard')
     return render(request, 'dashboard/products/color_form.html', {
         'object': instance,